@@ -12,10 +12,34 @@ import time
 import shutil
 import argparse
 from pathlib import Path
+from config import (
+    SUPPORTED_FORMATS, WATCH_SETTLE_SECONDS, JOB_STORE_FILE, MESSAGES, VERIFY_MODE,
+    PREDICT_MIN_SAVING_PERCENT, SCHEDULER_POLICY, STAGING_BUDGET_GB, DUPLICATE_ACTION,
+    DISK_MIN_FREE_GB
+)
 from modules.logger import logger
+from modules.log_backend import LOG_FORMATS, configure_logging, log_debug
 from modules.validator import Validator
 from modules.categorizer import Categorizer
 from modules.utils import format_time
+from modules.decode_verifier import VERIFY_MODES
+from modules.stream_planner import install_stream_probe
+from modules.probe_cache import enable_probe_cache, log_probe_cache_stats
+from modules.job_store import JobStore
+from modules.scanner import enable_scan_index
+from modules.scheduler import JobScheduler, SCHEDULER_POLICIES
+from modules.renditions import parse_renditions
+from modules.fingerprint import DUPLICATE_ACTIONS, enable_fingerprint_index
+from modules.encode_history import enable_encode_history
+from modules.disk_space import enable_disk_guard
+from modules.planner import install_lazy_output_dirs
+from modules.work_queue import open_queue, enqueue_files
+from modules.daemon import connect_daemon, default_address
+from modules.metrics import enable_metrics
+from modules.resource_sampler import start_resource_sampler
+from modules.inotify_watcher import (
+    InotifyWatcher, IN_CREATE, IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_ISDIR
+)
 from video_converter import VideoConverter, collect_video_files
 
 
@@ -25,25 +49,60 @@ class WatchFolder:
     نظارت بر پوشه و تبدیل خودکار ویدیوهای جدید
     """
     
-    def __init__(self, watch_dir='input', output_dir='output', check_interval=5):
+    def __init__(self, watch_dir='input', output_dir='output', check_interval=5, poll=False,
+                 resumable=False, throttle=True, verify_mode=VERIFY_MODE,
+                 min_saving=PREDICT_MIN_SAVING_PERCENT, schedule=SCHEDULER_POLICY, queue=None,
+                 scratch=None, scratch_budget=STAGING_BUDGET_GB, renditions=None,
+                 duplicates=DUPLICATE_ACTION, daemon=None):
         """
         Initialize watch folder
         راه‌اندازی پوشه نظارت
+        
+        Args:
+            schedule: order in which ready files are converted
+                      ('fifo', 'sjf', 'oldest', 'category')
+            queue: shared work queue (path or tcp://HOST:PORT); ready files
+                   are added to it for workers instead of converted here
+            scratch: local directory to prefetch inputs and encode into
+            scratch_budget: GB of scratch space staged files may use
+            renditions: QUALITY_PRESETS labels encoded from one decode
+            duplicates: 'skip', 'link' or 'off' for files whose content
+                        was converted before under another name
+            daemon: control address of a converter daemon; when one answers,
+                    ready files are submitted to it instead of converted here
         """
         self.watch_dir = os.path.abspath(watch_dir)
         self.output_dir = output_dir
         self.check_interval = check_interval
+        self.poll = poll
         self.processed_files = set()
         self.processing_files = set()
         
+        # Ready files wait here; the policy picks the next one after each conversion
+        self.scheduler = JobScheduler(schedule)
+        self.work_queue = open_queue(queue) if queue else None
+        self.daemon = connect_daemon(daemon) if daemon and not queue else None
+        
         # Create watch directory
         os.makedirs(self.watch_dir, exist_ok=True)
         
+        # Journal of finished/failed inputs that survives restarts
+        self.store = JobStore(os.path.join(output_dir, JOB_STORE_FILE))
+        
         # Initialize converter
-        self.converter = VideoConverter(output_dir=output_dir, verify=True)
+        self.converter = VideoConverter(
+            output_dir=output_dir, verify=True, resumable=resumable, throttle=throttle,
+            verify_mode=verify_mode, min_saving=min_saving,
+            scratch=scratch, scratch_budget=scratch_budget, renditions=renditions,
+            duplicates=duplicates
+        )
         
         logger.info(f"📁 پوشه نظارت شده: {self.watch_dir}")
         logger.info(f"📂 پوشه خروجی: {self.output_dir}")
+        if self.work_queue:
+            logger.info(f"📮 فایل‌ها به صف مشترک فرستاده می‌شوند: {queue}")
+        elif self.daemon:
+            logger.info(f"🛰️  فایل‌ها به سرویس تبدیل فرستاده می‌شوند: {daemon}")
     
     def get_video_files(self):
         """
@@ -52,10 +111,12 @@ class WatchFolder:
         """
         video_files = collect_video_files([self.watch_dir])
         
-        # Filter out files we've already processed or are processing
+        # Filter out files we've already processed or are processing,
+        # and files the journal says are done or waiting for a retry
         new_files = [
             f for f in video_files 
             if f not in self.processed_files and f not in self.processing_files
+            and f not in self.scheduler and self.store.should_process(f)
         ]
         
         return new_files
@@ -75,10 +136,94 @@ class WatchFolder:
         except OSError:
             return False
     
-    def process_file(self, filepath):
+    def is_pending(self, filepath):
+        """
+        Check if a path is a video file we haven't handled yet
+        بررسی ویدیو بودن و پردازش نشدن فایل
+        """
+        _, ext = os.path.splitext(filepath)
+        return (
+            ext.lower() in SUPPORTED_FORMATS
+            and filepath not in self.processed_files
+            and filepath not in self.processing_files
+            and filepath not in self.scheduler
+        )
+    
+    def enqueue(self, paths):
+        """
+        Probe ready files and add them to the scheduler
+        بررسی فایل‌های آماده و افزودن آن‌ها به صف زمان‌بندی
+        
+        Invalid files get no metadata (cost 0) and reach process_file
+        quickly, which rejects them.
+        """
+        for filepath in paths:
+            if filepath in self.scheduler:
+                continue
+            try:
+                validation = Validator.validate_file(filepath)
+                metadata = validation.metadata if validation else {}
+            except Exception:
+                metadata = {}
+            self.scheduler.push({'file': filepath, 'metadata': metadata})
+    
+    def publish(self, paths, wait_ready=True):
+        """
+        Probe ready files and add them to the shared work queue (or
+        submit them to the converter daemon)
+        بررسی فایل‌های آماده و افزودن آن‌ها به صف مشترک کارگرها یا سرویس تبدیل
+        """
+        entries = []
+        for filepath in paths:
+            # Still being copied; the next pass picks it up
+            if wait_ready and not self.is_file_ready(filepath):
+                continue
+            
+            try:
+                validation = Validator.validate_file(filepath)
+            except Exception as e:
+                logger.error(f"خطا در بررسی {os.path.basename(filepath)}: {str(e)}")
+                continue
+            
+            self.processed_files.add(filepath)
+            if not validation:
+                logger.error(f"❌ فایل نامعتبر است: {filepath}")
+                self.store.mark_rejected(filepath, validation.error_message)
+                continue
+            entries.append({'file': filepath, 'metadata': validation.metadata})
+        
+        if entries:
+            try:
+                if self.daemon:
+                    self.daemon.submit([entry['file'] for entry in entries])
+                else:
+                    enqueue_files(self.work_queue, entries, self.scheduler.policy)
+            except Exception as e:
+                logger.error(f"خطا در افزودن به صف مشترک: {str(e)}")
+                for entry in entries:
+                    self.processed_files.discard(entry['file'])
+    
+    def process_next(self, wait_ready=True):
+        """
+        Convert the queued file the scheduling policy picks
+        تبدیل فایل بعدی صف بر اساس سیاست زمان‌بندی
+        """
+        entry = self.scheduler.pop()
+        self.converter.prefetch_next(self.scheduler)
+        if entry and os.path.exists(entry['file']):
+            self.process_file(entry['file'], wait_ready=wait_ready)
+        
+        if not len(self.scheduler):
+            log_probe_cache_stats()
+    
+    def process_file(self, filepath, wait_ready=True):
         """
         Process a single video file
         پردازش یک فایل ویدیو
+        
+        Args:
+            wait_ready: poll the file size first; not needed when a
+                        close/rename event already says the copy is done
         """
         filename = os.path.basename(filepath)
         max_retries = 2
@@ -92,10 +237,13 @@ class WatchFolder:
         
         try:
             # Wait for file to be completely copied
-            logger.info("⏳ در انتظار کامل شدن کپی فایل...")
-            if not self.is_file_ready(filepath, wait_time=3):
-                logger.warning("⚠️  فایل هنوز در حال کپی است، صبر می‌کنیم...")
-                time.sleep(5)
+            if wait_ready:
+                logger.info("⏳ در انتظار کامل شدن کپی فایل...")
+                if not self.is_file_ready(filepath, wait_time=3):
+                    logger.warning("⚠️  فایل هنوز در حال کپی است، صبر می‌کنیم...")
+                    time.sleep(5)
+            
+            self.store.mark_processing(filepath)
             
             # --- Check if already converted ---
             # We need to determine the expected output path first
@@ -104,6 +252,7 @@ class WatchFolder:
             if not validation:
                 logger.error(f"❌ فایل نامعتبر است: {filepath}")
                 self.processed_files.add(filepath) # Mark as processed to avoid infinite loop
+                self.store.mark_rejected(filepath, validation.error_message)
                 return
 
             # Determine output path
@@ -128,6 +277,7 @@ class WatchFolder:
                     logger.info(f"✅ فایل قبلاً با موفقیت تبدیل شده است (زمان: {format_time(output_duration)})")
                     logger.info("⏭️  عبور از این فایل...")
                     self.processed_files.add(filepath)
+                    self.store.mark_done(filepath, output_file)
                     return
                 else:
                     logger.warning(f"⚠️  فایل خروجی ناقص است (اصلی: {format_time(input_duration)}, خروجی: {format_time(output_duration)})")
@@ -146,10 +296,20 @@ class WatchFolder:
                     logger.warning(f"🔄 تلاش مجدد {attempt}/{max_retries} برای {filename}...")
                 
                 # Convert file
-                success = self.converter.convert_single_file(filepath)
+                job = {}
+                success = self.converter.convert_single_file(filepath, job=job)
                 
                 if success:
                     break
+                if job['status'] == 'skipped':
+                    # Predicted not to shrink enough; retrying won't change that
+                    self.processed_files.add(filepath)
+                    self.store.mark_rejected(filepath, job['error'])
+                    return
+                elif job.get('error') == MESSAGES['disk_full']:
+                    # Another attempt now would fail the same way; the
+                    # journal retries after its backoff
+                    break
                 else:
                     logger.error(f"❌ تلاش {attempt} ناموفق بود.")
                     if attempt < max_retries:
@@ -159,20 +319,17 @@ class WatchFolder:
                 logger.info(f"✅ پردازش موفق: {filename}")
                 # Do NOT move the file, just mark as processed
                 self.processed_files.add(filepath)
+                self.store.mark_done(filepath, output_file)
             else:
                 logger.error(f"❌ پردازش ناموفق برای: {filename}")
-                # Do NOT move the file. 
-                # We do NOT add to processed_files so it might be retried later if script restarts,
-                # but for this session we should probably avoid infinite loop?
-                # User said: "if failed... check first...".
-                # If we don't add to processed_files, it will be picked up again in next loop (5 sec later).
-                # That would cause infinite loop of failures.
-                # So we SHOULD add to processed_files (or a failed_files set) to ignore it for THIS session.
-                self.processed_files.add(filepath) 
+                # Do NOT move the file and do NOT add to processed_files:
+                # the journal holds it back until its retry backoff expires,
+                # in this session and after a restart.
+                self.store.mark_failed(filepath, job.get('error') or MESSAGES['conversion_failed'])
                 
         except Exception as e:
             logger.error(f"خطا در پردازش {filename}: {str(e)}")
-            self.processed_files.add(filepath) # Avoid getting stuck on this file
+            self.store.mark_failed(filepath, str(e))  # Backoff avoids getting stuck on this file
         finally:
             # Remove from processing set
             self.processing_files.discard(filepath)
@@ -187,31 +344,137 @@ class WatchFolder:
         logger.info(f"{'='*60}")
         logger.info(f"📌 فایل‌های ویدیو را در این پوشه قرار دهید:")
         logger.info(f"   {self.watch_dir}")
-        logger.info(f"\n💡 برنامه هر {self.check_interval} ثانیه پوشه را بررسی می‌کند")
-        logger.info(f"⏸️  برای توقف: Ctrl+C\n")
+        
+        watcher = None if self.poll else InotifyWatcher.create(self.watch_dir)
         
         try:
-            while True:
-                # Check for new files
-                # logger.debug("Scanning for files...")
-                new_files = self.get_video_files()
-                
-                if new_files:
-                    logger.info(f"🔔 {len(new_files)} فایل جدید یافت شد!")
-                    logger.debug(f"Files: {new_files}")
-                    
-                    for filepath in new_files:
-                        self.process_file(filepath)
-                else:
-                    # logger.debug("No new files found.")
-                    pass
-                
-                # Wait before next check
-                time.sleep(self.check_interval)
+            if watcher:
+                logger.info(f"\n💡 فایل‌های جدید بلافاصله پس از پایان کپی پردازش می‌شوند (inotify)")
+                logger.info(f"⏸️  برای توقف: Ctrl+C\n")
+                self._watch_events(watcher)
+            else:
+                logger.info(f"\n💡 برنامه هر {self.check_interval} ثانیه پوشه را بررسی می‌کند")
+                logger.info(f"⏸️  برای توقف: Ctrl+C\n")
+                self._watch_polling()
                 
         except KeyboardInterrupt:
             logger.info("\n\n🛑 حالت نظارت متوقف شد")
             logger.info(f"📊 تعداد فایل‌های پردازش شده: {len(self.processed_files)}")
+            log_probe_cache_stats()
+        finally:
+            if watcher:
+                watcher.close()
+    
+    def _watch_polling(self):
+        """
+        Re-scan the watch folder every check_interval seconds
+        بررسی دوره‌ای پوشه نظارت
+        """
+        while True:
+            # Check for new files
+            new_files = self.get_video_files()
+            
+            if new_files:
+                logger.info(f"🔔 {len(new_files)} فایل جدید یافت شد!")
+                log_debug("Files: %s", new_files)
+                if self.work_queue or self.daemon:
+                    self.publish(new_files)
+                else:
+                    self.enqueue(new_files)
+                    self.scheduler.log_queue()
+            
+            # One file per pass, so files found meanwhile compete for the next turn
+            if len(self.scheduler):
+                self.process_next()
+                continue
+            
+            # Wait before next check
+            time.sleep(self.check_interval)
+    
+    def _watch_events(self, watcher):
+        """
+        React to inotify events instead of re-scanning the tree
+        واکنش به رویدادهای inotify به جای بررسی دوباره کل پوشه
+        
+        A file is ready when its writer closes it (IN_CLOSE_WRITE) or it is
+        renamed into place (IN_MOVED_TO). Files found by a scan, which may
+        have been opened before we started watching, are ready once they
+        see no writes for WATCH_SETTLE_SECONDS.
+        """
+        settling = {}     # path -> time of last write activity
+        open_files = set()  # created while watched; wait for close
+        
+        def settle(paths):
+            for filepath in paths:
+                if filepath not in open_files:
+                    try:
+                        settling.setdefault(filepath, os.path.getmtime(filepath))
+                    except OSError:
+                        pass
+        
+        # Files already in the folder
+        settle(self.get_video_files())
+        
+        while True:
+            ready = []
+            
+            # Don't wait for events while converted files are queued
+            timeout = 0 if len(self.scheduler) else 1.0
+            for path, mask in watcher.read_events(timeout=timeout):
+                if path is None:
+                    # Kernel queue overflowed; events were lost
+                    logger.warning("صف رویدادهای inotify سرریز شد، بررسی کامل پوشه...")
+                    settle(self.get_video_files())
+                    continue
+                
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        settle(f for f in collect_video_files([path]) if self.is_pending(f))
+                    continue
+                
+                path = os.path.abspath(path)
+                if not self.is_pending(path):
+                    continue
+                
+                if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    settling.pop(path, None)
+                    open_files.discard(path)
+                    if path not in ready:
+                        ready.append(path)
+                elif mask & IN_CREATE:
+                    settling.pop(path, None)
+                    open_files.add(path)
+                elif mask & IN_MODIFY and path not in open_files:
+                    settling[path] = time.time()
+            
+            now = time.time()
+            for path, last_write in list(settling.items()):
+                if now - last_write >= WATCH_SETTLE_SECONDS:
+                    del settling[path]
+                    if path not in ready:
+                        ready.append(path)
+            
+            # Failed files whose retry backoff has expired
+            for path in self.store.due_retries():
+                if path not in ready and path not in settling:
+                    ready.append(path)
+            
+            ready = [
+                f for f in ready
+                if os.path.exists(f) and self.is_pending(f) and self.store.should_process(f)
+            ]
+            if ready:
+                logger.info(f"🔔 {len(ready)} فایل جدید یافت شد!")
+                if self.work_queue or self.daemon:
+                    self.publish(ready, wait_ready=False)
+                else:
+                    self.enqueue(ready)
+                    self.scheduler.log_queue()
+            
+            # One file per pass, so files that become ready meanwhile
+            # compete for the next turn
+            if len(self.scheduler):
+                self.process_next(wait_ready=False)
 
 
 def main():
@@ -246,18 +509,202 @@ def main():
         '-i', '--interval',
         type=int,
         default=5,
-        help='زمان بررسی به ثانیه (پیش‌فرض: 5)'
+        help='زمان بررسی به ثانیه در حالت بررسی دوره‌ای (پیش‌فرض: 5)'
+    )
+    
+    parser.add_argument(
+        '--poll',
+        action='store_true',
+        help='استفاده از بررسی دوره‌ای به جای inotify (مثلاً برای پوشه‌های شبکه)'
+    )
+    
+    parser.add_argument(
+        '--no-probe-cache',
+        action='store_true',
+        help='بدون کش اطلاعات ffprobe'
+    )
+    
+    parser.add_argument(
+        '--no-scan-index',
+        action='store_true',
+        help='خواندن دوباره همه پوشه‌ها در هر بررسی، بدون فهرست پوشه‌های بدون تغییر'
+    )
+    
+    parser.add_argument(
+        '--resumable',
+        action='store_true',
+        help='تبدیل در قطعه‌های نقطه بازیابی تا تلاش مجدد از همان‌جا ادامه یابد'
+    )
+    
+    parser.add_argument(
+        '--verify',
+        choices=VERIFY_MODES,
+        default=VERIFY_MODE,
+        help='نوع بررسی خروجی: basic (اطلاعات فایل)، sampled (رمزگشایی نمونه‌ای)، full (رمزگشایی کامل)'
+    )
+    
+    parser.add_argument(
+        '--min-saving',
+        type=float,
+        default=PREDICT_MIN_SAVING_PERCENT,
+        metavar='PERCENT',
+        help='پیش‌بینی حجم با تبدیل نمونه‌ها و رد فایل‌هایی که کمتر از این درصد کوچک می‌شوند (پیش‌فرض: خاموش)'
+    )
+    
+    parser.add_argument(
+        '--no-throttle',
+        action='store_true',
+        help='عدم کاهش سرعت تبدیل‌ها هنگام نیاز سایر برنامه‌ها به منابع'
+    )
+    
+    parser.add_argument(
+        '--schedule',
+        choices=SCHEDULER_POLICIES,
+        default=SCHEDULER_POLICY,
+        help=f'ترتیب تبدیل فایل‌ها: fifo، sjf (کوتاه‌ترین اول)، oldest (قدیمی‌ترین اول)، category (بر اساس نوع) (پیش‌فرض: {SCHEDULER_POLICY})'
+    )
+    
+    parser.add_argument(
+        '--queue',
+        metavar='PATH|tcp://HOST:PORT',
+        help='فرستادن فایل‌های آماده به صف مشترک کارگرها به جای تبدیل در همین دستگاه'
+    )
+    
+    parser.add_argument(
+        '--daemon-address',
+        metavar='SOCKET|tcp://HOST:PORT',
+        help='نشانی سرویس تبدیل (پیش‌فرض: .daemon.sock در پوشه خروجی)'
+    )
+    
+    parser.add_argument(
+        '--no-daemon',
+        action='store_true',
+        help='تبدیل در همین برنامه حتی اگر سرویس تبدیل در حال اجرا باشد'
+    )
+    
+    parser.add_argument(
+        '--duplicates',
+        choices=DUPLICATE_ACTIONS,
+        default=DUPLICATE_ACTION,
+        help=f'فایل‌هایی که محتوای آن‌ها قبلاً تبدیل شده: skip، link (لینک سخت)، off (پیش‌فرض: {DUPLICATE_ACTION})'
+    )
+    
+    parser.add_argument(
+        '--renditions',
+        metavar='LIST',
+        help='ساخت چند کیفیت از یک بار رمزگشایی، مثلاً 1080p,720p'
+    )
+    
+    parser.add_argument(
+        '--scratch',
+        metavar='DIR',
+        help='پوشه موقت روی دیسک محلی سریع برای پیش‌خوانی ورودی‌ها و نوشتن خروجی پیش از انتقال به مقصد'
+    )
+    
+    parser.add_argument(
+        '--scratch-budget',
+        type=float,
+        default=STAGING_BUDGET_GB,
+        metavar='GB',
+        help=f'حداکثر فضای قابل استفاده در پوشه موقت (پیش‌فرض: {STAGING_BUDGET_GB} GB)'
+    )
+    
+    parser.add_argument(
+        '--min-free-disk',
+        type=float,
+        default=DISK_MIN_FREE_GB,
+        metavar='GB',
+        help=f'فضای آزادی که هر تبدیل جدید باید روی دیسک خروجی باقی بگذارد (پیش‌فرض: {DISK_MIN_FREE_GB} GB)'
+    )
+    
+    parser.add_argument(
+        '--metrics',
+        metavar='PATH',
+        help='ثبت زمان مراحل و معیارهای هر فایل (JSONL، یا متن Prometheus اگر با .prom تمام شود)'
+    )
+    
+    parser.add_argument(
+        '--log-format',
+        choices=LOG_FORMATS,
+        default='text',
+        help='قالب لاگ اصلی: text یا jsonl با شناسه هر کار'
+    )
+    
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='نمایش اطلاعات تفصیلی'
+    )
+    
+    parser.add_argument(
+        '--retry-failed',
+        action='store_true',
+        help='تلاش مجدد برای فایل‌هایی که قبلاً ناموفق بوده‌اند'
     )
     
     args = parser.parse_args()
     
+    # Log files are written by a background thread and rotated
+    configure_logging(log_format=args.log_format, verbose=args.verbose)
+    
+    try:
+        renditions = parse_renditions(args.renditions) if args.renditions else None
+    except ValueError:
+        parser.error(f"مقدار نامعتبر برای --renditions: {args.renditions}")
+    
+    # Categorizer only computes paths; folders appear when outputs are written
+    install_lazy_output_dirs()
+    
+    # Keep the full stream list so each stream can be copied, converted or dropped
+    install_stream_probe()
+    
+    # Reuse ffprobe results across restarts and repeated checks
+    if not args.no_probe_cache:
+        enable_probe_cache(args.output)
+    
+    # The same release arriving again under another name is not re-encoded
+    if args.duplicates != 'off':
+        enable_fingerprint_index(args.output)
+    
+    # Encode speed and output bitrate for video_converter.py --plan
+    enable_encode_history(args.output)
+    
+    # Reserve output space per filesystem before each encode starts
+    enable_disk_guard(args.min_free_disk)
+    
+    # Re-scans only list folders whose contents changed
+    if not args.no_scan_index:
+        enable_scan_index(args.output)
+    
+    # Sample CPU/memory/disk in the background so resource checks never block
+    start_resource_sampler(args.output)
+    
+    if args.metrics:
+        enable_metrics(args.metrics)
+    
     # Create and start watcher
     watcher = WatchFolder(
         watch_dir=args.watch,
         output_dir=args.output,
-        check_interval=args.interval
+        check_interval=args.interval,
+        poll=args.poll,
+        resumable=args.resumable,
+        throttle=not args.no_throttle,
+        verify_mode=args.verify,
+        min_saving=args.min_saving,
+        schedule=args.schedule,
+        queue=args.queue,
+        scratch=args.scratch,
+        scratch_budget=args.scratch_budget,
+        renditions=renditions,
+        duplicates=args.duplicates,
+        daemon=None if args.no_daemon else args.daemon_address or default_address(args.output)
     )
     
+    if args.retry_failed:
+        count = watcher.store.reset_failed()
+        logger.info(f"🔁 {count} فایل ناموفق دوباره در صف قرار گرفت")
+    
     watcher.watch()
 
 
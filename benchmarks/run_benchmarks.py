@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Encode throughput benchmarks
+بنچمارک سرعت تبدیل
+
+Runs the real conversion path (JobConverter, DecodeVerifier) on synthetic
+lavfi clips or on a given file and writes the results to a JSON file that
+can be compared with an earlier run to catch regressions.
+
+Scenarios:
+    encode    every clip x every distinct QUALITY_PRESETS entry x thread count
+    jobs      N concurrent jobs sharing the thread budget (N x budget/N)
+    verify    basic / sampled / full verification of each encode
+    progress  cost of parsing and drawing -progress blocks
+
+Usage:
+    python3 benchmarks/run_benchmarks.py
+    python3 benchmarks/run_benchmarks.py --source input_test.mp4
+    python3 benchmarks/run_benchmarks.py --resolutions 720p --duration 10
+    python3 benchmarks/run_benchmarks.py --compare benchmarks/results/previous.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import subprocess
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import QUALITY_PRESETS, FFMPEG_BINARY  # noqa: E402
+from modules.logger import logger  # noqa: E402
+from modules.validator import Validator  # noqa: E402
+from modules.resource_manager import ResourceManager  # noqa: E402
+from modules.resource_sampler import start_resource_sampler  # noqa: E402
+from modules.job_pool import JobConverter  # noqa: E402
+from modules.decode_verifier import DecodeVerifier, VERIFY_MODES  # noqa: E402
+from modules.progress_stream import ProgressBlockParser, FastProgressTracker  # noqa: E402
+from modules.stream_planner import install_stream_probe  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CLIP_DIR = os.path.join(BENCH_DIR, '.clips')
+WORK_DIR = os.path.join(BENCH_DIR, '.work')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '2160p': (3840, 2160)
+}
+CLIP_FPS = 24
+
+
+def children_cpu_seconds():
+    """User + system CPU time of finished child processes"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def ffmpeg_version():
+    try:
+        result = subprocess.run([FFMPEG_BINARY, '-version'], capture_output=True, text=True)
+        return result.stdout.splitlines()[0]
+    except (OSError, IndexError):
+        return 'unknown'
+
+
+def make_clip(resolution, duration):
+    """
+    Generate (or reuse) a synthetic H.264 clip with a sine audio track
+    ساخت کلیپ آزمایشی با منابع lavfi
+    """
+    width, height = RESOLUTIONS[resolution]
+    os.makedirs(CLIP_DIR, exist_ok=True)
+    path = os.path.join(CLIP_DIR, f"testsrc2_{resolution}_{duration}s.mp4")
+    if os.path.exists(path):
+        return path
+
+    cmd = [
+        FFMPEG_BINARY, '-nostdin', '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f"testsrc2=size={width}x{height}:rate={CLIP_FPS}:duration={duration}",
+        '-f', 'lavfi', '-i', f"sine=frequency=440:duration={duration}",
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '18', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-b:a', '128k',
+        path + '.part.mp4'
+    ]
+    subprocess.run(cmd, check=True)
+    os.replace(path + '.part.mp4', path)
+    return path
+
+
+def distinct_presets():
+    """QUALITY_PRESETS keys with distinct settings ('default' mirrors '1080p')"""
+    seen = {}
+    for name, preset in QUALITY_PRESETS.items():
+        key = (preset['crf'], preset['preset'])
+        if key not in seen:
+            seen[key] = name
+    return list(seen.values())
+
+
+def run_encode(clip, metadata, quality, threads, tag):
+    """
+    Convert one clip and return its result record
+    تبدیل یک کلیپ و بازگرداندن نتیجه
+    """
+    output = os.path.join(WORK_DIR, f"{tag}.mkv")
+    converter = JobConverter(clip, output, dict(metadata, quality=quality), threads=threads)
+
+    cpu_before = children_cpu_seconds()
+    start = time.time()
+    success = converter.convert()
+    wall = time.time() - start
+    # convert() turns the console back on once its bar is closed
+    logger.disable_console()
+
+    return {
+        'success': success,
+        'output': output,
+        'wall': wall,
+        'cpu': children_cpu_seconds() - cpu_before
+    }
+
+
+def encode_record(name, clip, metadata, frames, wall, cpu, output_sizes, **extra):
+    duration = metadata.get('duration', 0)
+    input_size = os.path.getsize(clip) * len(output_sizes)
+    output_size = sum(output_sizes)
+    record = {
+        'name': name,
+        'clip': os.path.basename(clip),
+        'wall_seconds': round(wall, 3),
+        'fps': round(frames * len(output_sizes) / wall, 2) if wall else 0.0,
+        'cpu_seconds_per_output_minute': round(cpu / (duration * len(output_sizes) / 60), 2) if duration else 0.0,
+        'input_bytes': input_size,
+        'output_bytes': output_size,
+        'bytes_saved': input_size - output_size
+    }
+    record.update(extra)
+    return record
+
+
+def bench_encode(clips, thread_counts):
+    results = []
+    outputs = []
+
+    for clip, metadata, frames in clips:
+        for quality in distinct_presets():
+            preset = QUALITY_PRESETS[quality]
+            for threads in thread_counts:
+                tag = f"encode_{os.path.basename(clip)}_{quality}_t{threads}"
+                run = run_encode(clip, metadata, quality, threads, tag)
+                if not run['success']:
+                    logger.error(f"Benchmark encode failed: {tag}")
+                    continue
+
+                results.append(encode_record(
+                    f"encode:{os.path.basename(clip)}:{quality}:t{threads}",
+                    clip, metadata, frames, run['wall'], run['cpu'],
+                    [os.path.getsize(run['output'])],
+                    scenario='encode', preset=preset['preset'], crf=preset['crf'],
+                    threads=threads, jobs=1
+                ))
+                outputs.append((clip, metadata, run['output']))
+                print_record(results[-1])
+
+    return results, outputs
+
+
+def bench_jobs(clip, metadata, frames, budget, job_counts):
+    """
+    N concurrent conversions of the same clip, budget // N threads each
+    N تبدیل هم‌زمان با تقسیم بودجه رشته‌ها
+    """
+    results = []
+    quality = metadata.get('quality', '1080p')
+
+    for jobs in job_counts:
+        threads = max(1, budget // jobs)
+        runs = [None] * jobs
+
+        def worker(index):
+            runs[index] = run_encode(clip, metadata, quality, threads, f"jobs_j{jobs}_{index}")
+
+        cpu_before = children_cpu_seconds()
+        start = time.time()
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(jobs)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        wall = time.time() - start
+        cpu = children_cpu_seconds() - cpu_before
+
+        if not all(run and run['success'] for run in runs):
+            logger.error(f"Benchmark jobs={jobs} failed")
+            continue
+
+        results.append(encode_record(
+            f"jobs:{os.path.basename(clip)}:j{jobs}xt{threads}",
+            clip, metadata, frames, wall, cpu,
+            [os.path.getsize(run['output']) for run in runs],
+            scenario='jobs', threads=threads, jobs=jobs
+        ))
+        print_record(results[-1])
+
+    return results
+
+
+def bench_verify(outputs, modes):
+    results = []
+    for clip, metadata, output in outputs:
+        for mode in modes:
+            cpu_before = children_cpu_seconds()
+            valid, elapsed = DecodeVerifier.verify_output(output, metadata.get('duration'), mode=mode)
+            if not valid:
+                logger.error(f"Benchmark verification failed: {output} ({mode})")
+                break
+            results.append({
+                'name': f"verify:{os.path.basename(output)}:{mode}",
+                'scenario': 'verify',
+                'mode': mode,
+                'wall_seconds': round(elapsed, 3),
+                'cpu_seconds': round(children_cpu_seconds() - cpu_before, 3)
+            })
+            print_record(results[-1])
+    return results
+
+
+def bench_progress(blocks=20000):
+    """
+    Time the -progress parsing path with and without drawing
+    زمان‌سنجی تجزیه و رسم بلوک‌های پیشرفت
+    """
+    lines = []
+    for i in range(blocks):
+        lines.extend([
+            f"frame={i}", "fps=48.0", "bitrate=1200.0kbits/s",
+            f"out_time_us={i * 41708}", "speed=2.0x", "progress=continue"
+        ])
+
+    results = []
+    with open(os.devnull, 'w') as devnull:
+        for name, force_render in (('throttled', False), ('every_block', True)):
+            tracker = FastProgressTracker(duration=blocks / CLIP_FPS, filename='bench.mkv', quality='1080p')
+            tracker.out = devnull
+            tracker.is_tty = True
+
+            parser = ProgressBlockParser()
+            start = time.perf_counter()
+            for line in lines:
+                block = parser.feed(line)
+                if block is not None:
+                    if force_render:
+                        tracker.last_render = 0.0
+                    tracker.update_block(block)
+            elapsed = time.perf_counter() - start
+
+            results.append({
+                'name': f"progress:{name}",
+                'scenario': 'progress',
+                'blocks': blocks,
+                'wall_seconds': round(elapsed, 4),
+                'us_per_block': round(elapsed / blocks * 1e6, 2)
+            })
+            print_record(results[-1])
+
+    return results
+
+
+def print_record(record):
+    if 'fps' in record:
+        print(
+            f"  {record['name']:<48} {record['fps']:8.2f} fps  {record['wall_seconds']:8.2f}s  "
+            f"{record['cpu_seconds_per_output_minute']:8.2f} cpu-s/min  "
+            f"{record['bytes_saved'] / (1024 ** 2):8.1f} MB saved"
+        )
+    elif 'us_per_block' in record:
+        print(f"  {record['name']:<48} {record['us_per_block']:8.2f} us/block")
+    else:
+        print(f"  {record['name']:<48} {record['wall_seconds']:8.2f}s  {record['cpu_seconds']:8.2f} cpu-s")
+
+
+def compare(results, previous_path, tolerance):
+    """
+    Compare with an earlier results file; return the list of regressions
+    مقایسه با نتایج قبلی و بازگرداندن موارد افت کارایی
+    """
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = {r['name']: r for r in json.load(f).get('results', [])}
+
+    regressions = []
+    print(f"\nComparison with {previous_path} (tolerance {tolerance:g}%):")
+    for record in results:
+        old = previous.get(record['name'])
+        if old is None:
+            continue
+
+        # Higher fps is better; for everything else lower wall time is better
+        if 'fps' in record and old.get('fps'):
+            change = (record['fps'] - old['fps']) / old['fps'] * 100
+        elif old.get('wall_seconds'):
+            change = (old['wall_seconds'] - record['wall_seconds']) / old['wall_seconds'] * 100
+        else:
+            continue
+
+        flag = 'REGRESSION' if change < -tolerance else ''
+        print(f"  {record['name']:<48} {change:+7.1f}%  {flag}")
+        if flag:
+            regressions.append(record['name'])
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Encode throughput benchmarks')
+    parser.add_argument('--source', help='Benchmark this file instead of synthetic clips')
+    parser.add_argument(
+        '--resolutions', default='720p,1080p,2160p',
+        help='Synthetic clip resolutions (default: 720p,1080p,2160p)'
+    )
+    parser.add_argument('--duration', type=int, default=20, help='Synthetic clip length in seconds')
+    parser.add_argument(
+        '--threads', default='auto',
+        help="Comma separated thread counts; 'auto' = get_recommended_threads()"
+    )
+    parser.add_argument('--jobs', default='1,2,4', help='Concurrent job counts for the jobs scenario')
+    parser.add_argument(
+        '--verify-modes', default=','.join(VERIFY_MODES),
+        help='Verification modes to time (default: basic,sampled,full)'
+    )
+    parser.add_argument('--skip', default='', help='Scenarios to skip: encode,jobs,verify,progress')
+    parser.add_argument('--output', help='Results JSON path (default: benchmarks/results/<time>.json)')
+    parser.add_argument('--compare', help='Earlier results JSON to compare with')
+    parser.add_argument('--tolerance', type=float, default=10.0, help='Allowed slowdown in percent')
+    parser.add_argument('--keep', action='store_true', help='Keep encoded outputs')
+    args = parser.parse_args()
+
+    skip = set(filter(None, args.skip.split(',')))
+
+    install_stream_probe()
+    start_resource_sampler(ROOT)
+    budget = ResourceManager.get_recommended_threads()
+    thread_counts = [
+        budget if value == 'auto' else int(value)
+        for value in args.threads.split(',')
+    ]
+    cpu_count = os.cpu_count() or 1
+    job_counts = [int(j) for j in args.jobs.split(',') if int(j) <= cpu_count]
+
+    os.makedirs(WORK_DIR, exist_ok=True)
+    logger.disable_console()
+
+    sources = [args.source] if args.source else [
+        make_clip(resolution, args.duration) for resolution in args.resolutions.split(',')
+    ]
+
+    clips = []
+    for path in sources:
+        validation = Validator.validate_file(path)
+        if not validation:
+            print(f"Skipping {path}: {validation.error_message}")
+            continue
+        duration, fps = DecodeVerifier._probe_timing(path)
+        clips.append((path, validation.metadata, duration * fps))
+
+    if not clips:
+        print("No usable benchmark sources")
+        return 1
+
+    results = []
+    outputs = []
+    try:
+        if 'encode' not in skip:
+            print("\nencode:")
+            encode_results, outputs = bench_encode(clips, thread_counts)
+            results.extend(encode_results)
+
+        if 'jobs' not in skip:
+            print(f"\njobs (thread budget {budget}):")
+            # The middle clip keeps this scenario affordable
+            clip, metadata, frames = clips[len(clips) // 2]
+            results.extend(bench_jobs(clip, metadata, frames, budget, job_counts))
+
+        if 'verify' not in skip and outputs:
+            print("\nverify:")
+            # Verify the first encode of each clip only
+            first = {}
+            for clip, metadata, output in outputs:
+                first.setdefault(clip, (clip, metadata, output))
+            results.extend(bench_verify(first.values(), args.verify_modes.split(',')))
+
+        if 'progress' not in skip:
+            print("\nprogress:")
+            results.extend(bench_progress())
+    finally:
+        logger.enable_console()
+        if not args.keep:
+            shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': cpu_count,
+            'ffmpeg': ffmpeg_version(),
+            'thread_budget': budget
+        },
+        'results': results
+    }
+
+    output_path = args.output
+    if not output_path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, time.strftime('%Y%m%d_%H%M%S') + '.json')
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {output_path}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s)")
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
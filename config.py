@@ -28,6 +28,10 @@ QUALITY_PRESETS = {
 # Audio settings
 AUDIO_CODEC = 'aac'
 AUDIO_BITRATE = '192k'
+# Audio tracks in these codecs are copied instead of re-encoded when their
+# bitrate is at most AUDIO_BITRATE x AUDIO_COPY_MAX_RATIO
+AUDIO_COPY_CODECS = ('aac', 'opus', 'vorbis', 'mp3', 'ac3', 'eac3')
+AUDIO_COPY_MAX_RATIO = 1.5
 
 # Output settings
 OUTPUT_EXTENSION = '.mkv'
@@ -41,6 +45,29 @@ OUTPUT_FOLDERS = {
 MAX_CPU_PERCENT = 80
 MIN_AVAILABLE_MEMORY_GB = 2
 
+# Background resource sampler
+# ResourceManager reads smoothed values from a ring buffer instead of
+# blocking for a second in psutil.cpu_percent(interval=1)
+RESOURCE_SAMPLE_INTERVAL = 1.0  # seconds between samples
+RESOURCE_HISTORY_SECONDS = 600  # length of the ring buffer
+RESOURCE_SMOOTHING = 0.3  # EMA weight of the newest sample
+
+# In-flight throttling
+# Encodes are throttled only when *other* programs need the CPU or memory
+# runs low; MAX_CPU_PERCENT and MIN_AVAILABLE_MEMORY_GB are the targets
+THROTTLE_INTERVAL = 2  # seconds between checks
+THROTTLE_ESCALATE_SECONDS = 10  # sustained pressure before each tightening step
+THROTTLE_RELAX_SECONDS = 30  # sustained calm before each relaxing step
+THROTTLE_FOREIGN_CPU_PERCENT = 10  # CPU used by other programs that counts as pressure
+THROTTLE_CPU_HYSTERESIS = 10  # percent below MAX_CPU_PERCENT to relax
+THROTTLE_MEMORY_HYSTERESIS_GB = 0.5  # GB above MIN_AVAILABLE_MEMORY_GB to relax
+THROTTLE_NICE = 19  # niceness of throttled encoders
+
+# Parallel jobs (--jobs)
+# x265 with the veryfast preset stops scaling well beyond ~8 threads,
+# so '--jobs auto' runs one job per THREADS_PER_JOB logical cores
+THREADS_PER_JOB = 8
+
 # Series patterns (regex)
 SERIES_PATTERNS = [
     r'[Ss](\d{1,2})[Ee](\d{1,2})',  # S01E01, s01e01
@@ -56,6 +83,115 @@ LOG_FILE = 'conversion.log'
 ERROR_LOG_FILE = 'errors.log'
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+LOG_JSON_FILE = 'conversion.jsonl'  # main log with --log-format jsonl
+LOG_FILE_LEVEL = 'INFO'  # DEBUG with --verbose
+LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate at this size...
+LOG_ROTATE_SECONDS = 7 * 86400  # ...or at this age
+LOG_BACKUP_COUNT = 5
+
+# Watch mode job journal (stored under the output folder)
+JOB_STORE_FILE = '.jobs.sqlite'
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_SECONDS = 60         # doubled after every failed attempt
+JOB_RETRY_MAX_SECONDS = 6 * 3600
+
+# Multi-node work queue (--queue): jobs are leased to one worker at a time.
+# Workers renew their lease every QUEUE_LEASE_SECONDS / 3; a lease that is
+# not renewed expires and the job goes back to the queue
+QUEUE_LEASE_SECONDS = 120
+QUEUE_POLL_SECONDS = 10  # idle worker wait between claim attempts
+QUEUE_MAX_ATTEMPTS = 3  # leases per job before it is marked failed
+QUEUE_SERVER_HOST = '127.0.0.1'
+
+# Converter daemon (--daemon): control socket under the output folder
+DAEMON_SOCKET_FILE = '.daemon.sock'
+DAEMON_KEEP_RESULTS = 1000  # finished jobs remembered for status queries
+DAEMON_POLL_SECONDS = 2  # client wait between batch status checks
+
+# Watch mode: quiet period before a file found by a scan (not by a
+# close/rename event) is treated as fully copied
+WATCH_SETTLE_SECONDS = 2
+
+# Segment-parallel encoding (--segments): shortest piece worth cutting
+SEGMENT_MIN_SECONDS = 120
+
+# Resumable encodes (--resumable): length of each committed checkpoint piece
+CHECKPOINT_SECONDS = 600
+
+# Pre-scan: concurrent ffprobe processes used to plan a batch
+PRESCAN_WORKERS = 8
+
+# Probe cache (ffprobe results stored under the output folder)
+PROBE_CACHE_FILE = '.probe_cache.sqlite'
+PROBE_CACHE_MAX_ENTRIES = 50000
+PROBE_CACHE_MAX_AGE_DAYS = 30
+
+# Directory index for repeat scans (stored under the output folder)
+SCAN_INDEX_FILE = '.scan_index.sqlite'
+SCAN_INDEX_MAX_AGE_DAYS = 30  # listings older than this are read again
+SCAN_INDEX_RACY_SECONDS = 2  # don't trust listings of directories changed this recently
+SCAN_INDEX_COMMIT_EVERY = 500  # directories written per transaction
+
+# Duplicate detection (stored under the output folder): a fingerprint is the
+# size, the duration and a hash of FINGERPRINT_CHUNKS chunks at fixed offsets
+FINGERPRINT_FILE = '.fingerprints.sqlite'
+FINGERPRINT_CHUNKS = 8
+FINGERPRINT_CHUNK_SIZE = 64 * 1024
+DUPLICATE_ACTION = 'skip'  # 'skip', 'link' (hard-link the earlier output) or 'off'
+
+# Encode history for --plan estimates (stored under the output folder)
+ENCODE_HISTORY_FILE = '.encode_history.sqlite'
+ENCODE_HISTORY_DECAY = 0.8  # weight kept by older runs at each new sample
+# Estimates before any history exists: media seconds encoded per second
+# (by source quality) and output kbps (by QUALITY_PRESETS label)
+PLAN_DEFAULT_SPEED = {'4K': 0.3, '2K': 0.8, '1080p': 1.5, '720p': 3.0, '480p': 5.0, 'SD': 8.0}
+PLAN_DEFAULT_KBPS = {'720p': 1400, '1080p': 2400}
+
+# Disk-space admission: each job reserves its estimated output size on the
+# output (and scratch) filesystem before it starts
+DISK_MIN_FREE_GB = 2  # free space a new job must leave (--min-free-disk)
+DISK_ABORT_FREE_MB = 256  # running encodes are stopped below this
+DISK_RESERVE_MARGIN = 1.25  # reservation = estimated output size x margin
+DISK_CHECK_SECONDS = 5  # watcher interval and wait between admission attempts
+
+# Local scratch staging (--scratch): inputs are prefetched and outputs
+# encoded there while they fit the budget and leave STAGING_MIN_FREE_GB free
+STAGING_BUDGET_GB = 100
+STAGING_MIN_FREE_GB = 5
+
+# Progress display: minimum seconds between redraws of the bar
+PROGRESS_REFRESH_SECONDS = 0.25
+
+# Output verification (--verify)
+# 'basic' checks metadata only; 'sampled' also decodes K short windows
+# concurrently; 'full' decodes the whole video stream
+VERIFY_MODE = 'basic'
+VERIFY_SAMPLE_WINDOWS = 8
+VERIFY_SAMPLE_SECONDS = 2
+VERIFY_SAMPLE_WORKERS = 4  # concurrent decoder processes
+VERIFY_FRAME_TOLERANCE = 0.05  # fraction of frames a window may be short
+VERIFY_WINDOW_TIMEOUT = 120  # seconds per sampled window
+
+# Output size prediction (--min-saving)
+# Sample windows are encoded before the real conversion; files that would
+# shrink by less than PREDICT_MIN_SAVING_PERCENT are skipped. None: off,
+# since sampling costs every file three short encodes
+PREDICT_SAMPLE_WINDOWS = 3
+PREDICT_SAMPLE_SECONDS = 10
+PREDICT_CONTAINER_OVERHEAD = 1.01  # MKV overhead on top of the streams
+PREDICT_MIN_SAVING_PERCENT = None
+
+# Job scheduling (--schedule): order of queued conversions
+# Cost is seconds of media weighted by frame size relative to 1080p
+SCHEDULER_POLICY = 'sjf'  # fifo, sjf, oldest or category
+SCHEDULER_DECODE_WEIGHT = 0.15  # decode share of the cost, per source pixel
+SCHEDULER_AGING_RATE = 0.5  # cost-seconds credited per second a job waits
+SCHEDULER_CATEGORY_PRIORITY = ('series', 'anime', 'movie')
+SCHEDULER_CATEGORY_STEP = 4 * 3600  # cost gap between category ranks
+SCHEDULER_PRIORITY_STEP = 24 * 3600  # cost-seconds per explicit priority level
+
+# Profiling (--profile)
+PROFILE_TOP_FUNCTIONS = 30  # functions listed after a profiled run
 
 # FFmpeg settings
 FFMPEG_BINARY = 'ffmpeg'
@@ -78,4 +214,6 @@ MESSAGES = {
     'ffmpeg_error': 'خطای داخلی در موتور تبدیل (FFmpeg). ممکن است فایل ورودی خراب باشد.',
     'timeout': 'زمان تبدیل بیش از حد طول کشید و متوقف شد.',
     'interrupted': 'عملیات توسط کاربر متوقف شد.',
+    'not_worth_it': 'تبدیل این فایل حجم را به اندازه کافی کاهش نمی‌دهد و انجام نشد.',
+    'duplicate': 'محتوای این فایل با فایلی که قبلاً تبدیل شده یکسان است.',
 }
@@ -0,0 +1,489 @@
+"""
+Long-running converter daemon with a local control API
+سرویس ماندگار تبدیل با رابط کنترل محلی
+
+video_converter.py --daemon keeps one warm pipeline: probe cache, scan
+index, resource sampler, scheduler and job pool live as long as the
+process. Clients talk to it over a Unix socket (or tcp://127.0.0.1:PORT
+where Unix sockets are unavailable) with one JSON request per
+connection, like the --serve-queue protocol:
+
+    {"op": "submit", "args": {"paths": [...], "priority": 0}}
+    -> {"ok": true, "result": {...}}
+
+Operations:
+    submit        queue files, folders or patterns; returns a batch ID
+    list          queued and running jobs with live progress
+    batch         jobs of one submission and whether it is still scanning
+    cancel        drop a queued job or stop a running one
+    reprioritize  change the priority level of a queued job
+    results       finished jobs, newest first
+    settings      conversion options of the daemon's converter
+    shutdown      stop after the running jobs
+
+When a daemon answers on the output folder's socket, video_converter.py
+and auto_watch.py submit to it instead of converting themselves; the
+daemon's own settings (jobs, verify mode, ...) apply, so
+video_converter.py converts locally when its command line asks for
+options the daemon does not use.
+"""
+import os
+import json
+import time
+import socket
+import threading
+import itertools
+import socketserver
+from collections import OrderedDict
+from config import DAEMON_SOCKET_FILE, DAEMON_KEEP_RESULTS, QUEUE_SERVER_HOST
+from modules.logger import logger
+from modules.job_pool import JobPool
+from modules.prescan import PreScanner, StreamingBatchProgress
+from modules.scanner import scan_video_files, get_scan_index
+from modules.scheduler import JobScheduler
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = ('completed', 'skipped', 'failed', 'cancelled')
+
+# Job dict fields returned to clients
+RESULT_FIELDS = (
+    'status', 'error', 'output_file', 'elapsed', 'input_size', 'output_size',
+    'job_id', 'duplicate_of'
+)
+
+
+def default_address(output_dir):
+    """Socket path under output_dir, or localhost TCP without AF_UNIX"""
+    if hasattr(socket, 'AF_UNIX'):
+        return os.path.abspath(os.path.join(output_dir, DAEMON_SOCKET_FILE))
+    return f"tcp://{QUEUE_SERVER_HOST}:0"
+
+
+def _parse_tcp(address):
+    host, _, port = address[len('tcp://'):].rpartition(':')
+    return host or QUEUE_SERVER_HOST, int(port)
+
+
+class _DaemonPool(JobPool):
+    """JobPool that reports each job's start and end to the daemon"""
+
+    def __init__(self, daemon, video_converter, jobs, check_resources=True):
+        super().__init__(video_converter, jobs, check_resources=check_resources)
+        self.daemon = daemon
+
+    def _run_job(self, entry, *args):
+        self.daemon._started(entry)
+        result = super()._run_job(entry, *args)
+        self.daemon._finished(entry, result)
+        return result
+
+
+class ConverterDaemon:
+    """
+    Queue and convert submitted files until shut down
+    دریافت و تبدیل فایل‌های ارسالی تا زمان توقف
+    """
+
+    def __init__(self, video_converter, check_resources=True):
+        self.video_converter = video_converter
+        self.check_resources = check_resources
+        self.scheduler = JobScheduler(video_converter.schedule)
+        self.pool = _DaemonPool(
+            self, video_converter, video_converter.jobs, check_resources=check_resources
+        )
+        self.progress = StreamingBatchProgress()
+        self.lock = threading.Lock()
+        self.scan_lock = threading.Lock()
+        self.closing = False
+        self.ids = itertools.count(1)
+        self.jobs = OrderedDict()  # job ID -> record
+        self.active = {}  # file -> ID of its queued or running job
+        self.batches = {}  # batch ID -> {'scanning', 'jobs'}
+        self.started = time.time()
+
+    # --- Running ---
+
+    def run(self):
+        """Convert submitted jobs until shutdown() (blocks)"""
+        # The queue never runs dry: workers wait for the next submission
+        self.scheduler.start_feed()
+        try:
+            self.pool.run(self.scheduler, self.progress)
+        finally:
+            self.progress.close()
+
+    def shutdown(self):
+        """Stop taking jobs; running jobs finish first"""
+        logger.info("🛑 توقف سرویس تبدیل پس از پایان کارهای در حال اجرا...")
+        with self.lock:
+            self.closing = True
+        for entry in self.scheduler.entries():
+            self._cancel_queued(entry['file'])
+        self.scheduler.end_feed()
+        return True
+
+    # --- Submissions ---
+
+    def submit(self, paths, priority=0):
+        """
+        Scan and probe paths in the background and queue convertible files
+        افزودن فایل‌ها یا پوشه‌ها به صف سرویس
+
+        Returns:
+            {'batch': batch ID}
+        """
+        with self.lock:
+            batch_id = f"b{next(self.ids)}"
+            self.batches[batch_id] = {'scanning': True, 'jobs': []}
+
+        threading.Thread(
+            target=self._scan, args=(batch_id, paths, priority), name='daemon-scan', daemon=True
+        ).start()
+        return {'batch': batch_id}
+
+    def _scan(self, batch_id, paths, priority):
+        try:
+            # One scan at a time: they share the directory index and ffprobe workers
+            with self.scan_lock:
+                files = scan_video_files(paths, get_scan_index())
+                for entry in PreScanner().stream(files):
+                    self._add(batch_id, entry, priority)
+        except Exception as e:
+            logger.error(f"خطا در جستجوی فایل‌های ارسالی: {str(e)}")
+        finally:
+            with self.lock:
+                self.batches[batch_id]['scanning'] = False
+
+    def _add(self, batch_id, entry, priority):
+        filepath = entry['file']
+        action = entry['action']
+        with self.lock:
+            if self.closing:
+                return
+            # Already queued or running: the batch follows that job
+            job_id = self.active.get(filepath)
+            queue = job_id is None and action == 'convert'
+            if job_id is None:
+                job_id = f"j{next(self.ids)}"
+                record = {
+                    'id': job_id,
+                    'file': filepath,
+                    'batch': batch_id,
+                    'priority': priority,
+                    'submitted': time.time()
+                }
+                self.jobs[job_id] = record
+                if queue:
+                    record['state'] = QUEUED
+                    self.active[filepath] = job_id
+                else:
+                    record['state'] = 'skipped' if action == 'skip' else 'failed'
+                    record['result'] = {'status': record['state'], 'error': entry['reason']}
+                    record['finished'] = record['submitted']
+                    self.progress.add(record['state'])
+            self.batches[batch_id]['jobs'].append(job_id)
+            self._trim()
+
+        if queue:
+            entry['priority'] = priority
+            self.progress.add()
+            self.scheduler.push(entry)
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond DAEMON_KEEP_RESULTS (lock held)"""
+        finished = [job_id for job_id, record in self.jobs.items() if record['state'] in FINISHED]
+        for job_id in finished[:max(0, len(finished) - DAEMON_KEEP_RESULTS)]:
+            del self.jobs[job_id]
+        for batch_id in [b for b, batch in self.batches.items()
+                         if not batch['scanning'] and not any(j in self.jobs for j in batch['jobs'])]:
+            del self.batches[batch_id]
+
+    # --- Pool callbacks ---
+
+    def _started(self, entry):
+        with self.lock:
+            record = self._record(entry['file'])
+            if record:
+                record['state'] = RUNNING
+                record['started'] = time.time()
+
+    def _finished(self, entry, result):
+        with self.lock:
+            record = self._record(entry['file'])
+            if not record:
+                return
+            self.active.pop(entry['file'], None)
+            state = record['state']
+            record['state'] = 'cancelled' if state == 'cancelling' else result.get('status', 'failed')
+            record['finished'] = time.time()
+            record['result'] = {key: result.get(key) for key in RESULT_FIELDS if key in result}
+
+    def _record(self, filepath):
+        job_id = self.active.get(filepath)
+        return self.jobs.get(job_id) if job_id else None
+
+    # --- Control ---
+
+    def _find(self, job):
+        """Record for a job ID or a file path"""
+        if job in self.jobs:
+            return self.jobs[job]
+        job_id = self.active.get(os.path.abspath(job))
+        return self.jobs.get(job_id) if job_id else None
+
+    def list(self):
+        """
+        Queued and running jobs, with progress for running ones
+        فهرست کارهای در صف و در حال اجرا
+        """
+        with self.pool.lock:
+            running = {job['file']: job for job in self.pool.active}
+
+        with self.lock:
+            queued = [
+                dict(self._record(entry['file']) or {'file': entry['file']}, cost=round(entry['cost']))
+                for entry in self.scheduler.entries()
+            ]
+            active = []
+            for filepath, job in running.items():
+                record = dict(self._record(filepath) or {'file': filepath})
+                record.update(self._live(job))
+                active.append(record)
+            finished = sum(1 for record in self.jobs.values() if record['state'] in FINISHED)
+
+        return {
+            'queued': queued,
+            'running': active,
+            'finished': finished,
+            'uptime': round(time.time() - self.started)
+        }
+
+    @staticmethod
+    def _live(job):
+        converter = job.get('converter')
+        progress = getattr(converter, 'progress', None)
+        if progress is None:
+            return {'percent': 0.0}
+        return {
+            'percent': round(progress.percent(), 1),
+            'fps': round(progress.fps or 0.0, 1),
+            'eta': round(progress.eta(progress.percent()))
+        }
+
+    def batch(self, batch_id):
+        """Jobs of one submission"""
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                raise KeyError(f"unknown batch: {batch_id}")
+            jobs = [dict(self.jobs[job_id]) for job_id in batch['jobs'] if job_id in self.jobs]
+            return {'scanning': batch['scanning'], 'jobs': jobs}
+
+    def cancel(self, job):
+        """
+        Drop a queued job or stop a running one
+        لغو یک کار در صف یا در حال اجرا
+
+        Returns:
+            True if the job was queued or running
+        """
+        with self.lock:
+            record = self._find(job)
+            if record is None or record['state'] in FINISHED:
+                return False
+            filepath = record['file']
+
+        if self._cancel_queued(filepath):
+            return True
+
+        with self.pool.lock:
+            running = [j for j in self.pool.active if j['file'] == filepath]
+        with self.lock:
+            record['state'] = 'cancelling'
+        for job in running:
+            if job.get('converter'):
+                job['converter'].stop()
+        logger.info(f"⛔ لغو شد: {os.path.basename(filepath)}")
+        return True
+
+    def _cancel_queued(self, filepath):
+        if self.scheduler.remove(filepath) is None:
+            return False
+        with self.lock:
+            record = self._record(filepath)
+            self.active.pop(filepath, None)
+            if record:
+                record['state'] = 'cancelled'
+                record['finished'] = time.time()
+        # The next queued input may already be copied to scratch
+        stager = self.video_converter.stager
+        if stager:
+            stager.release_input(filepath)
+        self.progress.update('skipped')
+        return True
+
+    def reprioritize(self, job, priority):
+        """
+        Change the priority level of a queued job (higher runs sooner)
+        تغییر اولویت یک کار در صف
+        """
+        with self.lock:
+            record = self._find(job)
+            if record is None or record['state'] != QUEUED:
+                return False
+            record['priority'] = priority
+            filepath = record['file']
+        return self.scheduler.reprioritize(filepath, priority)
+
+    def settings(self):
+        """Conversion options every submitted file is converted with"""
+        return self.video_converter.settings()
+
+    def results(self, limit=50):
+        """Finished jobs, newest first"""
+        with self.lock:
+            finished = [dict(r) for r in self.jobs.values() if r['state'] in FINISHED]
+        finished.sort(key=lambda record: record.get('finished', record['submitted']), reverse=True)
+        return finished[:limit]
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    OPERATIONS = (
+        'submit', 'list', 'batch', 'cancel', 'reprioritize', 'results', 'settings', 'shutdown'
+    )
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        try:
+            request = json.loads(line)
+            if request.get('op') not in self.OPERATIONS:
+                raise ValueError(f"unknown operation: {request.get('op')}")
+            method = getattr(self.server.daemon, request['op'])
+            response = {'ok': True, 'result': method(**request.get('args', {}))}
+        except Exception as e:
+            response = {'ok': False, 'error': str(e)}
+
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class _UnixDaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TcpDaemonServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve_daemon(daemon, address):
+    """
+    Serve daemon's control API on address and convert until shutdown
+    ارائه رابط کنترل سرویس و تبدیل فایل‌ها تا زمان توقف
+    """
+    if address.startswith('tcp://'):
+        server = _TcpDaemonServer(_parse_tcp(address), _DaemonRequestHandler)
+        host, port = server.server_address
+        shown = f"tcp://{host}:{port}"
+    else:
+        if os.path.exists(address):
+            if DaemonClient(address).ping():
+                raise RuntimeError(f"سرویس دیگری روی {address} در حال اجراست")
+            os.remove(address)  # left by a daemon that did not exit cleanly
+        server = _UnixDaemonServer(address, _DaemonRequestHandler)
+        os.chmod(address, 0o600)
+        shown = address
+    server.daemon = daemon
+
+    threading.Thread(target=server.serve_forever, name='daemon-api', daemon=True).start()
+    logger.info(f"🛰️  سرویس تبدیل آماده است: {shown} (Ctrl+C برای توقف)")
+
+    try:
+        daemon.run()
+    finally:
+        server.shutdown()
+        server.server_close()
+        if not address.startswith('tcp://') and os.path.exists(address):
+            os.remove(address)
+
+
+class DaemonClient:
+    """
+    Call a running daemon's control API
+    فراخوانی رابط کنترل سرویس در حال اجرا
+    """
+
+    def __init__(self, address, timeout=30):
+        self.address = address
+        self.timeout = timeout
+
+    def _connect(self):
+        if self.address.startswith('tcp://'):
+            return socket.create_connection(_parse_tcp(self.address), timeout=self.timeout)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _call(self, op, **args):
+        with self._connect() as sock:
+            sock.sendall(json.dumps({'op': op, 'args': args}).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as stream:
+                line = stream.readline()
+
+        if not line:
+            raise ConnectionError(f"daemon at {self.address} closed the connection")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise RuntimeError(response.get('error', 'daemon error'))
+        return response.get('result')
+
+    def ping(self):
+        """True if a daemon answers on this address"""
+        try:
+            self._call('list')
+            return True
+        except (OSError, ValueError, RuntimeError):
+            return False
+
+    def submit(self, paths, priority=0):
+        return self._call('submit', paths=[os.path.abspath(p) for p in paths], priority=priority)
+
+    def list(self):
+        return self._call('list')
+
+    def batch(self, batch_id):
+        return self._call('batch', batch_id=batch_id)
+
+    def cancel(self, job):
+        return self._call('cancel', job=job)
+
+    def reprioritize(self, job, priority):
+        return self._call('reprioritize', job=job, priority=priority)
+
+    def results(self, limit=50):
+        return self._call('results', limit=limit)
+
+    def settings(self):
+        return self._call('settings')
+
+    def shutdown(self):
+        return self._call('shutdown')
+
+
+def connect_daemon(address):
+    """DaemonClient if a daemon answers on address, else None"""
+    if not address or address.endswith(':0'):
+        return None
+    if not address.startswith('tcp://') and not os.path.exists(address):
+        return None
+    client = DaemonClient(address)
+    return client if client.ping() else None
@@ -0,0 +1,158 @@
+"""
+Decode verification of output files
+بررسی خروجی با رمزگشایی واقعی
+
+Verifier only looks at container metadata, so a bitstream that is corrupt
+or truncated in the middle still passes. Two extra modes decode frames:
+
+    sampled  K evenly spaced short windows, decoded concurrently
+    full     the whole video stream (for audits)
+
+A window fails on any decoder error or when it yields noticeably fewer
+frames than its length and frame rate promise.
+"""
+import os
+import json
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    FFMPEG_BINARY, FFPROBE_BINARY, VERIFY_SAMPLE_WINDOWS, VERIFY_SAMPLE_SECONDS,
+    VERIFY_SAMPLE_WORKERS, VERIFY_FRAME_TOLERANCE, VERIFY_WINDOW_TIMEOUT
+)
+from modules.logger import logger
+from modules.verifier import Verifier
+from modules.progress_stream import ProgressBlockParser, to_float
+from modules.utils import format_time
+
+VERIFY_MODES = ('basic', 'sampled', 'full')
+
+
+class DecodeVerifier(Verifier):
+    """
+    Verifier with optional sampled or full decode checks
+    بررسی‌کننده با امکان رمزگشایی نمونه‌ای یا کامل
+    """
+
+    @staticmethod
+    def verify_output(output_file, expected_duration=None, input_file_size=None, mode='basic'):
+        """
+        Verify output file, decoding frames in 'sampled' and 'full' mode
+        بررسی فایل خروجی؛ در حالت‌های sampled و full فریم‌ها رمزگشایی می‌شوند
+
+        Returns:
+            (valid, seconds spent)
+        """
+        start = time.time()
+
+        if not Verifier.verify_output(output_file, expected_duration, input_file_size):
+            return False, time.time() - start
+
+        if mode == 'basic':
+            return True, time.time() - start
+
+        try:
+            duration, fps = DecodeVerifier._probe_timing(output_file)
+            if mode == 'full':
+                windows = [(0.0, None)]
+            else:
+                windows = DecodeVerifier._plan_windows(duration)
+
+            workers = min(VERIFY_SAMPLE_WORKERS, len(windows))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                errors = list(executor.map(
+                    lambda window: DecodeVerifier._decode_window(output_file, window, duration, fps),
+                    windows
+                ))
+            errors = [error for error in errors if error]
+
+        except Exception as e:
+            errors = [str(e)]
+
+        elapsed = time.time() - start
+
+        if errors:
+            logger.error(f"✗ خطای رمزگشایی ({mode}) در {os.path.basename(output_file)}:")
+            for error in errors:
+                logger.error(f"  {error}")
+            Verifier._move_to_incomplete(output_file)
+            return False, elapsed
+
+        logger.info(
+            f"✓ رمزگشایی {mode}: {len(windows)} بازه سالم "
+            f"({format_time(elapsed)})"
+        )
+        return True, elapsed
+
+    @staticmethod
+    def _probe_timing(filepath):
+        """Duration and frame rate of the first video stream"""
+        cmd = [
+            FFPROBE_BINARY,
+            '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'stream=avg_frame_rate:format=duration',
+            '-of', 'json',
+            filepath
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=30)
+        data = json.loads(result.stdout)
+
+        duration = to_float(data.get('format', {}).get('duration'))
+        streams = data.get('streams') or [{}]
+        num, _, den = streams[0].get('avg_frame_rate', '0/1').partition('/')
+        fps = to_float(num) / to_float(den, 1.0) if to_float(den, 1.0) else 0.0
+
+        return duration, fps
+
+    @staticmethod
+    def _plan_windows(duration):
+        """K evenly spaced (start, length) windows covering the whole file"""
+        length = VERIFY_SAMPLE_SECONDS
+        if duration <= length * VERIFY_SAMPLE_WINDOWS:
+            return [(0.0, None)]
+
+        step = (duration - length) / max(1, VERIFY_SAMPLE_WINDOWS - 1)
+        return [(i * step, length) for i in range(VERIFY_SAMPLE_WINDOWS)]
+
+    @staticmethod
+    def _decode_window(filepath, window, duration, fps):
+        """
+        Decode one window; return an error string or None
+        رمزگشایی یک بازه؛ بازگرداندن متن خطا یا None
+        """
+        start, length = window
+        cmd = [FFMPEG_BINARY, '-hide_banner', '-v', 'error', '-nostdin']
+        if start > 0:
+            cmd += ['-ss', f"{start:.3f}"]
+        cmd += ['-i', filepath]
+        if length:
+            cmd += ['-t', f"{length:.3f}"]
+        cmd += ['-map', '0:v:0', '-f', 'null', '-progress', 'pipe:1', '-nostats', '-']
+
+        label = f"{format_time(start)}" + (f"+{length:g}s" if length else " (کامل)")
+        timeout = VERIFY_WINDOW_TIMEOUT if length else None
+
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return f"{label}: timeout"
+
+        stderr = result.stderr.strip()
+        if result.returncode != 0 or stderr:
+            return f"{label}: {stderr.splitlines()[-1] if stderr else result.returncode}"
+
+        parser = ProgressBlockParser()
+        frames = 0
+        for line in result.stdout.splitlines():
+            block = parser.feed(line)
+            if block is not None:
+                frames = int(to_float(block.get('frame')))
+
+        if fps > 0 and duration > 0:
+            span = min(length or duration, duration - start)
+            expected = span * fps
+            if frames < expected * (1 - VERIFY_FRAME_TOLERANCE) - 1:
+                return f"{label}: {frames} فریم از {int(expected)} فریم مورد انتظار"
+
+        return None
@@ -0,0 +1,271 @@
+"""
+Disk-space admission control for conversions
+کنترل پذیرش تبدیل‌ها بر اساس فضای دیسک
+
+Before an encode starts, the estimated size of each output is reserved
+on every filesystem it is written to: the output folder and, with
+--scratch, the scratch folder. The estimate is the size prediction when
+there is one, otherwise EncodeHistory (duration x observed bitrate),
+capped by the source size and bitrate, times DISK_RESERVE_MARGIN.
+
+A job starts only if the free space, less the unwritten part of the
+other jobs' reservations and its own estimate, stays above the floor
+(--min-free-disk). If only the other reservations are in the way, it
+waits for them to be written or released; if its own estimate does not
+fit, it fails at once with MESSAGES['disk_full'] instead of at the end
+of a long encode.
+
+A watcher thread stops the newest running encode on a filesystem whose
+free space falls below DISK_ABORT_FREE_MB, so jobs fail fast when
+something else fills the disk.
+"""
+import os
+import time
+import shutil
+import threading
+from config import (
+    MESSAGES, DISK_MIN_FREE_GB, DISK_ABORT_FREE_MB, DISK_RESERVE_MARGIN, DISK_CHECK_SECONDS
+)
+from modules.logger import logger
+from modules.log_backend import log_debug
+from modules.encode_history import estimate_encode, get_encode_history
+from modules.utils import format_size
+
+# FFmpeg log line of a write that hit a full filesystem
+NO_SPACE_MARKER = 'No space left on device'
+
+_active_guard = None
+
+
+def existing_parent(path):
+    """path itself, or its nearest ancestor that exists"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def estimate_output_sizes(input_file, metadata, labels, predicted_size=None):
+    """
+    Bytes to reserve for each output of one job
+    تخمین حجم هر خروجی برای رزرو فضا
+
+    Args:
+        labels: rendition labels, [None] for a single output
+        predicted_size: SizePredictor result for the first output
+    """
+    try:
+        input_size = os.path.getsize(input_file)
+    except OSError:
+        input_size = 0
+    duration = metadata.get('duration') or 0.0
+    # x265 output stays below the source; the container bitrate bounds it
+    # when the file size does not (e.g. a still-growing input)
+    ceiling = max(input_size, (metadata.get('bit_rate') or 0) * duration / 8)
+
+    history = get_encode_history()
+    sizes = []
+    for i, label in enumerate(labels):
+        if i == 0 and predicted_size:
+            size = predicted_size
+        else:
+            size = estimate_encode(metadata, label, history)['size']
+        if ceiling:
+            size = min(size, ceiling)
+        sizes.append(int(size * DISK_RESERVE_MARGIN))
+    return sizes
+
+
+class DiskGuard:
+    """
+    Reserve output space per filesystem and watch running encodes
+    رزرو فضای خروجی روی هر فایل‌سیستم و نظارت بر تبدیل‌های در حال اجرا
+    """
+
+    def __init__(self, min_free_gb=DISK_MIN_FREE_GB, abort_free_mb=DISK_ABORT_FREE_MB,
+                 interval=DISK_CHECK_SECONDS):
+        self.floor = int(min_free_gb * 1024 ** 3)
+        self.abort_floor = int(abort_free_mb * 1024 ** 2)
+        self.interval = interval
+        self.lock = threading.Condition()
+        self.reservations = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='DiskGuard', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval * 2)
+
+    @staticmethod
+    def _device(path):
+        return os.stat(existing_parent(path)).st_dev
+
+    @staticmethod
+    def _free(path):
+        return shutil.disk_usage(existing_parent(path)).free
+
+    @staticmethod
+    def _written(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _outstanding(self, device):
+        """Reserved bytes on device not yet written (lock held)"""
+        total = 0
+        for reservation in self.reservations:
+            for target_device, path, size in reservation['targets']:
+                if target_device == device:
+                    total += max(0, size - self._written(path))
+        return total
+
+    def _shortfall(self, needed):
+        """
+        (path, free, required, waiting helps) of the first filesystem that
+        lacks space, or None (lock held)
+        """
+        for device, (size, path) in needed.items():
+            free = self._free(path)
+            required = size + self._outstanding(device) + self.floor
+            if free < required:
+                # Only other jobs' unwritten reservations can still shrink
+                return path, free, required, free >= size + self.floor
+        return None
+
+    def admit(self, outputs, name):
+        """
+        Reserve space for a job, waiting while other jobs' reservations are
+        all that keeps it from fitting
+        رزرو فضا برای یک کار؛ در صورت کمبود فضا منتظر پایان کارهای دیگر
+
+        Args:
+            outputs: list of (bytes, [paths written]) per output; a size
+                     is counted once per filesystem
+            name: job name for messages
+
+        Returns:
+            reservation for release(), or None when the space is not there
+        """
+        targets = []
+        needed = {}  # device -> (bytes, path to measure free space on)
+        for size, paths in outputs:
+            devices = {}
+            for path in paths:
+                devices.setdefault(self._device(path), path)
+            for device, path in devices.items():
+                targets.append((device, path, size))
+                total, _ = needed.get(device, (0, path))
+                needed[device] = (total + size, path)
+
+        last_log = 0
+        with self.lock:
+            while True:
+                short = self._shortfall(needed)
+                if short is None:
+                    reservation = {
+                        'name': name,
+                        'targets': targets,
+                        'started': time.time(),
+                        'converter': None,
+                        'disk_full': False
+                    }
+                    self.reservations.append(reservation)
+                    return reservation
+
+                path, free, required, waiting_helps = short
+                if not waiting_helps:
+                    logger.error(
+                        f"💾 {MESSAGES['disk_full']} ({name}: {format_size(free)} آزاد در "
+                        f"{existing_parent(path)}، {format_size(required)} لازم)"
+                    )
+                    return None
+
+                if time.time() - last_log >= 60:
+                    logger.warning(
+                        f"⏸️  {name}: منتظر فضای دیسک ({format_size(free)} آزاد، "
+                        f"{format_size(required)} لازم)"
+                    )
+                    last_log = time.time()
+                self.lock.wait(self.interval)
+
+    def watch(self, reservation, converter):
+        """Let the watcher stop converter if its filesystem fills up"""
+        with self.lock:
+            reservation['converter'] = converter
+
+    def release(self, reservation):
+        """Return the space of a finished job and wake waiting jobs"""
+        if reservation is None:
+            return
+        with self.lock:
+            if reservation in self.reservations:
+                self.reservations.remove(reservation)
+            self.lock.notify_all()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._check()
+            except Exception as e:
+                log_debug("Disk check failed: %s", e)
+
+    def _check(self):
+        """Stop the newest encode on each filesystem below the abort floor"""
+        with self.lock:
+            paths = {}
+            for reservation in self.reservations:
+                for device, path, _ in reservation['targets']:
+                    paths.setdefault(device, path)
+
+            for device, path in paths.items():
+                free = self._free(path)
+                if free >= self.abort_floor:
+                    continue
+                running = [
+                    r for r in self.reservations
+                    if r['converter'] is not None and not r['disk_full']
+                    and any(device == t[0] for t in r['targets'])
+                ]
+                if not running:
+                    continue
+                newest = max(running, key=lambda r: r['started'])
+                newest['disk_full'] = True
+                logger.error(
+                    f"💾 {MESSAGES['disk_full']} ({format_size(free)} آزاد در "
+                    f"{existing_parent(path)})؛ توقف تبدیل {newest['name']}"
+                )
+                newest['converter'].stop()
+
+
+def disk_full(reservation, converter):
+    """True if a failed encode ran out of disk space"""
+    if reservation is not None and reservation['disk_full']:
+        return True
+    return any(NO_SPACE_MARKER in line for line in getattr(converter, 'log_tail', ()))
+
+
+def enable_disk_guard(min_free_gb=DISK_MIN_FREE_GB):
+    """
+    Start disk-space admission control
+    فعال‌سازی کنترل فضای دیسک
+    """
+    global _active_guard
+
+    if _active_guard is None:
+        _active_guard = DiskGuard(min_free_gb=min_free_gb).start()
+    return _active_guard
+
+
+def get_disk_guard():
+    """Active disk guard, or None when disabled"""
+    return _active_guard
@@ -0,0 +1,194 @@
+"""
+Observed encode speed and output bitrate per resolution and preset
+سابقه سرعت تبدیل و حجم خروجی بر اساس رزولوشن و پیش‌تنظیم
+
+Every completed conversion adds its media seconds, encode seconds,
+frames and output bytes to a row keyed by the source quality ('4K',
+'1080p', ...), the output profile (QUALITY_PRESETS label) and the x265
+preset. Older runs decay by ENCODE_HISTORY_DECAY per new sample, so the
+estimates follow hardware and setting changes. --plan uses them to
+estimate encode time and output size without encoding anything.
+"""
+import os
+import time
+import sqlite3
+import threading
+from urllib.request import pathname2url
+from config import (
+    ENCODE_HISTORY_FILE, ENCODE_HISTORY_DECAY, QUALITY_PRESETS, PLAN_DEFAULT_SPEED,
+    PLAN_DEFAULT_KBPS
+)
+from modules.logger import logger
+from modules.log_backend import log_debug
+
+_active_history = None
+
+
+def output_profile(metadata, label=None):
+    """
+    (QUALITY_PRESETS label, x265 preset) a file is encoded with
+    پروفایل کیفیت و پیش‌تنظیم x265 مورد استفاده برای یک فایل
+
+    Args:
+        label: rendition label; by default the Converter choice
+               (720p sources use '720p', everything else '1080p')
+    """
+    if label is None:
+        label = '720p' if metadata.get('quality') == '720p' else '1080p'
+    return label, QUALITY_PRESETS[label]['preset']
+
+
+class EncodeHistory:
+    """
+    SQLite-backed encode speed and bitrate history
+    سابقه سرعت و نرخ بیت تبدیل‌ها در SQLite
+    """
+
+    def __init__(self, db_path, decay=ENCODE_HISTORY_DECAY, read_only=False):
+        self.db_path = db_path
+        self.decay = decay
+        self.lock = threading.Lock()
+        self.read_only = read_only
+
+        if read_only:
+            # --plan reads earlier runs' data without changing it
+            self.conn = sqlite3.connect(
+                f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro",
+                uri=True, timeout=30, check_same_thread=False
+            )
+            return
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            " quality TEXT, label TEXT, preset TEXT,"
+            " timed_seconds REAL, encode_seconds REAL, frames REAL,"
+            " sized_seconds REAL, output_bytes REAL,"
+            " samples INTEGER, updated REAL,"
+            " PRIMARY KEY (quality, label, preset))"
+        )
+        self.conn.commit()
+
+    def record(self, quality, label, preset, media_seconds, output_bytes=None,
+               encode_seconds=None, frames=0):
+        """
+        Add one finished encode
+        افزودن نتیجه یک تبدیل
+
+        Args:
+            encode_seconds: None when the run's time is not attributable to
+                            this output alone (several renditions)
+        """
+        if self.read_only or not media_seconds or media_seconds <= 0:
+            return
+
+        timed = media_seconds if encode_seconds else 0.0
+        sized = media_seconds if output_bytes else 0.0
+        key = (quality, label, preset)
+
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT timed_seconds, encode_seconds, frames, sized_seconds, output_bytes, samples"
+                " FROM history WHERE quality = ? AND label = ? AND preset = ?",
+                key
+            ).fetchone()
+            old = [value * self.decay for value in row[:5]] if row else [0.0] * 5
+            samples = (row[5] if row else 0) + 1
+
+            self.conn.execute(
+                "INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                key + (
+                    old[0] + timed,
+                    old[1] + (encode_seconds or 0.0),
+                    old[2] + (frames if encode_seconds else 0),
+                    old[3] + sized,
+                    old[4] + (output_bytes or 0),
+                    samples,
+                    time.time()
+                )
+            )
+            self.conn.commit()
+
+    def rates(self, quality, label, preset):
+        """
+        (speed, fps, bytes per media second) from history; each is None
+        when nothing was recorded for it
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT timed_seconds, encode_seconds, frames, sized_seconds, output_bytes"
+                " FROM history WHERE quality = ? AND label = ? AND preset = ?",
+                (quality, label, preset)
+            ).fetchone()
+
+        if not row:
+            return None, None, None
+
+        timed, encode_seconds, frames, sized, output_bytes = row
+        speed = timed / encode_seconds if encode_seconds else None
+        fps = frames / encode_seconds if encode_seconds and frames else None
+        byte_rate = output_bytes / sized if sized else None
+        return speed, fps, byte_rate
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def estimate_encode(metadata, label=None, history=None):
+    """
+    Estimated encode time and output size of one output
+    تخمین زمان تبدیل و حجم خروجی
+
+    Returns:
+        dict with 'seconds', 'size', 'fps' (None if unknown) and
+        'source' ('history' or 'default')
+    """
+    label, preset = output_profile(metadata, label)
+    quality = metadata.get('quality', '1080p')
+    duration = metadata.get('duration') or 0.0
+
+    speed = fps = byte_rate = None
+    if history is not None:
+        speed, fps, byte_rate = history.rates(quality, label, preset)
+
+    source = 'history' if speed and byte_rate else 'default'
+    if not speed:
+        speed = PLAN_DEFAULT_SPEED.get(quality, 1.0)
+    if not byte_rate:
+        byte_rate = PLAN_DEFAULT_KBPS.get(label, 2000) * 1000 / 8
+
+    return {
+        'seconds': duration / speed if speed else 0.0,
+        'size': int(duration * byte_rate),
+        'fps': round(fps, 1) if fps else None,
+        'source': source
+    }
+
+
+def enable_encode_history(output_dir, read_only=False):
+    """
+    Open the encode history under output_dir
+    فعال‌سازی سابقه تبدیل در پوشه خروجی
+    """
+    global _active_history
+
+    if _active_history is not None:
+        return _active_history
+
+    try:
+        _active_history = EncodeHistory(os.path.join(output_dir, ENCODE_HISTORY_FILE), read_only=read_only)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"سابقه سرعت تبدیل غیرفعال شد: {str(e)}")
+        return None
+
+    log_debug("Encode history: %s", _active_history.db_path)
+    return _active_history
+
+
+def get_encode_history():
+    """Active encode history, or None when disabled"""
+    return _active_history
@@ -0,0 +1,180 @@
+"""
+Content fingerprints for duplicate detection
+اثر انگشت محتوا برای تشخیص فایل‌های تکراری
+
+The same release often arrives twice under another name or folder. A
+fingerprint combines the file size, the container duration and a hash of
+a few chunks at fixed offsets, read through mmap so a large file is never
+read whole. The index maps fingerprints to the outputs of completed
+conversions, so a duplicate can be skipped or hard-linked to them.
+"""
+import os
+import json
+import mmap
+import time
+import hashlib
+import sqlite3
+import threading
+from urllib.request import pathname2url
+from config import FINGERPRINT_FILE, FINGERPRINT_CHUNKS, FINGERPRINT_CHUNK_SIZE
+from modules.logger import logger
+from modules.log_backend import log_debug
+
+DUPLICATE_ACTIONS = ('skip', 'link', 'off')
+
+_active_index = None
+
+
+def content_fingerprint(filepath, metadata):
+    """
+    Fingerprint of a video file, or None if it cannot be read
+    اثر انگشت محتوای یک فایل ویدیویی
+
+    Args:
+        metadata: Validator metadata, for the container duration
+    """
+    try:
+        size = os.path.getsize(filepath)
+        digest = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            if size <= FINGERPRINT_CHUNKS * FINGERPRINT_CHUNK_SIZE:
+                digest.update(f.read())
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    # Evenly spaced chunks, the first at 0 and the last at the end
+                    step = (size - FINGERPRINT_CHUNK_SIZE) // (FINGERPRINT_CHUNKS - 1)
+                    for i in range(FINGERPRINT_CHUNKS):
+                        offset = i * step
+                        digest.update(data[offset:offset + FINGERPRINT_CHUNK_SIZE])
+    except (OSError, ValueError) as e:
+        log_debug("Fingerprint failed for %s: %s", filepath, e)
+        return None
+
+    duration = round(metadata.get('duration', 0) or 0, 1)
+    return f"{size}:{duration}:{digest.hexdigest()}"
+
+
+class FingerprintIndex:
+    """
+    SQLite-backed map of content fingerprints to converted outputs
+    نگاشت اثر انگشت فایل‌ها به خروجی‌های تبدیل شده
+    """
+
+    def __init__(self, db_path, read_only=False):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.read_only = read_only
+
+        if read_only:
+            # --plan reads earlier runs' data without changing it
+            self.conn = sqlite3.connect(
+                f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro",
+                uri=True, timeout=30, check_same_thread=False
+            )
+            return
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " fingerprint TEXT PRIMARY KEY,"
+            " input_file TEXT, outputs TEXT, completed REAL)"
+        )
+        self.conn.commit()
+
+    def lookup(self, fingerprint):
+        """
+        (input_file, [(label, output_file), ...]) of an earlier conversion
+        whose outputs still exist, or None
+        خروجی‌های تبدیل قبلی با همین محتوا
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT input_file, outputs FROM fingerprints WHERE fingerprint = ?",
+                (fingerprint,)
+            ).fetchone()
+
+        if not row:
+            return None
+
+        outputs = [tuple(output) for output in json.loads(row[1])]
+        if not all(os.path.exists(output_file) for _, output_file in outputs):
+            # Outputs were deleted: the next copy is converted again
+            self.forget(fingerprint)
+            return None
+        return row[0], outputs
+
+    def record(self, fingerprint, input_file, outputs):
+        """Remember the outputs of a completed conversion"""
+        if self.read_only:
+            return
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)",
+                (fingerprint, input_file, json.dumps(outputs), time.time())
+            )
+            self.conn.commit()
+
+    def forget(self, fingerprint):
+        if self.read_only:
+            return
+        with self.lock:
+            self.conn.execute("DELETE FROM fingerprints WHERE fingerprint = ?", (fingerprint,))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def link_outputs(outputs, targets):
+    """
+    Hard-link existing outputs to the output paths of a duplicate
+    ایجاد لینک سخت از خروجی‌های موجود برای فایل تکراری
+
+    Returns:
+        True if every target exists afterwards
+    """
+    for (_, source), target in zip(outputs, targets):
+        if os.path.exists(target):
+            if os.path.samefile(source, target):
+                continue
+            os.remove(target)
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError as e:
+            logger.warning(f"ایجاد لینک سخت ممکن نشد: {str(e)}")
+            return False
+    return True
+
+
+def enable_fingerprint_index(output_dir, read_only=False):
+    """
+    Open the fingerprint index under output_dir
+    فعال‌سازی فهرست اثر انگشت در پوشه خروجی
+
+    Args:
+        read_only: look up earlier conversions without recording or
+                   forgetting any
+    """
+    global _active_index
+
+    if _active_index is not None:
+        return _active_index
+
+    try:
+        _active_index = FingerprintIndex(os.path.join(output_dir, FINGERPRINT_FILE), read_only=read_only)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"تشخیص فایل‌های تکراری غیرفعال شد: {str(e)}")
+        return None
+
+    log_debug("Fingerprint index: %s", _active_index.db_path)
+    return _active_index
+
+
+def get_fingerprint_index():
+    """Active fingerprint index, or None when disabled"""
+    return _active_index
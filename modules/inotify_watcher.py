@@ -0,0 +1,178 @@
+"""
+Event-driven folder watcher based on Linux inotify
+نظارت رویدادمحور بر پوشه با inotify لینوکس
+
+Uses libc through ctypes, so no extra package is needed. Callers should
+fall back to polling when InotifyWatcher.create() returns None.
+"""
+import os
+import sys
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+import psutil
+from modules.logger import logger
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+
+# Remote changes on these filesystems never reach the local inotify queue
+NETWORK_FILESYSTEMS = (
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs', 'fuse.rclone', '9p', 'afs', 'ceph', 'glusterfs'
+)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_network_filesystem(path):
+    """
+    Check whether path lives on a network filesystem
+    بررسی قرار داشتن مسیر روی فایل‌سیستم شبکه
+    """
+    path = os.path.realpath(path)
+    best_mount, best_type = '', ''
+
+    try:
+        for part in psutil.disk_partitions(all=True):
+            mount = part.mountpoint
+            if (path == mount or path.startswith(mount.rstrip(os.sep) + os.sep)) \
+                    and len(mount) > len(best_mount):
+                best_mount, best_type = mount, part.fstype
+    except Exception:
+        return False
+
+    return best_type.lower() in NETWORK_FILESYSTEMS
+
+
+class InotifyWatcher:
+    """
+    Recursive inotify watch on a directory tree
+    نظارت بازگشتی inotify روی یک درخت پوشه
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.watches = {}
+
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        try:
+            self.add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    @staticmethod
+    def create(root):
+        """
+        Create a watcher, or return None if inotify can't be used for root
+        ایجاد ناظر، یا None در صورت عدم امکان استفاده از inotify
+        """
+        if not sys.platform.startswith('linux'):
+            logger.info("inotify در دسترس نیست، از حالت بررسی دوره‌ای استفاده می‌شود")
+            return None
+
+        if is_network_filesystem(root):
+            logger.info("پوشه نظارت روی فایل‌سیستم شبکه است، از حالت بررسی دوره‌ای استفاده می‌شود")
+            return None
+
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            if getattr(e, 'errno', None) == errno.ENOSPC:
+                logger.warning("محدودیت fs.inotify.max_user_watches پر شده است")
+            logger.warning(f"inotify راه‌اندازی نشد ({str(e)})، از حالت بررسی دوره‌ای استفاده می‌شود")
+            return None
+
+    @staticmethod
+    def _is_excluded_dir(name):
+        # Same rule as collect_video_files
+        return name.startswith('_') or name == 'output'
+
+    def add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self.watches[wd] = path
+
+    def add_tree(self, root):
+        """Watch root and every non-excluded directory below it"""
+        for dirpath, dirs, _ in os.walk(root):
+            dirs[:] = [d for d in dirs if not self._is_excluded_dir(d)]
+            self.add_watch(dirpath)
+
+    def read_events(self, timeout):
+        """
+        Wait up to timeout seconds and return a list of (path, mask)
+        انتظار برای رویدادها و بازگرداندن لیست (مسیر، ماسک)
+
+        New subdirectories are watched automatically. An IN_Q_OVERFLOW
+        event is returned as (None, IN_Q_OVERFLOW); the caller must rescan.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                events.append((None, IN_Q_OVERFLOW))
+                continue
+
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+
+            path = os.path.join(directory, name) if name else directory
+
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) \
+                    and not self._is_excluded_dir(name):
+                try:
+                    self.add_tree(path)
+                except OSError as e:
+                    logger.warning(f"خطا در نظارت پوشه جدید {path}: {str(e)}")
+
+            events.append((path, mask))
+
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -0,0 +1,478 @@
+"""
+Concurrent batch job pool
+اجرای هم‌زمان چند کار تبدیل در پردازش دسته‌ای
+"""
+import os
+import sys
+import time
+import signal
+import threading
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import psutil
+
+from config import THREADS_PER_JOB, MESSAGES
+from modules.converter import Converter
+from modules.logger import logger
+from modules.log_backend import debug_enabled, log_debug
+from modules.progress import CSI, ESC, CLEAR_LINE, MOVE_START, SHOW_CURSOR
+from modules.progress_stream import (
+    FastProgressTracker, JsonProgressTracker, ProgressBlockParser
+)
+from modules.resource_manager import ResourceManager
+from modules.stream_planner import StreamPlanner
+from modules.utils import format_time
+
+SAVE_CURSOR = ESC + '7'
+RESTORE_CURSOR = ESC + '8'
+
+
+def resolve_jobs(value):
+    """
+    Resolve --jobs value ('auto' or a positive integer) to a job count
+    تعیین تعداد کارهای هم‌زمان از مقدار --jobs
+    """
+    if str(value).lower() == 'auto':
+        cpu_count = psutil.cpu_count(logical=True) or 1
+        return max(1, cpu_count // THREADS_PER_JOB)
+
+    jobs = int(value)
+    if jobs < 1:
+        raise ValueError("jobs must be >= 1")
+    return jobs
+
+
+class MultiProgressDisplay:
+    """
+    One progress line per running job, drawn above the batch line
+    نمایش یک خط پیشرفت برای هر کار در حال اجرا، بالای خط دسته‌ای
+    """
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.lines = [''] * slots
+        self.lock = threading.Lock()
+        self.out = sys.stderr
+        self.is_tty = self.out.isatty()
+
+        if self.is_tty:
+            # Reserve job lines; the cursor stays on the batch line below them
+            self.out.write(MOVE_START + CLEAR_LINE + '\n' * slots)
+            self.out.flush()
+
+    def set_line(self, slot, text):
+        with self.lock:
+            self.lines[slot] = text
+            self._render()
+
+    def clear_line(self, slot):
+        self.set_line(slot, '')
+
+    def update_batch(self, batch_progress, status):
+        """Update batch totals without tearing the job lines"""
+        with self.lock:
+            batch_progress.update(status)
+
+    def _render(self):
+        if not self.is_tty:
+            return
+
+        parts = [SAVE_CURSOR, MOVE_START, f"{CSI}{self.slots}A"]
+        for line in self.lines:
+            parts.append(f"{CLEAR_LINE}{line}\n")
+        parts.append(RESTORE_CURSOR)
+
+        self.out.write(''.join(parts))
+        self.out.flush()
+
+    def close(self):
+        if self.is_tty:
+            self.out.write(SHOW_CURSOR)
+            self.out.flush()
+
+
+class JobProgressTracker(FastProgressTracker):
+    """
+    Progress tracker that renders into a MultiProgressDisplay slot
+    ردیاب پیشرفت که در یک خط از نمایش چندکاره رسم می‌شود
+    """
+
+    def __init__(self, display, slot, **kwargs):
+        self.display = display
+        self.slot = slot
+        super().__init__(**kwargs)
+
+    def update_progress(self, percent):
+        self.last_render = time.time()
+        if not self.is_tty:
+            return
+
+        percent_int = int(percent)
+        elapsed = time.time() - self.start_time
+
+        name = self.filename
+        if len(name) > 40:
+            name = name[:37] + "..."
+
+        self.display.set_line(
+            self.slot,
+            f"🎬 [{self.slot + 1}] {name:<40} {percent_int:3d}% "
+            f"│ ⚡ {self.fps:4.1f}fps "
+            f"│ ⏱️  {format_time(elapsed)} "
+            f"│ ⏳ {format_time(self.eta(percent))}"
+        )
+        self.last_percent = percent_int
+
+    def close(self):
+        if not self.is_tty:
+            return
+        self.update_progress(100)
+
+
+class JobConverter(Converter):
+    """
+    Converter with a structured progress channel, an optional fixed
+    thread count and an optional shared display
+    تبدیل‌کننده با کانال پیشرفت ساختاریافته، تعداد رشته ثابت و نمایش مشترک
+
+    FFmpeg's '-progress pipe:1' blocks are read from stdout and its log
+    from stderr, so progress parsing never has to sift through log lines.
+    """
+
+    def __init__(self, input_file, output_file, metadata, threads=None, display=None, slot=0,
+                 progress_format='bar'):
+        super().__init__(input_file, output_file, metadata)
+        self.threads = threads
+        self.display = display
+        self.slot = slot
+        self.progress_format = progress_format
+        self.elapsed = 0
+        self.frames = 0
+        self.fps = 0.0
+        self.progress = None  # live tracker, read by the daemon's job list
+        self.log_tail = ()  # last FFmpeg log lines of a failed run
+        self._console_disabled = False
+
+    def convert(self):
+        """
+        Convert video to x265
+        تبدیل ویدیو به x265
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            quality = self.metadata.get('quality', '1080p')
+            preset = self._get_preset(quality)
+            cmd = self._build_ffmpeg_command(preset)
+
+            logger.info(f"شروع تبدیل: {os.path.basename(self.input_file)}")
+            if debug_enabled():
+                logger.debug(f"Command: {' '.join(cmd)}")
+
+            progress = self._create_progress()
+
+            success, block_count = self._run_conversion(cmd, progress)
+
+            progress.close()
+            self.elapsed = progress.get_elapsed_time()
+            self.frames = progress.current_frame
+            self.fps = progress.fps
+            self._restore_console()
+            log_debug("FFmpeg progress blocks: %d", block_count)
+
+            if success:
+                logger.log_conversion_complete(self.output_file, self.elapsed)
+                return True
+            else:
+                self._cleanup_incomplete_file()
+                return False
+
+        except Exception as e:
+            self._restore_console()
+            logger.error(f"خطا در تبدیل: {str(e)}")
+            self._cleanup_incomplete_file()
+            return False
+
+    def _create_progress(self, duration=None):
+        """
+        Tracker for the chosen output: JSON lines, a pool slot or a bar
+        ردیاب پیشرفت مناسب: خطوط JSON، خط مجموعه کارها یا نوار
+        """
+        kwargs = {
+            'duration': self.metadata.get('duration', 0) if duration is None else duration,
+            'filename': os.path.basename(self.input_file),
+            'quality': self.metadata.get('quality', 'Unknown')
+        }
+
+        if self.progress_format == 'jsonl':
+            self.progress = JsonProgressTracker(**kwargs)
+        elif self.display is not None:
+            self.progress = JobProgressTracker(self.display, self.slot, **kwargs)
+        else:
+            # Disable console logging BEFORE creating the bar
+            logger.disable_console()
+            self._console_disabled = True
+            self.progress = FastProgressTracker(**kwargs)
+        return self.progress
+
+    def _restore_console(self):
+        if self._console_disabled:
+            logger.enable_console()
+            self._console_disabled = False
+
+    def _build_ffmpeg_command(self, preset):
+        cmd = super()._build_ffmpeg_command(preset)
+
+        # Copy, transcode or drop each stream instead of re-encoding all audio
+        plan = StreamPlanner.plan(self.metadata)
+        if plan:
+            chapters = self.metadata.get('chapters', 0)
+            StreamPlanner.log_plan(plan, chapters)
+            cmd = StreamPlanner.replace_mapping(cmd, StreamPlanner.build_args(plan, chapters))
+
+        # Replace the load-based thread count with this job's share
+        if self.threads:
+            cmd[cmd.index('-threads') + 1] = str(self.threads)
+
+        # Progress comes from -progress; keep the \r stats line out of the log
+        cmd.insert(len(cmd) - 1, '-nostats')
+
+        return cmd
+
+    def _run_conversion(self, cmd, progress):
+        """
+        Run FFmpeg, reading progress blocks from stdout and the log from stderr
+        اجرای FFmpeg با خواندن پیشرفت از stdout و لاگ از stderr
+
+        Signal handlers can only be installed from the main thread; in a
+        worker thread interruption is driven by JobPool through stop().
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self._handle_interrupt)
+            signal.signal(signal.SIGTERM, self._handle_interrupt)
+
+        try:
+            self.process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                bufsize=1
+            )
+
+            log_tail = deque(maxlen=20)
+            log_thread = threading.Thread(
+                target=self._drain_log, args=(self.process.stderr, log_tail), daemon=True
+            )
+            log_thread.start()
+
+            parser = ProgressBlockParser()
+            block_count = 0
+            for line in self.process.stdout:
+                if self.interrupted:
+                    logger.warning("تبدیل متوقف شد")
+                    self.process.terminate()
+                    return False, block_count
+
+                block = parser.feed(line)
+                if block is not None:
+                    block_count += 1
+                    progress.update_block(block)
+
+            self.process.wait()
+            log_thread.join(timeout=5)
+
+            if self.process.returncode == 0 and not self.interrupted:
+                return True, block_count
+            else:
+                logger.error(f"FFmpeg خطا بازگشت: {self.process.returncode}")
+                self.log_tail = list(log_tail)
+                for log_line in log_tail:
+                    logger.error(f"  {log_line}")
+                return False, block_count
+
+        except Exception as e:
+            logger.error(f"{MESSAGES['ffmpeg_error']}: {str(e)}")
+            if self.process:
+                self.process.terminate()
+            return False, 0
+
+    @staticmethod
+    def _drain_log(stream, log_tail):
+        """Send FFmpeg's log to the debug log, keeping the last lines for errors"""
+        debug = debug_enabled()
+        for line in stream:
+            line = line.rstrip()
+            if line:
+                log_tail.append(line)
+                if debug:
+                    logger.debug(f"FFmpeg: {line}")
+
+    def running_pids(self):
+        """PIDs of FFmpeg processes still running, for ThrottleController"""
+        process = self.process
+        return [process.pid] if process and process.poll() is None else []
+
+    def stop(self):
+        """Interrupt a running conversion"""
+        self.interrupted = True
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+
+
+class JobPool:
+    """
+    Run several conversions concurrently, splitting the thread budget
+    اجرای هم‌زمان چند تبدیل با تقسیم بودجه رشته‌ها
+    """
+
+    def __init__(self, video_converter, jobs, check_resources=True):
+        self.video_converter = video_converter
+        self.jobs = jobs
+        self.check_resources = check_resources
+        self.lock = threading.Lock()
+        self.active = []
+        self.thread_budget = 1
+
+    def run(self, scheduler, batch_progress):
+        """
+        Convert queued entries with up to self.jobs workers
+        تبدیل فایل‌های صف با حداکثر self.jobs کار هم‌زمان
+
+        Args:
+            scheduler: JobScheduler holding PreScanner entries with action
+                       'convert', possibly still being fed by a scan; each
+                       worker takes the best entry when it becomes free
+
+        Returns:
+            list of per-job result dicts
+        """
+        self.thread_budget = ResourceManager.get_recommended_threads()
+        logger.info(
+            f"اجرای هم‌زمان: {self.jobs} کار، بودجه رشته‌ها: {self.thread_budget}"
+        )
+
+        display = MultiProgressDisplay(self.jobs)
+        display.update_batch(batch_progress, None)  # redraw totals below the job lines
+
+        # Job output would tear the progress lines; keep it in the log files
+        toggle_console = self.video_converter.progress_format != 'jsonl'
+        if toggle_console:
+            logger.disable_console()
+
+        results = []
+        executor = ThreadPoolExecutor(max_workers=self.jobs)
+        submitted = time.time()
+        futures = [
+            executor.submit(self._worker, slot, scheduler, display, batch_progress, submitted)
+            for slot in range(self.jobs)
+        ]
+
+        try:
+            for future in as_completed(futures):
+                results.extend(future.result())
+        except KeyboardInterrupt:
+            scheduler.close()
+            if self.video_converter.throttle:
+                self.video_converter.throttle.cancel()
+            with self.lock:
+                for job in self.active:
+                    if job.get('converter'):
+                        job['converter'].stop()
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            display.close()
+            if toggle_console:
+                logger.enable_console()
+
+        return results
+
+    def _claim_threads(self, scheduler):
+        """Share of the thread budget for a job starting now"""
+        if scheduler.feeding:
+            running = self.jobs
+        else:
+            # This job plus the ones still queued
+            running = min(self.jobs, len(scheduler) + 1)
+        return max(1, self.thread_budget // max(1, running))
+
+    def _worker(self, slot, scheduler, display, batch_progress, submitted):
+        """Run the entries the scheduler picks until it runs dry"""
+        results = []
+        while True:
+            entry = scheduler.pop()
+            if entry is None:
+                return results
+            results.append(
+                self._run_job(entry, slot, scheduler, display, batch_progress, submitted)
+            )
+
+    def _run_job(self, entry, slot, scheduler, display, batch_progress, submitted):
+        input_file = entry['file']
+        job = {
+            'file': input_file,
+            'slot': slot,
+            'status': 'failed',
+            'queue_wait': time.time() - entry.get('queued_at', submitted),
+            'probe_seconds': entry.get('probe_seconds'),
+            'fingerprint': entry.get('fingerprint')
+        }
+        admitted = False
+
+        try:
+            wait_start = time.time()
+            # The load sample includes this pool's own encodes; while any
+            # run, the check would hold every further job back
+            with self.lock:
+                idle = not self.active
+            if self.check_resources and idle and ResourceManager.is_system_overloaded():
+                ResourceManager.wait_for_resources()
+
+            # The throttle controller may hold back new jobs under pressure
+            throttle = self.video_converter.throttle
+            if throttle and not throttle.acquire():
+                job['error'] = MESSAGES['interrupted']
+                display.update_batch(batch_progress, 'failed')
+                return job
+            admitted = throttle is not None
+            job['resource_wait'] = time.time() - wait_start
+
+            job['threads'] = self._claim_threads(scheduler)
+            job['display'] = display
+            self.video_converter.prefetch_next(scheduler)
+
+            with self.lock:
+                self.active.append(job)
+
+            success = self.video_converter.convert_single_file(
+                input_file, job=job, metadata=entry.get('metadata')
+            )
+            if success:
+                status = 'completed'
+            elif job['status'] == 'skipped':
+                status = 'skipped'
+            else:
+                status = 'failed'
+            display.update_batch(batch_progress, status)
+
+        except Exception as e:
+            job['error'] = str(e)
+            logger.error(f"خطا در پردازش {os.path.basename(input_file)}: {str(e)}")
+            display.update_batch(batch_progress, 'failed')
+
+        finally:
+            if admitted:
+                throttle.release()
+            with self.lock:
+                if job in self.active:
+                    self.active.remove(job)
+            display.clear_line(slot)
+
+        return {
+            key: value for key, value in job.items()
+            if key not in ('display', 'converter')
+        }
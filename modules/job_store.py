@@ -0,0 +1,164 @@
+"""
+Persistent job journal for watch mode
+دفترچه ماندگار کارها برای حالت نظارت
+
+Each input is recorded with its (size, mtime, inode) fingerprint, so after
+a restart finished and rejected files are skipped with a single lookup
+instead of being probed again. Failed files are retried with exponential
+backoff until JOB_MAX_ATTEMPTS is reached.
+
+States: 'processing', 'done', 'failed', 'rejected'
+"""
+import os
+import time
+import sqlite3
+import threading
+from config import JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_SECONDS, JOB_RETRY_MAX_SECONDS
+from modules.logger import logger
+from modules.probe_cache import ProbeCache
+
+
+class JobStore:
+    """
+    SQLite-backed record of every input seen by the watcher
+    ثبت ماندگار همه فایل‌های دیده شده توسط ناظر
+    """
+
+    def __init__(self, db_path, max_attempts=JOB_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER, mtime_ns INTEGER, inode INTEGER,"
+            " state TEXT, output_file TEXT,"
+            " attempts INTEGER DEFAULT 0, last_error TEXT,"
+            " next_attempt REAL DEFAULT 0, updated REAL)"
+        )
+        self.conn.commit()
+
+    def _get(self, path):
+        return self.conn.execute(
+            "SELECT size, mtime_ns, inode, state, attempts, next_attempt FROM jobs WHERE path = ?",
+            (path,)
+        ).fetchone()
+
+    def should_process(self, filepath):
+        """
+        Decide whether filepath needs (another) attempt
+        تعیین نیاز فایل به پردازش (مجدد)
+        """
+        path = os.path.abspath(filepath)
+        try:
+            key = ProbeCache.fingerprint(path)
+        except OSError:
+            return False
+
+        with self.lock:
+            row = self._get(path)
+
+        if row is None or tuple(row[:3]) != key:
+            # New file, or replaced on disk since we last saw it
+            return True
+
+        state, attempts, next_attempt = row[3], row[4], row[5]
+        if state in ('done', 'rejected'):
+            return False
+
+        # 'failed', or 'processing' left behind by a crash
+        return attempts < self.max_attempts and time.time() >= next_attempt
+
+    def due_retries(self):
+        """
+        Failed inputs whose backoff has expired
+        فایل‌های ناموفقی که زمان تلاش مجددشان رسیده است
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path FROM jobs WHERE state = 'failed' AND attempts < ? AND next_attempt <= ?",
+                (self.max_attempts, time.time())
+            ).fetchall()
+        return [row[0] for row in rows if os.path.exists(row[0])]
+
+    def _write(self, filepath, state, output_file=None, error=None, attempts_delta=0, next_attempt=0):
+        path = os.path.abspath(filepath)
+        try:
+            size, mtime_ns, inode = ProbeCache.fingerprint(path)
+        except OSError:
+            size, mtime_ns, inode = None, None, None
+
+        with self.lock:
+            row = self._get(path)
+            attempts = row[4] if row and tuple(row[:3]) == (size, mtime_ns, inode) else 0
+            attempts += attempts_delta
+
+            self.conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, inode, state, output_file,
+                 attempts, error, next_attempt, time.time())
+            )
+            self.conn.commit()
+
+        return attempts
+
+    def mark_processing(self, filepath):
+        """Record the start of an attempt"""
+        return self._write(filepath, 'processing', attempts_delta=1)
+
+    def mark_done(self, filepath, output_file):
+        """Record a converted (or already converted) input"""
+        self._write(filepath, 'done', output_file=output_file)
+
+    def mark_rejected(self, filepath, reason):
+        """Record an input that will never be converted as-is"""
+        self._write(filepath, 'rejected', error=reason)
+
+    def mark_failed(self, filepath, error):
+        """
+        Record a failed attempt and schedule the retry
+        ثبت تلاش ناموفق و زمان‌بندی تلاش مجدد
+        """
+        path = os.path.abspath(filepath)
+        with self.lock:
+            row = self._get(path)
+        attempts = row[4] if row else 1
+
+        delay = min(JOB_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)), JOB_RETRY_MAX_SECONDS)
+        self._write(
+            path, 'failed', error=error,
+            attempts_delta=0 if row else 1,
+            next_attempt=time.time() + delay
+        )
+
+        if attempts >= self.max_attempts:
+            logger.error(
+                f"❌ {os.path.basename(path)} پس از {attempts} تلاش کنار گذاشته شد: {error}"
+            )
+        else:
+            logger.warning(
+                f"🔁 تلاش مجدد {os.path.basename(path)} تا {int(delay)} ثانیه دیگر "
+                f"({attempts}/{self.max_attempts})"
+            )
+
+    def reset_failed(self):
+        """
+        Give every failed input a fresh set of attempts
+        بازنشانی تلاش‌های همه فایل‌های ناموفق
+        """
+        with self.lock:
+            count = self.conn.execute(
+                "UPDATE jobs SET attempts = 0, next_attempt = 0 "
+                "WHERE state IN ('failed', 'processing')"
+            ).rowcount
+            self.conn.commit()
+        return count
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
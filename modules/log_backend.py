@@ -0,0 +1,204 @@
+"""
+Asynchronous, rotating log backend for modules.logger
+پشتیبان ناهمگام و چرخشی برای ثبت رویدادها
+
+configure_logging() replaces the logger's synchronous file handlers with
+a QueueHandler: the calling thread only puts the record on a queue and a
+background QueueListener thread formats it and writes the files, so
+encoder threads never wait on disk I/O for logging.
+
+    conversion.log    everything at LOG_FILE_LEVEL and above
+                      (conversion.jsonl with --log-format jsonl)
+    errors.log        errors only
+
+Both files rotate when they reach LOG_MAX_BYTES or are LOG_ROTATE_SECONDS
+old, keeping LOG_BACKUP_COUNT old files. Records logged inside
+log_job() carry that file's job ID, written as the "job" field in JSON
+lines. The console handler is unchanged, so disable_console() and
+enable_console() work as before.
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from config import (
+    LOG_FILE, ERROR_LOG_FILE, LOG_FORMAT, DATE_FORMAT, LOG_JSON_FILE, LOG_FILE_LEVEL,
+    LOG_MAX_BYTES, LOG_ROTATE_SECONDS, LOG_BACKUP_COUNT
+)
+from modules.logger import logger
+
+LOG_FORMATS = ('text', 'jsonl')
+
+_context = threading.local()
+_listener = None
+
+
+class RotatingLogFile(RotatingFileHandler):
+    """
+    Log file rotated by size and by age
+    فایل لاگ با چرخش بر اساس حجم و زمان
+    """
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, interval=LOG_ROTATE_SECONDS,
+                 backup_count=LOG_BACKUP_COUNT):
+        super().__init__(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+        )
+        self.interval = interval
+        # An existing file is as old as its first record; its mtime only
+        # tells when the last run appended to it
+        started = self._first_record_time(filename) if os.path.exists(filename) else None
+        self.rollover_at = (started or time.time()) + interval if interval else None
+
+    @staticmethod
+    def _first_record_time(filename):
+        """Time of the first line of a log written by this module, or None"""
+        try:
+            with open(filename, encoding='utf-8', errors='replace') as f:
+                line = f.readline().strip()
+            if line.startswith('{'):
+                stamp = json.loads(line)['time']
+            else:
+                stamp = line.split(' - ', 1)[0]
+            return time.mktime(time.strptime(stamp, DATE_FORMAT))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return 1
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per record / هر رویداد در یک خط JSON"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, DATE_FORMAT),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        job_id = getattr(record, 'job', None)
+        if job_id:
+            entry['job'] = job_id
+            entry['file'] = getattr(record, 'job_file', None)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _JobContextFilter(logging.Filter):
+    """Stamp records with the job of the logging thread (runs in that thread)"""
+
+    def filter(self, record):
+        record.job = getattr(_context, 'job', None)
+        record.job_file = getattr(_context, 'job_file', None)
+        return True
+
+
+def new_job_id(input_file):
+    """Short ID for one conversion of input_file"""
+    digest = hashlib.sha1(os.path.abspath(input_file).encode('utf-8')).hexdigest()[:6]
+    return f"{int(time.time() * 1000) % 0xFFFFFFFF:08x}-{digest}"
+
+
+@contextmanager
+def log_job(input_file):
+    """
+    Attach a job ID to everything this thread logs for input_file
+    افزودن شناسه کار به رویدادهای ثبت شده برای یک فایل
+    """
+    previous = (getattr(_context, 'job', None), getattr(_context, 'job_file', None))
+    _context.job = new_job_id(input_file)
+    _context.job_file = os.path.basename(input_file)
+    try:
+        yield _context.job
+    finally:
+        _context.job, _context.job_file = previous
+
+
+def configure_logging(log_dir='logs', log_format='text', verbose=False):
+    """
+    Move file logging to a background writer thread with rotation
+    انتقال نوشتن لاگ به رشته پس‌زمینه با چرخش فایل‌ها
+
+    Args:
+        log_format: 'text' (LOG_FORMAT lines) or 'jsonl' for the main log
+        verbose: debug messages on the console and in the main log
+    """
+    global _listener
+
+    if _listener is not None:
+        return
+
+    os.makedirs(log_dir, exist_ok=True)
+    target = logger.logger
+
+    # The synchronous file handlers of modules.logger are replaced
+    for handler in list(target.handlers):
+        if isinstance(handler, logging.FileHandler):
+            target.removeHandler(handler)
+            handler.close()
+
+    file_level = logging.DEBUG if verbose else logging.getLevelName(LOG_FILE_LEVEL)
+    if log_format == 'jsonl':
+        main_handler = RotatingLogFile(os.path.join(log_dir, LOG_JSON_FILE))
+        main_handler.setFormatter(JsonLineFormatter())
+    else:
+        main_handler = RotatingLogFile(os.path.join(log_dir, LOG_FILE))
+        main_handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+    main_handler.setLevel(file_level)
+
+    error_handler = RotatingLogFile(os.path.join(log_dir, ERROR_LOG_FILE))
+    error_handler.setLevel(logging.ERROR)
+    error_handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+
+    records = queue.SimpleQueue()
+    queue_handler = QueueHandler(records)
+    queue_handler.addFilter(_JobContextFilter())
+    target.addHandler(queue_handler)
+
+    if verbose:
+        logger.console_handler.setLevel(logging.DEBUG)
+
+    # Records below every handler's level are dropped by isEnabledFor()
+    # before a LogRecord is even created
+    target.setLevel(min(file_level, logger.console_handler.level))
+
+    _listener = QueueListener(records, main_handler, error_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Write out queued records and stop the writer thread"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def debug_enabled():
+    """True if debug messages are written anywhere (guards costly messages)"""
+    return logger.logger.isEnabledFor(logging.DEBUG)
+
+
+def log_debug(message, *args):
+    """Debug message with %-style arguments, formatted only when written"""
+    logger.logger.debug(message, *args)
@@ -0,0 +1,202 @@
+"""
+Per-file stage timing and metrics export
+زمان‌سنجی مراحل هر فایل و خروجی معیارها
+
+Every conversion records how its wall time splits into stages (queue,
+resource wait, probe, categorize, predict, encode, verify) plus encode fps,
+speed and bytes in/out. With --metrics PATH the records are written as
+JSON lines, or as a Prometheus textfile when PATH ends in '.prom' (for the
+node_exporter textfile collector). --profile wraps a run in cProfile.
+"""
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from config import PROFILE_TOP_FUNCTIONS
+from modules.logger import logger
+
+_writer = None
+
+
+class FileMetrics:
+    """
+    Stage durations and counters of one file
+    مدت مراحل و مقادیر یک فایل
+    """
+
+    def __init__(self, input_file):
+        self.input_file = input_file
+        self.started = time.time()
+        self.stages = {}
+        self.values = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage name"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.time() - start)
+
+    def add_stage(self, name, seconds):
+        if seconds:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def set(self, **values):
+        self.values.update(values)
+
+    def finish(self, job):
+        """Take waits, status and sizes from the job dict"""
+        self.add_stage('queue', job.get('queue_wait'))
+        self.add_stage('resource_wait', job.get('resource_wait'))
+        self.set(
+            status=job.get('status'),
+            error=job.get('error'),
+            output_file=job.get('output_file'),
+            bytes_in=job.get('input_size'),
+            bytes_out=job.get('output_size')
+        )
+
+    def to_dict(self):
+        record = {
+            'time': round(self.started, 3),
+            'file': self.input_file,
+            'wall_seconds': round(time.time() - self.started + self.stages.get('queue', 0.0), 3),
+            'stages': {name: round(seconds, 3) for name, seconds in self.stages.items()}
+        }
+        record.update({k: v for k, v in self.values.items() if v is not None})
+        return record
+
+
+class MetricsWriter:
+    """
+    Append JSON lines or rewrite a Prometheus textfile
+    نوشتن خطوط JSON یا فایل متنی Prometheus
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.prometheus = path.endswith('.prom')
+        self.lock = threading.Lock()
+        self.files = {}
+        self.stage_sum = {}
+        self.stage_count = {}
+        self.totals = {'bytes_in': 0, 'bytes_out': 0, 'media_seconds': 0.0, 'encode_seconds': 0.0}
+        self.last = {}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, metrics):
+        data = metrics.to_dict()
+        with self.lock:
+            if self.prometheus:
+                self._aggregate(data)
+                self._write_textfile()
+            else:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(data, ensure_ascii=False) + '\n')
+
+    def _aggregate(self, data):
+        status = data.get('status', 'failed')
+        self.files[status] = self.files.get(status, 0) + 1
+
+        for name, seconds in data['stages'].items():
+            self.stage_sum[name] = self.stage_sum.get(name, 0.0) + seconds
+            self.stage_count[name] = self.stage_count.get(name, 0) + 1
+
+        if status == 'completed':
+            self.totals['bytes_in'] += data.get('bytes_in', 0)
+            self.totals['bytes_out'] += data.get('bytes_out', 0)
+            self.totals['media_seconds'] += data.get('duration', 0.0)
+            self.totals['encode_seconds'] += data['stages'].get('encode', 0.0)
+            self.last = {'fps': data.get('fps', 0.0), 'speed': data.get('speed', 0.0)}
+
+    def _write_textfile(self):
+        lines = [
+            '# HELP x265_files_total Files processed, by final status.',
+            '# TYPE x265_files_total counter'
+        ]
+        for status, count in sorted(self.files.items()):
+            lines.append(f'x265_files_total{{status="{status}"}} {count}')
+
+        lines += [
+            '# HELP x265_stage_seconds Wall time spent per stage.',
+            '# TYPE x265_stage_seconds summary'
+        ]
+        for name in sorted(self.stage_sum):
+            lines.append(f'x265_stage_seconds_sum{{stage="{name}"}} {self.stage_sum[name]:.3f}')
+            lines.append(f'x265_stage_seconds_count{{stage="{name}"}} {self.stage_count[name]}')
+
+        counters = (
+            ('x265_bytes_in_total', 'bytes_in', 'Input bytes of completed conversions.'),
+            ('x265_bytes_out_total', 'bytes_out', 'Output bytes of completed conversions.'),
+            ('x265_media_seconds_total', 'media_seconds', 'Media duration of completed conversions.'),
+            ('x265_encode_seconds_total', 'encode_seconds', 'Encode wall time of completed conversions.')
+        )
+        for metric, key, help_text in counters:
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter', f'{metric} {self.totals[key]}']
+
+        for key in ('fps', 'speed'):
+            metric = f'x265_last_encode_{key}'
+            lines += [
+                f'# HELP {metric} Average encode {key} of the last completed file.',
+                f'# TYPE {metric} gauge',
+                f'{metric} {self.last.get(key, 0.0):.3f}'
+            ]
+
+        # The textfile collector must never see a half-written file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.path)
+
+
+def enable_metrics(path):
+    """
+    Write per-file metrics to path (.prom = Prometheus textfile, else JSONL)
+    فعال‌سازی ثبت معیارهای هر فایل
+    """
+    global _writer
+    try:
+        _writer = MetricsWriter(path)
+        logger.info(f"📈 ثبت معیارها در: {path}")
+    except OSError as e:
+        logger.warning(f"ثبت معیارها فعال نشد: {str(e)}")
+        _writer = None
+    return _writer
+
+
+def record_file_metrics(metrics):
+    """Write metrics if a writer is enabled; never raises"""
+    if _writer is None:
+        return
+    try:
+        _writer.record(metrics)
+    except OSError as e:
+        logger.warning(f"خطا در ثبت معیارها: {str(e)}")
+
+
+def start_profile():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profile(profiler, path):
+    """
+    Save cProfile stats to path and log the heaviest functions
+    ذخیره نتایج cProfile و نمایش پرهزینه‌ترین توابع
+    """
+    profiler.disable()
+    profiler.dump_stats(path)
+
+    logger.info(f"📊 نتایج پروفایل در {path} ذخیره شد (python -m pstats {path})")
+    # stderr keeps stdout clean for --progress-format jsonl
+    stats = pstats.Stats(profiler, stream=sys.stderr)
+    stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
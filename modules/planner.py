@@ -0,0 +1,186 @@
+"""
+Dry-run batch planning (--plan)
+برنامه‌ریزی دسته‌ای بدون اجرا
+
+Runs discovery, probing and categorization for a batch and reports, per
+file, what a real run would do: convert, skip, reject or treat as a
+duplicate, the output path, and the estimated encode time and output
+size from EncodeHistory. Nothing is encoded, no output folders are
+created, and the probe cache, scan index, fingerprint index and encode
+history of earlier runs are opened read-only.
+
+install_lazy_output_dirs() makes Categorizer compute paths only; a real
+run creates an output folder just before something is written into it.
+"""
+import os
+import sys
+import json
+import time
+import modules.categorizer
+from modules.categorizer import Categorizer
+from modules.logger import logger
+from modules.log_backend import log_debug
+from modules.prescan import PreScanner
+from modules.fingerprint import get_fingerprint_index
+from modules.encode_history import estimate_encode, get_encode_history
+from modules.renditions import select_renditions, rendition_path
+from modules.utils import format_size, format_time
+
+PLAN_FORMATS = ('text', 'json')
+
+
+def install_lazy_output_dirs():
+    """Make Categorizer.categorize_file compute paths without creating folders"""
+    modules.categorizer.ensure_directory_exists = lambda directory: False
+
+
+class BatchPlanner:
+    """
+    Plan a batch without converting anything
+    برنامه‌ریزی یک دسته بدون تبدیل
+    """
+
+    def __init__(self, output_dir, jobs=1, renditions=None, duplicates='skip'):
+        self.output_dir = output_dir
+        self.jobs = max(1, jobs)
+        self.renditions = renditions
+        self.duplicates = duplicates
+
+    def plan(self, input_files):
+        """
+        Decision and estimates for every input file, in scan order
+        تصمیم و تخمین برای هر فایل ورودی
+
+        Returns:
+            list of dicts with 'file', 'decision', 'reason' and, for files
+            that would be converted, 'type', 'output_file', 'outputs',
+            'duration', 'quality', 'input_size', 'estimated_seconds',
+            'estimated_size', 'estimated_fps' and 'estimate'
+        """
+        start_time = time.time()
+        history = get_encode_history()
+        index = get_fingerprint_index() if self.duplicates != 'off' else None
+        first_copies = {}
+        plan = []
+
+        for entry in PreScanner().stream(input_files):
+            item = {'file': entry['file'], 'decision': entry['action'], 'reason': entry['reason']}
+            plan.append(item)
+            if entry['action'] != 'convert':
+                continue
+
+            metadata = entry['metadata']
+            categorization = Categorizer.categorize_file(entry['file'], self.output_dir)
+            output_file = categorization['output_file']
+            item.update({
+                'type': categorization['type'],
+                'output_file': output_file,
+                'exists': os.path.exists(output_file),
+                'duration': metadata.get('duration', 0),
+                'quality': metadata.get('quality'),
+                'input_size': os.path.getsize(entry['file'])
+            })
+
+            # Same content converted before, or queued earlier in this batch
+            fingerprint = entry.get('fingerprint')
+            if fingerprint and index is not None:
+                earlier = index.lookup(fingerprint)
+                original = earlier[0] if earlier else first_copies.setdefault(fingerprint, entry['file'])
+                if original != entry['file']:
+                    item.update({'decision': 'duplicate', 'reason': original})
+                    continue
+
+            labels = select_renditions(self.renditions, metadata) if self.renditions else []
+            if len(labels) < 2:
+                labels = [None]
+
+            # Renditions share a decode but each output is encoded; their
+            # times are added, which errs on the long side
+            outputs = []
+            for i, label in enumerate(labels):
+                estimate = estimate_encode(metadata, label, history)
+                outputs.append({
+                    'label': label,
+                    'output_file': rendition_path(output_file, label, primary=(i == 0)),
+                    'estimated_seconds': round(estimate['seconds']),
+                    'estimated_size': estimate['size'],
+                    'estimated_fps': estimate['fps'],
+                    'estimate': estimate['source']
+                })
+            item.update({
+                'outputs': outputs,
+                'estimated_seconds': sum(o['estimated_seconds'] for o in outputs),
+                'estimated_size': sum(o['estimated_size'] for o in outputs),
+                'estimated_fps': outputs[0]['estimated_fps'],
+                'estimate': 'history' if all(o['estimate'] == 'history' for o in outputs) else 'default'
+            })
+
+        log_debug("Planned %d files in %.1fs", len(plan), time.time() - start_time)
+        return plan
+
+    def summary(self, plan):
+        """Counts and totals of a plan"""
+        counts = {'convert': 0, 'skip': 0, 'reject': 0, 'duplicate': 0}
+        for item in plan:
+            counts[item['decision']] += 1
+
+        converts = [item for item in plan if item['decision'] == 'convert']
+        encode_seconds = sum(item['estimated_seconds'] for item in converts)
+        return {
+            'files': len(plan),
+            'counts': counts,
+            'input_size': sum(item['input_size'] for item in converts),
+            'estimated_size': sum(item['estimated_size'] for item in converts),
+            'estimated_seconds': encode_seconds,
+            # Concurrent jobs share the machine; assume they divide the work evenly
+            'estimated_wall_seconds': round(encode_seconds / min(self.jobs, max(1, len(converts)))),
+            'jobs': self.jobs,
+            'from_history': sum(1 for item in converts if item['estimate'] == 'history')
+        }
+
+    def report(self, plan, plan_format='text'):
+        """
+        Print the plan as text lines or as one JSON document on stdout
+        نمایش برنامه به صورت متن یا JSON
+        """
+        summary = self.summary(plan)
+
+        if plan_format == 'json':
+            json.dump({'files': plan, 'summary': summary}, sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write('\n')
+            sys.stdout.flush()
+            return summary
+
+        for item in plan:
+            name = os.path.basename(item['file'])
+            if item['decision'] == 'convert':
+                marker = '~' if item['estimate'] == 'default' else ''
+                logger.info(
+                    f"  ▶ {name} → {item['output_file']} "
+                    f"({marker}{format_time(item['estimated_seconds'])}، "
+                    f"{format_size(item['input_size'])} → {marker}{format_size(item['estimated_size'])})"
+                    + (" [رونویسی]" if item['exists'] else "")
+                )
+            elif item['decision'] == 'duplicate':
+                logger.info(f"  ♊ {name}: تکراری ({os.path.basename(item['reason'])})")
+            else:
+                mark = '⏭️' if item['decision'] == 'skip' else '✗'
+                logger.info(f"  {mark} {name}: {item['reason']}")
+
+        counts = summary['counts']
+        logger.info(f"\n{'='*60}")
+        logger.info(
+            f"📋 برنامه: {counts['convert']} برای تبدیل، {counts['skip']} رد شده، "
+            f"{counts['reject']} نامعتبر، {counts['duplicate']} تکراری"
+        )
+        logger.info(
+            f"⏱️  زمان تخمینی: {format_time(summary['estimated_wall_seconds'])} "
+            f"با {summary['jobs']} کار هم‌زمان (مجموع {format_time(summary['estimated_seconds'])})"
+        )
+        logger.info(
+            f"💾 حجم: {format_size(summary['input_size'])} → {format_size(summary['estimated_size'])}"
+        )
+        if summary['from_history'] < counts['convert']:
+            logger.info("~ تخمین پیش‌فرض؛ پس از چند تبدیل از سابقه سرعت همین دستگاه استفاده می‌شود")
+        logger.info(f"{'='*60}")
+        return summary
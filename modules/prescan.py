@@ -0,0 +1,214 @@
+"""
+Parallel pre-scan of batch inputs
+پیش‌بررسی هم‌زمان فایل‌های ورودی پیش از تبدیل
+
+Every candidate is validated with a bounded number of ffprobe processes,
+producing a plan entry per file:
+
+    {'file': path, 'action': 'convert' | 'skip' | 'reject',
+     'reason': message or None, 'metadata': dict}
+
+Inputs may be a generator that is still walking the library: entries are
+produced while files are being found, and feed() queues convertible files
+for the encoders as soon as they are probed.
+"""
+import os
+import sys
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import MESSAGES, PRESCAN_WORKERS
+from modules.logger import logger
+from modules.log_backend import log_debug
+from modules.progress import BatchProgressTracker
+from modules.validator import Validator
+from modules.fingerprint import content_fingerprint, get_fingerprint_index
+
+# Validation failures that mean "nothing to do" rather than "broken input"
+SKIP_REASONS = (MESSAGES['already_x265'], MESSAGES['low_quality'])
+
+
+class PreScanner:
+    """
+    Probe all inputs concurrently and plan convert/skip/reject
+    بررسی هم‌زمان ورودی‌ها و تعیین تبدیل/رد/نامعتبر
+    """
+
+    def __init__(self, workers=PRESCAN_WORKERS):
+        self.workers = max(1, workers)
+
+    def scan(self, input_files):
+        """
+        Build a plan for input_files, preserving their order
+        ساخت برنامه پردازش با حفظ ترتیب فایل‌ها
+
+        Returns:
+            list of plan entry dicts
+        """
+        start_time = time.time()
+        plan = list(self.stream(input_files))
+        PreScanner.log_counts(PreScanner.count(plan), time.time() - start_time)
+        return plan
+
+    def stream(self, input_files):
+        """
+        Yield plan entries in input order while input_files is consumed
+        تولید تدریجی برنامه هم‌زمان با دریافت فایل‌ها
+
+        At most 2 x workers probes are in flight, so a generator of inputs
+        is never read far ahead of the probes.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for input_file in input_files:
+                pending.append(executor.submit(self._plan_file, input_file))
+                while pending and (len(pending) >= self.workers * 2 or pending[0].done()):
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def feed(self, input_files, scheduler, progress, duplicates=None):
+        """
+        Probe input_files and queue convertible ones in scheduler
+        بررسی فایل‌ها و افزودن فایل‌های قابل تبدیل به صف زمان‌بندی
+
+        Meant to run in its own thread; the caller calls
+        scheduler.start_feed() first so workers wait for entries.
+
+        Args:
+            duplicates: list collecting files whose content matches a file
+                        queued earlier in this batch; only the first copy
+                        is converted
+        """
+        start_time = time.time()
+        counts = {'convert': 0, 'skip': 0, 'reject': 0}
+        first_copies = {}
+
+        try:
+            for entry in self.stream(input_files):
+                counts[entry['action']] += 1
+                fingerprint = entry.get('fingerprint')
+                if entry['action'] == 'convert' and duplicates is not None and fingerprint:
+                    original = first_copies.setdefault(fingerprint, entry['file'])
+                    if original != entry['file']:
+                        log_debug("Duplicate in batch: %s = %s", entry['file'], original)
+                        duplicates.append({
+                            'file': entry['file'],
+                            'original': original,
+                            'fingerprint': fingerprint,
+                            'action': 'batch',
+                            'entry': entry
+                        })
+                        progress.add('skipped')
+                        continue
+                if entry['action'] == 'convert':
+                    progress.add()
+                    scheduler.push(entry)
+                else:
+                    PreScanner.log_plan([entry])
+                    progress.add('skipped' if entry['action'] == 'skip' else 'failed')
+        except Exception as e:
+            logger.error(f"خطا در جستجوی فایل‌ها: {str(e)}")
+        finally:
+            scheduler.end_feed()
+
+        PreScanner.log_counts(counts, time.time() - start_time)
+        return counts
+
+    @staticmethod
+    def _plan_file(input_file):
+        start_time = time.time()
+        entry = PreScanner._classify(input_file)
+        entry['probe_seconds'] = time.time() - start_time
+        if entry['action'] == 'convert' and get_fingerprint_index() is not None:
+            entry['fingerprint'] = content_fingerprint(input_file, entry['metadata'])
+        return entry
+
+    @staticmethod
+    def _classify(input_file):
+        try:
+            validation = Validator.validate_file(input_file)
+        except Exception as e:
+            return PreScanner._entry(input_file, 'reject', str(e))
+
+        if validation:
+            return PreScanner._entry(input_file, 'convert', None, validation.metadata)
+
+        action = 'skip' if validation.error_message in SKIP_REASONS else 'reject'
+        return PreScanner._entry(input_file, action, validation.error_message)
+
+    @staticmethod
+    def _entry(input_file, action, reason, metadata=None):
+        return {
+            'file': input_file,
+            'action': action,
+            'reason': reason,
+            'metadata': metadata or {}
+        }
+
+    @staticmethod
+    def count(plan):
+        """Number of plan entries per action"""
+        counts = {'convert': 0, 'skip': 0, 'reject': 0}
+        for entry in plan:
+            counts[entry['action']] += 1
+        return counts
+
+    @staticmethod
+    def log_counts(counts, seconds):
+        logger.info(
+            f"پیش‌بررسی {sum(counts.values())} فایل در {seconds:.1f}s: "
+            f"{counts['convert']} برای تبدیل، {counts['skip']} رد شده، "
+            f"{counts['reject']} نامعتبر"
+        )
+
+    @staticmethod
+    def log_plan(plan):
+        """Log skipped and rejected files with their reasons"""
+        for entry in plan:
+            if entry['action'] != 'convert':
+                log_debug(
+                    "%s: %s - %s", entry['action'], os.path.basename(entry['file']), entry['reason']
+                )
+
+
+class StreamingBatchProgress(BatchProgressTracker):
+    """
+    Batch progress whose total grows while files are still being found
+    پیشرفت دسته‌ای که تعداد کل آن هم‌زمان با یافتن فایل‌ها بیشتر می‌شود
+    """
+
+    def __init__(self):
+        # The total is unknown yet, so the header carries no count
+        self.total_files = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.out = sys.stderr
+        self.is_tty = self.out.isatty()
+        self.lock = threading.Lock()
+
+        if self.is_tty:
+            self.out.write("\n📦 Batch Processing\n")
+            self.out.flush()
+
+    def add(self, status=None):
+        """Count a newly found file; skipped/failed ones are already final"""
+        with self.lock:
+            self.total_files += 1
+            if status == 'skipped':
+                self.skipped += 1
+            elif status == 'failed':
+                self.failed += 1
+
+    def reopen(self):
+        """Count a file added as skipped as waiting again"""
+        with self.lock:
+            self.skipped -= 1
+
+    def update(self, status='completed'):
+        with self.lock:
+            if self.total_files:
+                super().update(status)
@@ -0,0 +1,211 @@
+"""
+Persistent ffprobe metadata cache
+کش ماندگار اطلاعات ffprobe
+
+Results are keyed by path, size, mtime and inode, so a file that changes
+on disk is probed again. The same entry serves both Validator and Verifier.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from urllib.request import pathname2url
+from config import PROBE_CACHE_FILE, PROBE_CACHE_MAX_ENTRIES, PROBE_CACHE_MAX_AGE_DAYS
+from modules.logger import logger
+from modules.log_backend import log_debug
+from modules.validator import Validator
+from modules.verifier import Verifier
+from modules.stream_planner import probe_metadata
+
+# Bump when the cached metadata layout changes
+SCHEMA_VERSION = 2
+
+_active_cache = None
+
+
+class ProbeCache:
+    """
+    SQLite-backed cache of Validator metadata
+    کش مبتنی بر SQLite برای اطلاعات Validator
+    """
+
+    def __init__(self, db_path, max_entries=PROBE_CACHE_MAX_ENTRIES,
+                 max_age_days=PROBE_CACHE_MAX_AGE_DAYS, read_only=False):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._extract = probe_metadata
+        self.read_only = read_only
+
+        if read_only:
+            # --plan reads earlier runs' data without changing it
+            self.conn = sqlite3.connect(
+                f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro",
+                uri=True, timeout=30, check_same_thread=False
+            )
+            return
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS probes ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER, mtime_ns INTEGER, inode INTEGER,"
+            " schema INTEGER, metadata TEXT,"
+            " created REAL, last_used REAL)"
+        )
+        self.conn.commit()
+        self.evict()
+
+    @staticmethod
+    def fingerprint(filepath):
+        """(size, mtime_ns, inode) of a file"""
+        st = os.stat(filepath)
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def get(self, filepath):
+        """
+        Cached metadata for filepath, or None on miss
+        اطلاعات کش شده فایل یا None
+        """
+        path = os.path.abspath(filepath)
+        try:
+            key = self.fingerprint(path)
+        except OSError:
+            return None
+
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, inode, schema, metadata FROM probes WHERE path = ?",
+                (path,)
+            ).fetchone()
+
+            if row and tuple(row[:3]) == key and row[3] == SCHEMA_VERSION:
+                if not self.read_only:
+                    self.conn.execute(
+                        "UPDATE probes SET last_used = ? WHERE path = ?", (time.time(), path)
+                    )
+                    self.conn.commit()
+                self.hits += 1
+                return json.loads(row[4])
+
+            self.misses += 1
+            return None
+
+    def put(self, filepath, metadata):
+        """Store metadata for filepath"""
+        if self.read_only:
+            return
+        path = os.path.abspath(filepath)
+        try:
+            size, mtime_ns, inode = self.fingerprint(path)
+        except OSError:
+            return
+
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, inode, SCHEMA_VERSION, json.dumps(metadata), now, now)
+            )
+            self.conn.commit()
+
+        if (self.hits + self.misses) % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        """
+        Drop entries older than max_age and trim to max_entries
+        حذف رکوردهای قدیمی و محدود کردن تعداد رکوردها
+        """
+        if self.read_only:
+            return
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM probes WHERE last_used < ?", (time.time() - self.max_age,)
+            )
+            self.conn.execute(
+                "DELETE FROM probes WHERE path IN ("
+                " SELECT path FROM probes ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.conn.commit()
+
+    def extract_metadata(self, filepath):
+        """
+        Drop-in replacement for Validator._extract_metadata
+        جایگزین Validator._extract_metadata با استفاده از کش
+        """
+        metadata = self.get(filepath)
+        if metadata is None:
+            metadata = self._extract(filepath)
+            self.put(filepath, metadata)
+        return metadata
+
+    def probe_file(self, filepath):
+        """
+        Drop-in replacement for Verifier._probe_file
+        جایگزین Verifier._probe_file با استفاده از کش
+        """
+        metadata = self.extract_metadata(filepath)
+        if not metadata.get('has_video'):
+            return {'has_video': False}
+
+        return {
+            'has_video': True,
+            'codec_name': metadata.get('codec_name', ''),
+            'duration': metadata.get('duration', 0)
+        }
+
+    def log_stats(self):
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0
+        logger.info(f"کش ffprobe: {self.hits} hit، {self.misses} miss ({rate:.0f}%)")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def enable_probe_cache(output_dir, read_only=False):
+    """
+    Open the cache under output_dir and route all probes through it
+    فعال‌سازی کش در پوشه خروجی برای همه ffprobe ها
+
+    Args:
+        read_only: use an existing cache without adding or touching entries
+    """
+    global _active_cache
+
+    if _active_cache is not None:
+        return _active_cache
+
+    try:
+        cache = ProbeCache(os.path.join(output_dir, PROBE_CACHE_FILE), read_only=read_only)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"کش ffprobe غیرفعال شد: {str(e)}")
+        return None
+
+    Validator._extract_metadata = staticmethod(cache.extract_metadata)
+    Verifier._probe_file = staticmethod(cache.probe_file)
+    _active_cache = cache
+
+    log_debug("Probe cache: %s", cache.db_path)
+    return cache
+
+
+def get_probe_cache():
+    """Active cache, or None when disabled"""
+    return _active_cache
+
+
+def log_probe_cache_stats():
+    """Log hit/miss counters if the cache is enabled"""
+    if _active_cache is not None:
+        _active_cache.log_stats()
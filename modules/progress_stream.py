@@ -0,0 +1,247 @@
+"""
+Structured FFmpeg progress pipeline
+خط لوله ساختاریافته پیشرفت FFmpeg
+
+FFmpeg is run with '-progress pipe:1', which writes key=value lines on
+stdout in blocks terminated by 'progress=continue' or 'progress=end'.
+Those blocks are parsed here, separately from the log on stderr, and fed
+to a tracker that either draws a throttled bar or emits JSON lines.
+"""
+import sys
+import json
+import time
+import shutil
+import threading
+from config import PROGRESS_REFRESH_SECONDS
+from modules.progress import (
+    ProgressTracker, get_rainbow_color, RESET, BOLD, CSI, MOVE_START, CLEAR_TO_END
+)
+from modules.utils import format_time
+
+# Bar colors for every whole percent, computed once
+_COLOR_RAMP = [get_rainbow_color(percent) for percent in range(101)]
+_EMPTY_CELL = f"{CSI}90m"
+
+_emit_lock = threading.Lock()
+
+
+def emit_event(event):
+    """
+    Write one JSON event line to stdout
+    نوشتن یک رویداد JSON در خروجی استاندارد
+    """
+    line = json.dumps(event, ensure_ascii=False)
+    with _emit_lock:
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+
+class ProgressBlockParser:
+    """
+    Collect '-progress' key=value lines into blocks
+    جمع‌آوری خطوط key=value خروجی -progress در بلوک‌ها
+    """
+
+    def __init__(self):
+        self.block = {}
+
+    def feed(self, line):
+        """
+        Add one line; return the finished block dict or None
+        """
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return None
+
+        self.block[key] = value
+        if key != 'progress':
+            return None
+
+        block, self.block = self.block, {}
+        return block
+
+
+def to_float(value, default=0.0):
+    try:
+        return float(str(value).rstrip('x'))
+    except (TypeError, ValueError):
+        return default
+
+
+def block_out_time(block):
+    """Output position of a block in seconds"""
+    # out_time_ms is in microseconds too (a long-standing FFmpeg misnomer)
+    for key in ('out_time_us', 'out_time_ms'):
+        if key in block:
+            return max(0.0, to_float(block[key]) / 1_000_000)
+    return 0.0
+
+
+class FastProgressTracker(ProgressTracker):
+    """
+    Progress bar fed by -progress blocks, redrawn at most every
+    PROGRESS_REFRESH_SECONDS
+    نوار پیشرفت با داده‌های -progress و به‌روزرسانی محدود شده با زمان
+    """
+
+    def __init__(self, **kwargs):
+        self.speed = 0.0
+        self.last_render = 0.0
+        self._columns = 79
+        self._columns_checked = 0.0
+        self._bar_cache = {}
+        super().__init__(**kwargs)
+
+    def update_block(self, block):
+        """
+        Apply one parsed -progress block
+        اعمال یک بلوک -progress
+        """
+        self.current_frame = int(to_float(block.get('frame'), self.current_frame))
+        self.fps = to_float(block.get('fps'), self.fps)
+        self.speed = to_float(block.get('speed'), self.speed)
+        self.current_time = block_out_time(block)
+
+        now = time.time()
+        if block.get('progress') != 'end' and now - self.last_render < PROGRESS_REFRESH_SECONDS:
+            return
+
+        self.update_progress(self.percent())
+
+    def percent(self):
+        if self.duration and self.duration > 0:
+            return min(self.current_time / self.duration * 100, 100)
+        return 0
+
+    def eta(self, percent):
+        """Remaining seconds, from encode speed when FFmpeg reports it"""
+        if self.duration and self.speed > 0:
+            return max(0.0, (self.duration - self.current_time) / self.speed)
+        elapsed = time.time() - self.start_time
+        return (elapsed / percent) * (100 - percent) if percent > 0 else 0
+
+    def _terminal_columns(self):
+        now = time.time()
+        if now - self._columns_checked >= 1.0:
+            try:
+                # Subtract 1 to prevent auto-wrapping on some terminals
+                self._columns = shutil.get_terminal_size().columns - 1
+            except Exception:
+                self._columns = 79
+            self._columns_checked = now
+        return self._columns
+
+    def _build_bar(self, width, percent):
+        filled = int(width * percent / 100)
+        key = (width, filled)
+
+        bar = self._bar_cache.get(key)
+        if bar is None:
+            cells = [f"{_COLOR_RAMP[i * 100 // width]}━" for i in range(filled)]
+            bar = ''.join(cells) + f"{RESET}{_EMPTY_CELL}{'─' * (width - filled)}{RESET}"
+            self._bar_cache = {key: bar}
+        return bar
+
+    def update_progress(self, percent):
+        self.last_render = time.time()
+        self.last_percent = int(percent)
+
+        if not self.is_tty:
+            return
+
+        columns = self._terminal_columns()
+        elapsed = time.time() - self.start_time
+
+        stats_text = (
+            f" {int(percent):3d}% "
+            f"│ ⚡ {self.fps:4.1f}fps "
+            f"│ ⏱️  {format_time(elapsed)} "
+            f"│ ⏳ {format_time(self.eta(percent))}"
+        )
+        stats_part = stats_text.replace(
+            f"{int(percent):3d}%", f"{_COLOR_RAMP[int(percent)]}{int(percent):3d}%{RESET}", 1
+        )
+
+        # prefix "⏳ " + bar brackets + safety padding for wide characters
+        fixed = 2 + 2 + 5 + len(stats_text)
+        min_bar_width = 10
+
+        info_part = ''
+        info_len = 0
+        total_duration = format_time(self.duration) if self.duration else "??"
+        base_info = f" | {self.quality} | {total_duration}"
+        available_for_info = columns - fixed - min_bar_width - 3
+
+        if available_for_info > len(base_info):
+            name = self.filename
+            max_name = available_for_info - len(base_info)
+            if len(name) > max_name:
+                name = name[:max(0, max_name - 3)] + "..."
+            info_text = f"{name}{base_info}"
+            info_part = f"{CSI}97m[{info_text}]{RESET} "
+            info_len = len(info_text) + 3
+
+        width = max(min_bar_width, columns - fixed - info_len)
+
+        self.out.write(
+            f"{MOVE_START}"
+            f"⏳ {info_part}{BOLD}[{self._build_bar(width, percent)}]{RESET}"
+            f"{stats_part}"
+            f"{CLEAR_TO_END}"
+        )
+        self.out.flush()
+
+
+class JsonProgressTracker(FastProgressTracker):
+    """
+    Emit progress as JSON lines for machine consumers (--progress-format jsonl)
+    ارسال پیشرفت به صورت خطوط JSON برای برنامه‌های دیگر
+    """
+
+    def __init__(self, duration=None, filename="", quality="", **kwargs):
+        # No terminal drawing at all, so ProgressTracker.__init__ is skipped
+        self.total_frames = None
+        self.duration = duration
+        self.filename = filename
+        self.quality = quality
+        self.start_time = time.time()
+        self.current_frame = 0
+        self.current_time = 0
+        self.fps = 0
+        self.speed = 0.0
+        self.last_update = 0
+        self.last_percent = -1
+        self.last_render = 0.0
+        self.out = sys.stdout
+        self.is_tty = False
+
+        emit_event({
+            'event': 'start',
+            'file': filename,
+            'quality': quality,
+            'duration': duration
+        })
+
+    def update_progress(self, percent):
+        self.last_render = time.time()
+        self.last_percent = int(percent)
+
+        emit_event({
+            'event': 'progress',
+            'file': self.filename,
+            'frame': self.current_frame,
+            'fps': self.fps,
+            'out_time': round(self.current_time, 3),
+            'speed': self.speed,
+            'percent': round(percent, 2),
+            'eta': round(self.eta(percent), 1)
+        })
+
+    def close(self):
+        emit_event({
+            'event': 'end',
+            'file': self.filename,
+            'frame': self.current_frame,
+            'out_time': round(self.current_time, 3),
+            'elapsed': round(self.get_elapsed_time(), 3)
+        })
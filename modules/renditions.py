@@ -0,0 +1,132 @@
+"""
+Multi-rendition encoding from a single decode
+تبدیل به چند کیفیت با یک بار رمزگشایی
+
+With --renditions 1080p,720p the source is decoded once, the video is
+split in the filter graph and every QUALITY_PRESETS profile is encoded
+to its own output by the same FFmpeg process:
+
+    ffmpeg -i in -filter_complex "[0:v:0]split=2[r0][r1];[r1]scale=-2:720[s1]"
+           -map [r0] ... -crf 25 out.x265.mkv
+           -map [s1] ... -crf 26 out.720p.x265.mkv
+
+The first rendition keeps the path Categorizer picks; the others add
+their label before '.x265.mkv'. Renditions taller than the source are
+not produced, so nothing is upscaled.
+"""
+import os
+from config import QUALITY_PRESETS, FFMPEG_BINARY, AUDIO_CODEC, AUDIO_BITRATE
+from modules.logger import logger
+from modules.job_pool import JobConverter
+from modules.resource_manager import ResourceManager
+from modules.stream_planner import StreamPlanner
+
+OUTPUT_SUFFIX = '.x265.mkv'
+
+
+def parse_renditions(value):
+    """
+    Rendition labels from a comma-separated --renditions value
+    فهرست کیفیت‌ها از مقدار --renditions
+
+    Raises:
+        ValueError: for labels missing from QUALITY_PRESETS
+    """
+    labels = [label.strip() for label in value.split(',') if label.strip()]
+    unknown = [label for label in labels if label not in QUALITY_PRESETS or label == 'default']
+    if not labels or unknown:
+        raise ValueError(f"unknown renditions: {', '.join(unknown) or value}")
+
+    # Tallest first: it gets the Categorizer path
+    labels = list(dict.fromkeys(labels))
+    return sorted(labels, key=lambda label: -QUALITY_PRESETS[label]['max_height'])
+
+
+def select_renditions(labels, metadata):
+    """
+    Renditions worth producing for a source: none taller than the source
+    کیفیت‌های قابل تولید برای یک فایل، بدون بزرگ‌نمایی
+    """
+    height = metadata.get('height', 0)
+    return [label for label in labels if QUALITY_PRESETS[label]['max_height'] <= height]
+
+
+def rendition_path(output_file, label, primary):
+    """Output path of one rendition next to the Categorizer path"""
+    if primary:
+        return output_file
+    if output_file.endswith(OUTPUT_SUFFIX):
+        return output_file[:-len(OUTPUT_SUFFIX)] + f".{label}{OUTPUT_SUFFIX}"
+    base, ext = os.path.splitext(output_file)
+    return f"{base}.{label}{ext}"
+
+
+class RenditionConverter(JobConverter):
+    """
+    Encode several renditions of one input in a single FFmpeg run
+    تبدیل یک ورودی به چند کیفیت در یک اجرای FFmpeg
+    """
+
+    def __init__(self, input_file, outputs, metadata, **kwargs):
+        """
+        Args:
+            outputs: list of (label, output_file), tallest first
+        """
+        super().__init__(input_file, outputs[0][1], metadata, **kwargs)
+        self.outputs = outputs
+
+    def _build_ffmpeg_command(self, preset):
+        height = self.metadata.get('height', 0)
+        count = len(self.outputs)
+        # The job's thread share is divided among the encoders
+        threads = max(1, (self.threads or ResourceManager.get_recommended_threads()) // count)
+
+        # One decode, split once per rendition, scaled where needed
+        graph = [f"[0:v:0]split={count}" + ''.join(f"[r{i}]" for i in range(count))]
+        video_maps = []
+        for i, (label, _) in enumerate(self.outputs):
+            max_height = QUALITY_PRESETS[label]['max_height']
+            if height > max_height:
+                graph.append(f"[r{i}]scale=-2:{max_height}[s{i}]")
+                video_maps.append(f"[s{i}]")
+            else:
+                video_maps.append(f"[r{i}]")
+
+        plan = StreamPlanner.plan(self.metadata)
+        chapters = self.metadata.get('chapters', 0)
+        if plan:
+            StreamPlanner.log_plan(plan, chapters)
+
+        cmd = [
+            FFMPEG_BINARY, '-i', self.input_file,
+            '-filter_complex', ';'.join(graph),
+            '-progress', 'pipe:1', '-nostats', '-y'
+        ]
+
+        for (label, output_file), video_map in zip(self.outputs, video_maps):
+            rendition = QUALITY_PRESETS[label]
+            if plan:
+                cmd.extend(StreamPlanner.build_args(plan, chapters, video_map=video_map))
+            else:
+                cmd.extend(['-map', video_map])
+                if self.metadata.get('audio_streams', 0) > 0:
+                    cmd.extend(['-map', '0:a'])
+                cmd.extend(['-c:a', AUDIO_CODEC, '-b:a', AUDIO_BITRATE])
+            cmd.extend([
+                '-c:v', 'libx265',
+                '-crf', str(rendition['crf']),
+                '-preset', rendition['preset'],
+                '-threads', str(threads),
+                output_file
+            ])
+            logger.info(f"کیفیت {label}: CRF {rendition['crf']} → {os.path.basename(output_file)}")
+
+        return cmd
+
+    def _cleanup_incomplete_file(self):
+        for _, output_file in self.outputs:
+            if os.path.exists(output_file):
+                try:
+                    os.remove(output_file)
+                except OSError as e:
+                    logger.error(f"خطا در حذف فایل ناقص: {str(e)}")
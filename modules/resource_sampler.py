@@ -0,0 +1,211 @@
+"""
+Background system resource sampler
+نمونه‌بردار پس‌زمینه منابع سیستم
+
+A daemon thread samples CPU, memory, disk and load average every
+RESOURCE_SAMPLE_INTERVAL seconds into a ring buffer and keeps smoothed
+values. Once installed, ResourceManager queries read the buffer instead of
+blocking in psutil.cpu_percent(interval=1).
+"""
+import os
+import time
+import threading
+from collections import deque
+import psutil
+from config import (
+    RESOURCE_SAMPLE_INTERVAL, RESOURCE_HISTORY_SECONDS, RESOURCE_SMOOTHING, MAX_CPU_PERCENT,
+    MIN_AVAILABLE_MEMORY_GB
+)
+from modules.logger import logger
+from modules.log_backend import log_debug
+from modules.resource_manager import ResourceManager
+
+_active_sampler = None
+
+
+class ResourceSampler:
+    """
+    Ring buffer of system samples with exponentially smoothed values
+    بافر حلقوی نمونه‌های سیستم با مقادیر هموارشده
+    """
+
+    def __init__(self, disk_path='/', interval=RESOURCE_SAMPLE_INTERVAL,
+                 history_seconds=RESOURCE_HISTORY_SECONDS, smoothing=RESOURCE_SMOOTHING):
+        self.disk_path = disk_path
+        self.interval = interval
+        self.smoothing = smoothing
+        self.samples = deque(maxlen=max(1, int(history_seconds / interval)))
+        self.smoothed = {}
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Take a first sample and start the background thread
+        گرفتن اولین نمونه و شروع رشته پس‌زمینه
+        """
+        # Prime cpu_percent so the first non-blocking read is meaningful
+        psutil.cpu_percent(interval=0.1)
+        self.sample()
+
+        self._thread = threading.Thread(target=self._run, name='ResourceSampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval * 2)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                log_debug("Resource sample failed: %s", e)
+
+    def sample(self):
+        """Record one sample"""
+        mem = psutil.virtual_memory()
+        try:
+            disk = psutil.disk_usage(self.disk_path)
+            disk_percent, disk_free_gb = disk.percent, disk.free / (1024 ** 3)
+        except OSError:
+            disk_percent, disk_free_gb = 0.0, 0.0
+
+        try:
+            load_1m = os.getloadavg()[0]
+        except (OSError, AttributeError):
+            load_1m = 0.0
+
+        sample = {
+            'time': time.time(),
+            'cpu_percent': psutil.cpu_percent(interval=None),
+            'memory_percent': mem.percent,
+            'memory_available_gb': mem.available / (1024 ** 3),
+            'disk_percent': disk_percent,
+            'disk_free_gb': disk_free_gb,
+            'load_1m': load_1m
+        }
+
+        with self.lock:
+            self.samples.append(sample)
+            alpha = self.smoothing
+            for key, value in sample.items():
+                if key == 'time':
+                    continue
+                previous = self.smoothed.get(key)
+                self.smoothed[key] = value if previous is None else previous + alpha * (value - previous)
+
+        return sample
+
+    def latest(self):
+        """Most recent raw sample"""
+        with self.lock:
+            return dict(self.samples[-1]) if self.samples else {}
+
+    def value(self, key):
+        """Smoothed value of key"""
+        with self.lock:
+            return self.smoothed.get(key, 0.0)
+
+    def history(self, seconds=60):
+        """
+        Samples from the last `seconds` seconds
+        نمونه‌های چند ثانیه اخیر
+        """
+        since = time.time() - seconds
+        with self.lock:
+            return [dict(s) for s in self.samples if s['time'] >= since]
+
+    def summarize(self, key, seconds=60):
+        """(min, avg, max) of key over the last `seconds` seconds"""
+        values = [s[key] for s in self.history(seconds)]
+        if not values:
+            return 0.0, 0.0, 0.0
+        return min(values), sum(values) / len(values), max(values)
+
+    # --- Non-blocking replacements for ResourceManager ---
+
+    def get_cpu_usage(self):
+        return self.value('cpu_percent')
+
+    def get_available_memory_gb(self):
+        return self.value('memory_available_gb')
+
+    def get_memory_percent(self):
+        return self.value('memory_percent')
+
+    def get_system_stats(self):
+        latest = self.latest()
+        mem_total = psutil.virtual_memory().total
+        try:
+            disk_total = psutil.disk_usage(self.disk_path).total
+        except OSError:
+            disk_total = 0
+        _, cpu_avg, cpu_max = self.summarize('cpu_percent', 60)
+
+        return {
+            'cpu_percent': self.value('cpu_percent'),
+            'cpu_percent_avg_1m': cpu_avg,
+            'cpu_percent_max_1m': cpu_max,
+            'cpu_count': psutil.cpu_count(logical=True),
+            'load_1m': latest.get('load_1m', 0.0),
+            'memory_total_gb': mem_total / (1024 ** 3),
+            'memory_available_gb': self.value('memory_available_gb'),
+            'memory_percent': self.value('memory_percent'),
+            'disk_total_gb': disk_total / (1024 ** 3),
+            'disk_free_gb': latest.get('disk_free_gb', 0.0),
+            'disk_percent': latest.get('disk_percent', 0.0)
+        }
+
+    def overloaded(self):
+        """Smoothed CPU or memory beyond the limits (no warning logged)"""
+        return (
+            self.value('cpu_percent') > MAX_CPU_PERCENT
+            or self.value('memory_available_gb') < MIN_AVAILABLE_MEMORY_GB
+        )
+
+    def wait_for_resources(self):
+        """Wait until the smoothed load is back under the limits"""
+        # is_system_overloaded() warns on every call; polled each second
+        # that would flood the log
+        last_log = 0
+        while self.overloaded():
+            if time.time() - last_log >= 30:
+                logger.info(
+                    f"منتظر آزاد شدن منابع سیستم... (CPU={self.value('cpu_percent'):.1f}%، "
+                    f"حافظه موجود={self.value('memory_available_gb'):.2f}GB)"
+                )
+                last_log = time.time()
+            self._stop.wait(self.interval)
+
+        logger.info("منابع سیستم آماده است")
+
+
+def start_resource_sampler(disk_path='/'):
+    """
+    Start the sampler and route ResourceManager queries through it
+    شروع نمونه‌بردار و اتصال ResourceManager به آن
+    """
+    global _active_sampler
+
+    if _active_sampler is not None:
+        return _active_sampler
+
+    sampler = ResourceSampler(disk_path=disk_path).start()
+
+    ResourceManager.get_cpu_usage = staticmethod(sampler.get_cpu_usage)
+    ResourceManager.get_available_memory_gb = staticmethod(sampler.get_available_memory_gb)
+    ResourceManager.get_memory_percent = staticmethod(sampler.get_memory_percent)
+    ResourceManager.get_system_stats = staticmethod(sampler.get_system_stats)
+    ResourceManager.wait_for_resources = staticmethod(sampler.wait_for_resources)
+
+    _active_sampler = sampler
+    return sampler
+
+
+def get_resource_sampler():
+    """Active sampler, or None if not started"""
+    return _active_sampler
@@ -0,0 +1,237 @@
+"""
+Streaming directory scanner with a persistent directory index
+جستجوی تدریجی پوشه‌ها با فهرست ماندگار پوشه‌ها
+
+Candidates are yielded as soon as they are found (os.scandir, no
+os.path.abspath per entry), so probing and encoding can start while a
+large tree is still being walked.
+
+A directory's mtime changes whenever an entry is added, removed or
+renamed in it. The index stores each directory's mtime together with its
+video files and subdirectories, so a repeat scan only stats unchanged
+directories instead of listing them. Listings whose mtime is too recent
+to be trusted (coarse mtime resolution) are not stored.
+"""
+import os
+import json
+import glob
+import time
+import sqlite3
+import threading
+from urllib.request import pathname2url
+from config import (
+    SUPPORTED_FORMATS, SCAN_INDEX_FILE, SCAN_INDEX_MAX_AGE_DAYS, SCAN_INDEX_RACY_SECONDS,
+    SCAN_INDEX_COMMIT_EVERY
+)
+from modules.logger import logger
+from modules.log_backend import log_debug
+
+_active_index = None
+
+
+def _excluded(name):
+    # Like the old os.walk filter: _processed, _failed, _incomplete, output
+    return name.startswith('_') or name == 'output'
+
+
+def _is_video(name):
+    return os.path.splitext(name)[1].lower() in SUPPORTED_FORMATS
+
+
+class DirectoryIndex:
+    """
+    SQLite-backed directory listings keyed by directory mtime
+    فهرست محتوای پوشه‌ها بر اساس زمان تغییر پوشه
+    """
+
+    def __init__(self, db_path, max_age_days=SCAN_INDEX_MAX_AGE_DAYS, read_only=False):
+        self.db_path = db_path
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.read_only = read_only
+
+        if read_only:
+            # --plan reads earlier runs' data without changing it
+            self.conn = sqlite3.connect(
+                f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro",
+                uri=True, timeout=30, check_same_thread=False
+            )
+            return
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER, files TEXT, subdirs TEXT, listed REAL)"
+        )
+        # Unchanged directories are simply listed again once they age out
+        self.conn.execute("DELETE FROM dirs WHERE listed < ?", (time.time() - self.max_age,))
+        self.conn.commit()
+
+    def get(self, path, mtime_ns):
+        """(files, subdirs) of path if its mtime is unchanged, else None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT mtime_ns, files, subdirs FROM dirs WHERE path = ?", (path,)
+            ).fetchone()
+
+        if row and row[0] == mtime_ns:
+            self.hits += 1
+            return json.loads(row[1]), json.loads(row[2])
+
+        self.misses += 1
+        return None
+
+    def put(self, path, mtime_ns, files, subdirs):
+        if self.read_only:
+            return
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)",
+                (path, mtime_ns, json.dumps(files), json.dumps(subdirs), time.time())
+            )
+            # One commit per batch of directories, not per directory
+            self.pending += 1
+            if self.pending >= SCAN_INDEX_COMMIT_EVERY:
+                self.conn.commit()
+                self.pending = 0
+
+    def flush(self):
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+
+    def log_stats(self):
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0
+        logger.info(f"فهرست پوشه‌ها: {self.hits} پوشه بدون تغییر، {self.misses} پوشه خوانده شد ({rate:.0f}%)")
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+def _list_directory(path, index):
+    """
+    Video file names and subdirectory names of path
+    نام فایل‌های ویدیویی و زیرپوشه‌های یک پوشه
+    """
+    st = os.stat(path)
+    if index is not None:
+        cached = index.get(path, st.st_mtime_ns)
+        if cached is not None:
+            return cached
+
+    files = []
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    # Symlinked directories are not followed, as with os.walk
+                    if not entry.is_symlink() and not _excluded(entry.name):
+                        subdirs.append(entry.name)
+                elif _is_video(entry.name) and entry.is_file():
+                    files.append(entry.name)
+            except OSError:
+                continue
+
+    files.sort()
+    subdirs.sort()
+    if index is not None and time.time() - st.st_mtime > SCAN_INDEX_RACY_SECONDS:
+        index.put(path, st.st_mtime_ns, files, subdirs)
+
+    return files, subdirs
+
+
+def _walk(root, index):
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            files, subdirs = _list_directory(directory, index)
+        except OSError as e:
+            logger.warning(f"خطا در خواندن پوشه {directory}: {str(e)}")
+            continue
+
+        for name in files:
+            yield os.path.join(directory, name)
+
+        # Reversed so subdirectories are visited in sorted order
+        stack.extend(os.path.join(directory, name) for name in reversed(subdirs))
+
+
+def scan_video_files(paths, index=None):
+    """
+    Yield absolute paths of video files under paths, without duplicates
+    تولید تدریجی مسیر فایل‌های ویدیویی، بدون تکرار
+
+    Args:
+        paths: files, directories or wildcard patterns
+        index: DirectoryIndex for skipping unchanged directories
+    """
+    seen = set()
+
+    try:
+        for path in paths:
+            # glob only for patterns; a plain path needs no directory listing
+            expanded = glob.glob(path) if glob.has_magic(path) else [path]
+
+            for expanded_path in expanded:
+                expanded_path = os.path.abspath(expanded_path)
+
+                if os.path.isdir(expanded_path):
+                    candidates = _walk(expanded_path, index)
+                elif os.path.isfile(expanded_path) and _is_video(expanded_path):
+                    candidates = [expanded_path]
+                else:
+                    continue
+
+                for filepath in candidates:
+                    if filepath not in seen:
+                        seen.add(filepath)
+                        yield filepath
+    finally:
+        if index is not None:
+            index.flush()
+
+
+def enable_scan_index(output_dir, read_only=False):
+    """
+    Open the directory index under output_dir
+    فعال‌سازی فهرست پوشه‌ها در پوشه خروجی
+
+    Args:
+        read_only: use an existing index without storing new listings
+    """
+    global _active_index
+
+    if _active_index is not None:
+        return _active_index
+
+    try:
+        _active_index = DirectoryIndex(os.path.join(output_dir, SCAN_INDEX_FILE), read_only=read_only)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"فهرست پوشه‌ها غیرفعال شد: {str(e)}")
+        return None
+
+    log_debug("Scan index: %s", _active_index.db_path)
+    return _active_index
+
+
+def get_scan_index():
+    """Active directory index, or None when disabled"""
+    return _active_index
+
+
+def log_scan_index_stats():
+    """Log how many directories were skipped if the index is enabled"""
+    if _active_index is not None:
+        _active_index.log_stats()
@@ -0,0 +1,246 @@
+"""
+Cost-aware job scheduling for batch and watch queues
+زمان‌بندی کارها بر اساس هزینه برای صف دسته‌ای و حالت نظارت
+
+Each job gets a cost estimate from its probe metadata (duration, frame
+size, and whether it is downscaled to 1080p). Policies decide which
+queued job runs next:
+
+    fifo      order the files were queued in
+    sjf       shortest job first, so one 4K movie does not hold up
+              dozens of short episodes
+    oldest    oldest file (by modification time) first
+    category  by SCHEDULER_CATEGORY_PRIORITY, shortest first within a type
+
+Aging credits every job SCHEDULER_AGING_RATE cost-seconds per second it
+waits, so large jobs cannot starve behind a steady stream of small ones.
+An explicit entry['priority'] (daemon reprioritize) moves a job ahead by
+SCHEDULER_PRIORITY_STEP cost-seconds per level.
+
+While a scan is still feeding the queue (start_feed/end_feed), pop()
+waits for the next entry instead of reporting an empty queue.
+"""
+import os
+import time
+import heapq
+import threading
+from config import (
+    SCHEDULER_DECODE_WEIGHT, SCHEDULER_AGING_RATE, SCHEDULER_CATEGORY_PRIORITY,
+    SCHEDULER_CATEGORY_STEP, SCHEDULER_PRIORITY_STEP
+)
+from modules.categorizer import Categorizer
+from modules.logger import logger
+from modules.log_backend import log_debug
+from modules.utils import extract_filename_without_ext, format_time
+
+SCHEDULER_POLICIES = ('fifo', 'sjf', 'oldest', 'category')
+
+REFERENCE_PIXELS = 1920 * 1080
+
+
+def estimate_cost(metadata):
+    """
+    Relative encode cost: seconds of media weighted by frame size
+    هزینه نسبی تبدیل: مدت فایل ضربدر اندازه تصویر نسبت به 1080p
+
+    Files above 1080p are decoded at full size but encoded at 1080p.
+    """
+    duration = metadata.get('duration') or 0.0
+    width = metadata.get('width') or 1920
+    height = metadata.get('height') or 1080
+
+    decode = width * height / REFERENCE_PIXELS
+    if height > 1080:
+        encode = (width * 1080 / height) * 1080 / REFERENCE_PIXELS
+    else:
+        encode = decode
+
+    return duration * (encode + SCHEDULER_DECODE_WEIGHT * decode)
+
+
+def detect_category(filepath):
+    """
+    Output type of a file ('series', 'anime' or 'movie') without
+    creating its output folders
+    نوع خروجی فایل بدون ایجاد پوشه‌های خروجی
+    """
+    name = extract_filename_without_ext(filepath)
+    if Categorizer._detect_series(name):
+        return 'series'
+    if Categorizer._is_anime(name):
+        return 'anime'
+    return 'movie'
+
+
+class JobScheduler:
+    """
+    Thread-safe priority queue of plan entries
+    صف اولویت‌دار و امن برای چند رشته از کارهای تبدیل
+    """
+
+    def __init__(self, policy='sjf'):
+        if policy not in SCHEDULER_POLICIES:
+            raise ValueError(f"unknown scheduling policy: {policy}")
+        self.policy = policy
+        self.lock = threading.Condition()
+        self.heap = []
+        self.queued = set()
+        self.sequence = 0
+        self.feeding = False
+        self.closed = False
+
+    def __len__(self):
+        with self.lock:
+            return len(self.heap)
+
+    def __contains__(self, filepath):
+        with self.lock:
+            return filepath in self.queued
+
+    def push(self, entry):
+        """
+        Queue a plan entry ({'file', 'metadata', ...})
+        افزودن یک کار به صف
+
+        Sets entry['cost'] and entry['queued_at'] if missing.
+        """
+        key = self.priority(entry)
+
+        with self.lock:
+            if self.closed:
+                return
+            self.sequence += 1
+            heapq.heappush(self.heap, (key, self.sequence, entry))
+            self.queued.add(entry['file'])
+            self.lock.notify()
+
+    def priority(self, entry):
+        """
+        Sort key of entry under this policy (lower runs first)
+        کلید مرتب‌سازی کار؛ مقدار کمتر زودتر اجرا می‌شود
+        """
+        entry.setdefault('queued_at', time.time())
+        entry['cost'] = estimate_cost(entry.get('metadata') or {})
+
+        # score = base - rate * (now - queued_at). 'now' is the same for
+        # every job, so ordering by base + rate * queued_at is equivalent
+        # and aging needs no re-sorting.
+        return (
+            self._base(entry) + SCHEDULER_AGING_RATE * entry['queued_at']
+            - entry.get('priority', 0) * SCHEDULER_PRIORITY_STEP
+        )
+
+    def extend(self, entries):
+        for entry in entries:
+            self.push(entry)
+
+    def start_feed(self):
+        """Entries are still coming; pop() waits instead of returning None"""
+        with self.lock:
+            self.feeding = True
+
+    def end_feed(self):
+        with self.lock:
+            self.feeding = False
+            self.lock.notify_all()
+
+    def close(self):
+        """Drop queued entries and wake every waiting pop() (on interrupt)"""
+        with self.lock:
+            self.closed = True
+            self.heap = []
+            self.queued.clear()
+            self.lock.notify_all()
+
+    def pop(self):
+        """
+        Next entry to run, or None when the queue is empty (and no scan
+        is feeding it) or closed
+        کار بعدی برای اجرا
+        """
+        with self.lock:
+            while not self.heap and self.feeding and not self.closed:
+                self.lock.wait()
+            if not self.heap:
+                return None
+            _, _, entry = heapq.heappop(self.heap)
+            self.queued.discard(entry['file'])
+
+        log_debug(
+            "Scheduled (%s): %s cost=%.0f waited=%.0fs", self.policy,
+            os.path.basename(entry['file']), entry['cost'], time.time() - entry['queued_at']
+        )
+        return entry
+
+    def peek(self):
+        """Entry pop() would return next, without removing it (or None)"""
+        with self.lock:
+            return self.heap[0][2] if self.heap else None
+
+    def entries(self):
+        """Queued entries in the order they would run"""
+        with self.lock:
+            return [entry for _, _, entry in sorted(self.heap, key=lambda item: item[:2])]
+
+    def remove(self, filepath):
+        """
+        Take a queued entry out of the queue
+        حذف یک کار از صف
+
+        Returns:
+            the removed entry, or None if filepath is not queued
+        """
+        with self.lock:
+            for i, (_, _, entry) in enumerate(self.heap):
+                if entry['file'] == filepath:
+                    self.heap.pop(i)
+                    heapq.heapify(self.heap)
+                    self.queued.discard(filepath)
+                    return entry
+        return None
+
+    def reprioritize(self, filepath, priority):
+        """
+        Change the priority level of a queued entry (higher runs sooner)
+        تغییر اولویت یک کار در صف
+
+        Returns:
+            True if filepath was queued
+        """
+        entry = self.remove(filepath)
+        if entry is None:
+            return False
+        entry['priority'] = priority
+        self.push(entry)
+        return True
+
+    def _base(self, entry):
+        if self.policy == 'sjf':
+            return entry['cost']
+
+        if self.policy == 'oldest':
+            try:
+                return os.path.getmtime(entry['file'])
+            except OSError:
+                return entry['queued_at']
+
+        if self.policy == 'category':
+            category = detect_category(entry['file'])
+            if category in SCHEDULER_CATEGORY_PRIORITY:
+                rank = SCHEDULER_CATEGORY_PRIORITY.index(category)
+            else:
+                rank = len(SCHEDULER_CATEGORY_PRIORITY)
+            return rank * SCHEDULER_CATEGORY_STEP + entry['cost']
+
+        # fifo
+        return entry['queued_at']
+
+    def log_queue(self):
+        """Log the policy, queue length and total estimated work"""
+        with self.lock:
+            count = len(self.heap)
+            total = sum(entry['cost'] for _, _, entry in self.heap)
+        logger.info(
+            f"🗂️  زمان‌بندی {self.policy}: {count} کار در صف، "
+            f"هزینه تخمینی {format_time(total)} (معادل 1080p)"
+        )
@@ -0,0 +1,510 @@
+"""
+Segment-parallel encoding of a single long file
+تبدیل موازی یک فایل طولانی به صورت قطعه‌قطعه
+
+The video is cut at keyframes into N time ranges, the ranges are encoded
+concurrently with the usual QUALITY_PRESETS settings, and the pieces are
+joined with the concat demuxer (stream copy). Audio is encoded once from
+the original input while joining.
+
+In resumable mode every finished piece is committed to a manifest in the
+work directory, which is kept after a failure so the next attempt (or the
+next run) only encodes the missing pieces.
+"""
+import os
+import json
+import math
+import shutil
+import time
+import signal
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    AUDIO_CODEC, AUDIO_BITRATE, FFMPEG_BINARY, FFPROBE_BINARY,
+    MESSAGES, SEGMENT_MIN_SECONDS, THREADS_PER_JOB, CHECKPOINT_SECONDS,
+    PROGRESS_REFRESH_SECONDS
+)
+from modules.logger import logger
+from modules.log_backend import debug_enabled
+from modules.probe_cache import ProbeCache
+from modules.resource_manager import ResourceManager
+from modules.job_pool import JobConverter
+from modules.progress_stream import ProgressBlockParser, block_out_time, to_float
+from modules.stream_planner import StreamPlanner
+
+import psutil
+
+SEGMENTS_DIR = '_segments'
+
+# Keyframes are searched for in this window after each cut point
+KEYFRAME_SEARCH_SECONDS = 20
+
+
+def resolve_segments(value, duration):
+    """
+    Number of segments for a file of the given duration
+    تعداد قطعه‌ها برای فایلی با مدت زمان داده شده
+
+    value is '--segments' as given: 'auto' or a positive integer.
+    Files too short for two SEGMENT_MIN_SECONDS pieces get 1.
+    """
+    if str(value).lower() == 'auto':
+        cpu_count = psutil.cpu_count(logical=True) or 1
+        count = max(1, cpu_count // THREADS_PER_JOB)
+    else:
+        count = int(value)
+        if count < 1:
+            raise ValueError("segments must be >= 1")
+
+    if not duration:
+        return 1
+
+    return max(1, min(count, int(duration // SEGMENT_MIN_SECONDS)))
+
+
+def checkpoint_count(duration):
+    """
+    Number of CHECKPOINT_SECONDS pieces for a resumable encode
+    تعداد قطعه‌های نقطه بازیابی برای تبدیل قابل ادامه
+    """
+    if not duration:
+        return 1
+    return max(1, math.ceil(duration / CHECKPOINT_SECONDS))
+
+
+class SegmentPlanner:
+    """
+    Choose segment boundaries on source keyframes
+    انتخاب مرز قطعه‌ها روی keyframe های فایل اصلی
+    """
+
+    @staticmethod
+    def plan(input_file, duration, count):
+        """
+        Split [0, duration] into count ranges starting at keyframes
+
+        Returns:
+            list of (start, end) in seconds; the last end is None (to EOF)
+        """
+        start_time = SegmentPlanner._start_time(input_file)
+
+        cuts = [0.0]
+        for i in range(1, count):
+            target = duration * i / count
+            cut = SegmentPlanner._next_keyframe(input_file, target + start_time)
+            cut = (cut - start_time) if cut is not None else target
+
+            # Two targets can snap to the same keyframe on sparse GOPs
+            if cut > cuts[-1] + 1.0 and cut < duration:
+                cuts.append(cut)
+
+        ends = cuts[1:] + [None]
+        return list(zip(cuts, ends))
+
+    @staticmethod
+    def _start_time(input_file):
+        cmd = [
+            FFPROBE_BINARY, '-v', 'error',
+            '-show_entries', 'format=start_time',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            input_file
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            return float(result.stdout.strip() or 0)
+        except (subprocess.SubprocessError, ValueError):
+            return 0.0
+
+    @staticmethod
+    def _next_keyframe(input_file, position):
+        """First video keyframe at or after position (absolute pts), or None"""
+        cmd = [
+            FFPROBE_BINARY, '-v', 'error',
+            '-select_streams', 'v:0',
+            '-read_intervals', f"{position:.3f}%+{KEYFRAME_SEARCH_SECONDS}",
+            '-show_entries', 'packet=pts_time,flags',
+            '-of', 'csv=p=0',
+            input_file
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        except subprocess.SubprocessError:
+            return None
+
+        for line in result.stdout.splitlines():
+            parts = line.strip().split(',')
+            if len(parts) < 2 or 'K' not in parts[1]:
+                continue
+            try:
+                pts = float(parts[0])
+            except ValueError:
+                continue
+            if pts >= position:
+                return pts
+
+        return None
+
+
+class SegmentedConverter(JobConverter):
+    """
+    Encode one file as concurrently encoded keyframe-aligned pieces
+    تبدیل یک فایل به صورت قطعه‌های هم‌زمان هم‌تراز با keyframe
+    """
+
+    def __init__(self, input_file, output_file, metadata, segments=2, workers=None,
+                 resumable=False, threads=None, display=None, slot=0, progress_format='bar'):
+        """
+        Args:
+            segments: number of time ranges the file is cut into
+            workers: ranges encoded at the same time (default: all)
+            resumable: keep committed pieces after a failure
+            progress_format: 'bar' or 'jsonl'; the combined progress of all
+                             pieces goes to the same tracker as a whole-file encode
+        """
+        super().__init__(
+            input_file, output_file, metadata, threads=threads, display=display, slot=slot,
+            progress_format=progress_format or 'bar'
+        )
+        self.segments = segments
+        self.workers = workers or segments
+        self.resumable = resumable
+        self.manifest = None
+        self.processes = []
+        self.lock = threading.Lock()
+        self.segment_done = []
+        self.segment_fps = []
+        self.segment_frames = []
+
+        name = os.path.splitext(os.path.basename(output_file))[0]
+        self.work_dir = os.path.join(os.path.dirname(output_file), SEGMENTS_DIR, name)
+
+    def convert(self):
+        """
+        Convert video to x265 in parallel segments
+        تبدیل ویدیو به x265 در قطعه‌های موازی
+
+        Returns:
+            True if successful, False otherwise
+        """
+        in_main_thread = threading.current_thread() is threading.main_thread()
+        progress = None
+
+        try:
+            quality = self.metadata.get('quality', '1080p')
+            preset = self._get_preset(quality)
+            duration = self.metadata.get('duration', 0)
+
+            ranges, done = self._load_or_plan(preset, duration)
+            workers = min(self.workers, len(ranges))
+            budget = self.threads or ResourceManager.get_recommended_threads()
+            threads = max(1, budget // workers)
+
+            logger.info(
+                f"شروع تبدیل قطعه‌ای: {os.path.basename(self.input_file)} "
+                f"({len(ranges)} قطعه، {workers} هم‌زمان × {threads} threads)"
+            )
+            if done:
+                logger.info(f"♻️  ادامه از نقطه بازیابی: {len(done)}/{len(ranges)} قطعه آماده است")
+
+            if in_main_thread:
+                signal.signal(signal.SIGINT, self._handle_interrupt)
+                signal.signal(signal.SIGTERM, self._handle_interrupt)
+
+            os.makedirs(self.work_dir, exist_ok=True)
+
+            progress = self._create_progress()
+
+            self.segment_done = [
+                self._range_length(ranges[i], duration) if i in done else 0.0
+                for i in range(len(ranges))
+            ]
+            self.segment_fps = [0.0] * len(ranges)
+            self.segment_frames = [0] * len(ranges)
+
+            pieces = self._encode_segments(ranges, done, preset, workers, threads, progress)
+
+            success = pieces is not None and not self.interrupted
+            if success:
+                success = self._concat(pieces)
+
+            progress.close()
+            self.elapsed = progress.get_elapsed_time()
+            self.frames = progress.current_frame
+            self.fps = progress.fps
+            self._restore_console()
+
+            if success:
+                logger.log_conversion_complete(self.output_file, self.elapsed)
+                self._cleanup_work_dir()
+            else:
+                self._cleanup_incomplete_file()
+                self._keep_or_cleanup_work_dir()
+
+            return success
+
+        except Exception as e:
+            self._restore_console()
+            logger.error(f"خطا در تبدیل قطعه‌ای: {str(e)}")
+            self.stop()
+            self._cleanup_incomplete_file()
+            self._keep_or_cleanup_work_dir()
+            return False
+
+    @staticmethod
+    def _range_length(time_range, duration):
+        start, end = time_range
+        return (end if end is not None else duration) - start
+
+    def _manifest_path(self):
+        return os.path.join(self.work_dir, 'manifest.json')
+
+    def _settings(self, preset):
+        """Everything that must match for committed pieces to be reused"""
+        return {
+            'crf': preset['crf'],
+            'preset': preset['preset'],
+            'scale': self.metadata.get('height', 0) > 1080,
+            'segments': self.segments
+        }
+
+    def _load_or_plan(self, preset, duration):
+        """
+        Reuse a matching manifest, or plan ranges and start a new one
+        استفاده از فهرست قبلی در صورت تطابق، یا برنامه‌ریزی جدید
+
+        Returns:
+            (ranges, set of committed piece indexes)
+        """
+        fingerprint = list(ProbeCache.fingerprint(self.input_file))
+        settings = self._settings(preset)
+
+        if self.resumable:
+            try:
+                with open(self._manifest_path(), encoding='utf-8') as f:
+                    manifest = json.load(f)
+
+                if manifest['fingerprint'] == fingerprint and manifest['settings'] == settings:
+                    ranges = [tuple(r) for r in manifest['ranges']]
+                    done = {
+                        i for i in manifest['done']
+                        if os.path.exists(self._segment_path(i))
+                        and os.path.getsize(self._segment_path(i)) > 0
+                    }
+                    self.manifest = manifest
+                    self.manifest['done'] = sorted(done)
+                    return ranges, done
+
+                logger.info("فایل ورودی یا تنظیمات تغییر کرده است، قطعه‌های قبلی حذف می‌شوند")
+            except (OSError, ValueError, KeyError):
+                pass
+
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        os.makedirs(self.work_dir, exist_ok=True)
+
+        ranges = SegmentPlanner.plan(self.input_file, duration, self.segments)
+        self.manifest = {
+            'input': self.input_file,
+            'fingerprint': fingerprint,
+            'settings': settings,
+            'ranges': ranges,
+            'done': []
+        }
+        self._write_manifest()
+        return ranges, set()
+
+    def _write_manifest(self):
+        tmp_path = self._manifest_path() + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path())
+
+    def _commit(self, index):
+        """
+        Record a finished piece in the manifest
+        ثبت قطعه تکمیل شده در فهرست
+        """
+        with self.lock:
+            self.manifest['done'] = sorted(set(self.manifest['done']) | {index})
+            self._write_manifest()
+
+    def _segment_path(self, index):
+        return os.path.join(self.work_dir, f"segment_{index:03d}.mkv")
+
+    def _build_segment_command(self, preset, start, end, piece, threads):
+        """
+        FFmpeg command for one video-only piece
+        دستور FFmpeg برای یک قطعه (فقط ویدیو)
+        """
+        # Input seeking decodes from the keyframe at start; -t is then
+        # relative to the new zero timestamp
+        cmd = [FFMPEG_BINARY, '-nostdin', '-ss', f"{start:.3f}", '-i', self.input_file]
+        if end is not None:
+            cmd.extend(['-t', f"{end - start:.3f}"])
+
+        cmd.extend(['-map', '0:v:0', '-an', '-sn', '-dn'])
+        cmd.extend(['-c:v', 'libx265'])
+        cmd.extend(['-crf', str(preset['crf'])])
+        cmd.extend(['-preset', preset['preset']])
+
+        if self.metadata.get('height', 0) > 1080:
+            cmd.extend(['-vf', 'scale=-2:1080'])
+
+        cmd.extend(['-threads', str(threads)])
+        cmd.extend(['-progress', 'pipe:1', '-nostats', '-loglevel', 'error'])
+        cmd.extend(['-y', piece])
+        return cmd
+
+    def _encode_segments(self, ranges, done, preset, workers, threads, progress):
+        """
+        Encode the pieces that are not committed yet
+        تبدیل قطعه‌هایی که هنوز تکمیل نشده‌اند
+
+        Returns:
+            list of piece paths, or None if any piece failed
+        """
+        pieces = [self._segment_path(i) for i in range(len(ranges))]
+        todo = [i for i in range(len(ranges)) if i not in done]
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = list(executor.map(
+                lambda i: self._encode_segment(i, ranges[i], preset, threads, progress),
+                todo
+            ))
+
+        if not all(results):
+            return None
+        return pieces
+
+    def _encode_segment(self, index, time_range, preset, threads, progress):
+        piece = self._segment_path(index)
+        part = piece[:-len('.mkv')] + '.part.mkv'
+        cmd = self._build_segment_command(preset, time_range[0], time_range[1], part, threads)
+        if debug_enabled():
+            logger.debug(f"Segment {index}: {' '.join(cmd)}")
+
+        with self.lock:
+            if self.interrupted:
+                return False
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                bufsize=1
+            )
+            self.processes.append(process)
+
+        parser = ProgressBlockParser()
+        for line in process.stdout:
+            block = parser.feed(line)
+            if block is not None:
+                self._update_progress(index, block, progress)
+
+        stderr = process.stderr.read()
+        process.wait()
+
+        if process.returncode != 0:
+            if not self.interrupted:
+                logger.error(f"FFmpeg خطا در قطعه {index}: {stderr.strip()[-500:]}")
+                self.log_tail = stderr.strip().splitlines()[-20:]
+                self.stop()
+            return False
+
+        # A piece only counts once it is complete on disk
+        os.replace(part, piece)
+        self._commit(index)
+        return True
+
+    def _update_progress(self, index, block, progress):
+        """Combine one piece's -progress block into the overall tracker"""
+        with self.lock:
+            self.segment_done[index] = block_out_time(block)
+            self.segment_fps[index] = to_float(block.get('fps'))
+            self.segment_frames[index] = int(to_float(block.get('frame'), self.segment_frames[index]))
+
+            progress.current_time = sum(self.segment_done)
+            progress.current_frame = sum(self.segment_frames)
+            progress.fps = sum(self.segment_fps)
+            progress.speed = 0.0  # per-piece speeds don't add up to a whole-file speed
+
+            if time.time() - progress.last_render >= PROGRESS_REFRESH_SECONDS:
+                progress.update_progress(progress.percent())
+
+    def _concat(self, pieces):
+        """
+        Join pieces losslessly and add the planned audio/subtitle streams
+        اتصال بدون افت قطعه‌ها و افزودن جریان‌های صدا و زیرنویس
+        """
+        list_file = os.path.join(self.work_dir, 'segments.txt')
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for piece in pieces:
+                escaped = os.path.abspath(piece).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        plan = StreamPlanner.plan(self.metadata)
+        if plan:
+            chapters = self.metadata.get('chapters', 0)
+            StreamPlanner.log_plan(plan, chapters)
+            mapping = StreamPlanner.build_args(plan, chapters, source=1, video_map='0:v:0')
+        else:
+            mapping = ['-map', '0:v:0', '-map', '1:a?', '-c:a', AUDIO_CODEC, '-b:a', AUDIO_BITRATE]
+
+        cmd = [
+            FFMPEG_BINARY, '-nostdin',
+            '-f', 'concat', '-safe', '0', '-i', list_file,
+            '-i', self.input_file,
+            '-c:v', 'copy'
+        ] + mapping + [
+            '-loglevel', 'error',
+            '-y', self.output_file
+        ]
+        if debug_enabled():
+            logger.debug(f"Concat: {' '.join(cmd)}")
+
+        with self.lock:
+            if self.interrupted:
+                return False
+            process = subprocess.Popen(
+                cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True
+            )
+            self.processes.append(process)
+
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            logger.error(f"{MESSAGES['ffmpeg_error']}: {stderr.strip()[-500:]}")
+            self.log_tail = stderr.strip().splitlines()[-20:]
+            return False
+
+        return True
+
+    def running_pids(self):
+        with self.lock:
+            return [process.pid for process in self.processes if process.poll() is None]
+
+    def stop(self):
+        """Interrupt all running pieces"""
+        with self.lock:
+            self.interrupted = True
+            for process in self.processes:
+                if process.poll() is None:
+                    process.terminate()
+
+    def _handle_interrupt(self, signum, frame):
+        logger.warning(MESSAGES['interrupted'])
+        threading.Thread(target=self.stop, daemon=True).start()
+
+    def _keep_or_cleanup_work_dir(self):
+        if self.resumable and os.path.exists(self._manifest_path()):
+            logger.info(f"♻️  قطعه‌های تکمیل شده برای تلاش بعدی نگه داشته شدند: {self.work_dir}")
+        else:
+            self._cleanup_work_dir()
+
+    def _cleanup_work_dir(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(self.work_dir))
+        except OSError:
+            pass
@@ -0,0 +1,176 @@
+"""
+Output size prediction before encoding
+پیش‌بینی حجم خروجی پیش از تبدیل
+
+A few short windows of the input are encoded with the same x265 settings
+the real conversion will use. Their bitrate is extrapolated to the whole
+file, and audio is added at the rate the stream plan implies. Files that would not
+shrink by at least the configured margin (typically low-bitrate WEB-DLs)
+can then be skipped before hours of encoding are spent on them.
+
+The windows are encoded at the same time and share the job's threads,
+and they are throttled like the conversion itself.
+"""
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    FFMPEG_BINARY, QUALITY_PRESETS, PREDICT_SAMPLE_WINDOWS,
+    PREDICT_SAMPLE_SECONDS, PREDICT_CONTAINER_OVERHEAD
+)
+from modules.logger import logger
+from modules.log_backend import log_debug
+from modules.resource_manager import ResourceManager
+from modules.stream_planner import StreamPlanner
+from modules.utils import format_size
+
+
+class _SampleEncodes:
+    """FFmpeg processes of one prediction, registered with ThrottleController"""
+
+    def __init__(self):
+        self.processes = []
+        self.lock = threading.Lock()
+
+    def add(self, process):
+        with self.lock:
+            self.processes.append(process)
+
+    def running_pids(self):
+        with self.lock:
+            return [p.pid for p in self.processes if p.poll() is None]
+
+
+class SizePredictor:
+    """
+    Estimate x265 output size from sample encodes
+    تخمین حجم خروجی x265 با تبدیل نمونه‌ها
+    """
+
+    @staticmethod
+    def predict(input_file, metadata, threads=None, throttle=None):
+        """
+        Predict the output size of converting input_file
+        پیش‌بینی حجم خروجی تبدیل فایل
+
+        Args:
+            threads: threads of the job, divided among the sample encodes;
+                     by default the recommended count for this machine
+            throttle: ThrottleController the sample encodes are put under
+
+        Returns:
+            dict with predicted_size, input_size and saving_percent,
+            or None when the file is too short or sampling failed
+        """
+        duration = metadata.get('duration', 0)
+        sample_total = PREDICT_SAMPLE_WINDOWS * PREDICT_SAMPLE_SECONDS
+
+        # Sampling a short file costs about as much as converting it
+        if not duration or duration < sample_total * 4:
+            return None
+
+        preset = SizePredictor._get_preset(metadata.get('quality', '1080p'))
+        windows = SizePredictor._plan_windows(duration)
+        sample_threads = max(1, (threads or ResourceManager.get_recommended_threads()) // len(windows))
+
+        samples = _SampleEncodes()
+        if throttle:
+            throttle.register(samples)
+        try:
+            with ThreadPoolExecutor(max_workers=len(windows)) as executor:
+                sizes = list(executor.map(
+                    lambda start: SizePredictor._encode_sample(
+                        input_file, start, preset, metadata, sample_threads, samples
+                    ),
+                    windows
+                ))
+        except Exception as e:
+            logger.warning(f"پیش‌بینی حجم انجام نشد: {str(e)}")
+            return None
+        finally:
+            if throttle:
+                throttle.unregister(samples)
+
+        if not all(sizes):
+            return None
+
+        video_rate = sum(sizes) / sample_total
+        audio_rate = StreamPlanner.audio_bytes_per_second(metadata)
+        predicted = (video_rate + audio_rate) * duration * PREDICT_CONTAINER_OVERHEAD
+
+        input_size = os.path.getsize(input_file)
+        return {
+            'predicted_size': int(predicted),
+            'input_size': input_size,
+            'saving_percent': (1 - predicted / input_size) * 100 if input_size else 0.0
+        }
+
+    @staticmethod
+    def _get_preset(quality):
+        # Same choice as Converter._get_preset
+        return QUALITY_PRESETS['720p'] if quality == '720p' else QUALITY_PRESETS['1080p']
+
+    @staticmethod
+    def _plan_windows(duration):
+        """Evenly spaced window starts, away from intros and credits"""
+        margin = duration * 0.1
+        span = duration - 2 * margin - PREDICT_SAMPLE_SECONDS
+        step = span / max(1, PREDICT_SAMPLE_WINDOWS - 1)
+        return [margin + i * step for i in range(PREDICT_SAMPLE_WINDOWS)]
+
+    @staticmethod
+    def _encode_sample(input_file, start, preset, metadata, threads, samples):
+        """Encode one window to a raw HEVC stream and return its size in bytes"""
+        cmd = [
+            FFMPEG_BINARY, '-nostdin', '-v', 'error',
+            '-ss', f"{start:.3f}", '-i', input_file,
+            '-t', str(PREDICT_SAMPLE_SECONDS),
+            '-map', '0:v:0', '-an', '-sn', '-dn',
+            '-c:v', 'libx265',
+            '-crf', str(preset['crf']),
+            '-preset', preset['preset'],
+            '-x265-params', 'log-level=error'
+        ]
+        if metadata.get('height', 0) > 1080:
+            cmd.extend(['-vf', 'scale=-2:1080'])
+        cmd.extend(['-threads', str(threads)])
+        cmd.extend(['-f', 'hevc', 'pipe:1'])
+
+        # A sample is a few MB at most, so it is simply kept in memory
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        samples.add(process)
+        try:
+            stdout, stderr = process.communicate(timeout=PREDICT_SAMPLE_SECONDS * 30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        if process.returncode != 0:
+            log_debug(
+                "Sample encode at %.0fs failed: %s", start, stderr[-300:].decode(errors='replace')
+            )
+            return 0
+        return len(stdout)
+
+    @staticmethod
+    def log_prediction(filename, prediction):
+        logger.info(
+            f"📐 پیش‌بینی حجم {filename}: {format_size(prediction['predicted_size'])} "
+            f"از {format_size(prediction['input_size'])} "
+            f"(کاهش {prediction['saving_percent']:.1f}%)"
+        )
+
+    @staticmethod
+    def log_accuracy(prediction, actual_size):
+        """
+        Log predicted vs actual size; returns the relative error in percent
+        ثبت حجم پیش‌بینی شده در برابر حجم واقعی
+        """
+        predicted = prediction['predicted_size']
+        error = (predicted - actual_size) / actual_size * 100 if actual_size else 0.0
+        logger.info(
+            f"📐 حجم پیش‌بینی شده {format_size(predicted)}، واقعی {format_size(actual_size)} "
+            f"(خطا {error:+.1f}%)"
+        )
+        return error
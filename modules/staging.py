@@ -0,0 +1,276 @@
+"""
+Local scratch staging with input prefetch and atomic publish
+آماده‌سازی روی دیسک محلی با پیش‌خوانی ورودی و انتشار اتمی خروجی
+
+With --scratch DIR the encoder reads and writes fast local storage
+instead of the library mount:
+
+    input    the next queued input is copied to DIR/input while the
+             current one encodes; the encoder reads that copy
+    output   FFmpeg writes to DIR/output; failed encodes and segment
+             pieces are cleaned up there, never on the library mount;
+             outputs the verifier rejects still end up in _incomplete
+             next to the final path
+    publish  a verified output is renamed into place (same filesystem) or
+             copied next to its final path under a hidden name and then
+             renamed, so the media server never sees a half-written file
+
+Copies and outputs are only staged while they fit the scratch budget and
+the free space of the scratch filesystem; otherwise the job falls back to
+reading or writing the library directly.
+"""
+import os
+import errno
+import shutil
+import hashlib
+import threading
+from config import STAGING_BUDGET_GB, STAGING_MIN_FREE_GB
+from modules.logger import logger
+from modules.log_backend import log_debug
+from modules.utils import format_size
+
+GB = 1024 ** 3
+
+
+def _key(path):
+    return hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+
+
+class _Prefetch:
+    def __init__(self, source, target, size):
+        self.source = source
+        self.target = target
+        self.size = size
+        self.done = threading.Event()
+        self.ok = False
+
+
+class ScratchStager:
+    """
+    Prefetch inputs to scratch, encode there and publish atomically
+    پیش‌خوانی ورودی‌ها، تبدیل روی دیسک محلی و انتشار اتمی
+    """
+
+    def __init__(self, scratch_dir, budget_gb=STAGING_BUDGET_GB, stage_inputs=True):
+        """
+        Args:
+            stage_inputs: prefetch inputs (off for --resumable, whose
+                          checkpoints are tied to the input file itself)
+        """
+        self.root = os.path.abspath(scratch_dir)
+        self.input_dir = os.path.join(self.root, 'input')
+        self.output_dir = os.path.join(self.root, 'output')
+        self.budget = int(budget_gb * GB)
+        self.stage_inputs = stage_inputs
+        self.lock = threading.Lock()
+        self.prefetches = {}
+        self.reservations = {}
+        self.used = 0
+        self.copy_lock = threading.Lock()
+
+        # Copies left by an earlier run are useless; output pieces of
+        # resumable encodes are kept
+        shutil.rmtree(self.input_dir, ignore_errors=True)
+        os.makedirs(self.input_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        logger.info(f"💽 پوشه موقت محلی: {self.root} (بودجه {format_size(self.budget)})")
+
+    # --- Space accounting ---
+
+    def _reserve(self, key, size):
+        """Reserve size bytes if budget and free space allow (caller holds the lock)"""
+        free = shutil.disk_usage(self.root).free - STAGING_MIN_FREE_GB * GB
+        if self.used + size > self.budget or size > free:
+            return False
+        self.reservations[key] = size
+        self.used += size
+        return True
+
+    def _release(self, key):
+        self.used -= self.reservations.pop(key, 0)
+
+    # --- Inputs ---
+
+    def prefetch(self, input_file):
+        """
+        Start copying input_file to scratch in the background
+        شروع کپی ورودی در پس‌زمینه
+        """
+        if not self.stage_inputs:
+            return
+        try:
+            size = os.path.getsize(input_file)
+        except OSError:
+            return
+
+        key = 'in:' + _key(input_file)
+        with self.lock:
+            if input_file in self.prefetches or not self._reserve(key, size):
+                return
+            target = os.path.join(self.input_dir, _key(input_file), os.path.basename(input_file))
+            prefetch = _Prefetch(input_file, target, size)
+            self.prefetches[input_file] = prefetch
+
+        threading.Thread(target=self._copy, args=(prefetch,), daemon=True).start()
+
+    def _copy(self, prefetch):
+        # One copy at a time: the library mount is the bottleneck
+        with self.copy_lock:
+            tmp_path = prefetch.target + '.part'
+            try:
+                os.makedirs(os.path.dirname(prefetch.target), exist_ok=True)
+                shutil.copyfile(prefetch.source, tmp_path)
+                os.replace(tmp_path, prefetch.target)
+                prefetch.ok = True
+                log_debug("Prefetched %s -> %s", prefetch.source, prefetch.target)
+            except OSError as e:
+                logger.warning(f"پیش‌خوانی {os.path.basename(prefetch.source)} انجام نشد: {str(e)}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            finally:
+                prefetch.done.set()
+
+    def input_for(self, input_file):
+        """
+        Path the encoder should read: the prefetched copy (waiting for a
+        copy in progress), or input_file itself
+        مسیر ورودی برای تبدیل؛ نسخه محلی در صورت وجود
+        """
+        with self.lock:
+            prefetch = self.prefetches.get(input_file)
+        if prefetch is None:
+            return input_file
+
+        if not prefetch.done.is_set():
+            logger.info(f"⏳ در انتظار پایان پیش‌خوانی {os.path.basename(input_file)}...")
+        prefetch.done.wait()
+        return prefetch.target if prefetch.ok else input_file
+
+    # --- Outputs ---
+
+    def output_for(self, output_file, estimated_size):
+        """
+        Scratch path to encode output_file into, or output_file itself when
+        the estimate does not fit
+        مسیر موقت خروجی روی دیسک محلی
+
+        The path depends only on output_file, so resumable pieces of an
+        earlier attempt are found again.
+        """
+        key = 'out:' + _key(output_file)
+        with self.lock:
+            if not self._reserve(key, int(estimated_size)):
+                logger.warning(
+                    f"فضای موقت کافی نیست ({format_size(estimated_size)})، "
+                    f"خروجی مستقیم در مقصد نوشته می‌شود"
+                )
+                return output_file
+
+        work_dir = os.path.join(self.output_dir, _key(output_file))
+        os.makedirs(work_dir, exist_ok=True)
+        return os.path.join(work_dir, os.path.basename(output_file))
+
+    def publish(self, work_output, output_file):
+        """
+        Move a verified output into place atomically
+        انتقال اتمی خروجی بررسی شده به مقصد نهایی
+        """
+        if work_output == output_file:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        try:
+            os.replace(work_output, output_file)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+        # Another filesystem: copy under a hidden name, then rename
+        directory, name = os.path.split(os.path.abspath(output_file))
+        tmp_path = os.path.join(directory, f".{name}.partial")
+        try:
+            shutil.copyfile(work_output, tmp_path)
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, output_file)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        os.remove(work_output)
+        log_debug("Published %s -> %s", work_output, output_file)
+
+    def release_input(self, input_file):
+        """
+        Drop the input copy and its reservation, e.g. of a job that was
+        cancelled while queued
+        """
+        with self.lock:
+            prefetch = self.prefetches.pop(input_file, None)
+            self._release('in:' + _key(input_file))
+
+        if prefetch:
+            prefetch.done.wait()
+            shutil.rmtree(os.path.dirname(prefetch.target), ignore_errors=True)
+
+    def release(self, input_file, work_output, output_file):
+        """
+        Drop the input copy, leftovers of a failed output and the
+        reservations of a finished job
+        پاک‌سازی فایل‌های موقت یک کار پایان یافته
+        """
+        self.release_input(input_file)
+        with self.lock:
+            self._release('out:' + _key(output_file))
+
+        if work_output != output_file:
+            work_dir = os.path.dirname(work_output)
+            if os.path.exists(work_output):
+                os.remove(work_output)
+            self._keep_incomplete(work_dir, output_file)
+            try:
+                os.rmdir(work_dir)  # kept while it holds resumable pieces
+            except OSError:
+                pass
+
+    @staticmethod
+    def _keep_incomplete(work_dir, output_file):
+        """
+        Move outputs the verifier set aside in scratch to the _incomplete
+        folder next to the final output, where they are kept for inspection
+        انتقال خروجی‌های نامعتبر از پوشه موقت به _incomplete کنار خروجی نهایی
+        """
+        scratch_dir = os.path.join(work_dir, '_incomplete')
+        if not os.path.isdir(scratch_dir):
+            return
+
+        target_dir = os.path.join(os.path.dirname(os.path.abspath(output_file)), '_incomplete')
+        try:
+            os.makedirs(target_dir, exist_ok=True)
+            for filename in os.listdir(scratch_dir):
+                name, ext = os.path.splitext(filename)
+                dest_path = os.path.join(target_dir, filename)
+                counter = 1
+                while os.path.exists(dest_path):
+                    dest_path = os.path.join(target_dir, f"{name}_{counter}{ext}")
+                    counter += 1
+                shutil.move(os.path.join(scratch_dir, filename), dest_path)
+                logger.warning(f"⚠️  فایل نامعتبر منتقل شد به: {dest_path}")
+            os.rmdir(scratch_dir)
+        except OSError as e:
+            logger.error(f"خطا در جابجایی فایل نامعتبر: {str(e)}")
+
+    def close(self):
+        """Remove prefetched copies that were never used"""
+        with self.lock:
+            prefetches = list(self.prefetches.values())
+            self.prefetches.clear()
+        for prefetch in prefetches:
+            prefetch.done.wait()
+        shutil.rmtree(self.input_dir, ignore_errors=True)
@@ -0,0 +1,280 @@
+"""
+Per-stream copy / transcode / drop planning
+برنامه‌ریزی کپی، تبدیل یا حذف برای هر جریان
+
+Converter maps the first video stream plus every audio track and always
+re-encodes audio to AAC, dropping subtitles and chapters. The planner uses
+the full ffprobe stream list instead:
+
+    video       first real video stream -> x265; cover art -> drop
+    audio       efficient codecs at or near AUDIO_BITRATE -> copy, else AAC
+    subtitles   text and bitmap formats MKV supports -> copy, mov_text -> SRT
+    attachments fonts etc. -> copy
+    data        timecode / binary tracks -> drop
+
+Chapters and global metadata are carried into the MKV.
+"""
+import json
+import subprocess
+from config import (
+    FFPROBE_BINARY, AUDIO_CODEC, AUDIO_BITRATE, AUDIO_COPY_CODECS, AUDIO_COPY_MAX_RATIO
+)
+from modules.logger import logger
+from modules.validator import Validator
+from modules.utils import parse_resolution
+
+# Lossy codecs already efficient enough to copy when the bitrate is unknown
+EFFICIENT_AUDIO_CODECS = ('aac', 'opus', 'vorbis')
+
+MKV_SUBTITLE_CODECS = (
+    'subrip', 'srt', 'ass', 'ssa', 'webvtt',
+    'hdmv_pgs_subtitle', 'dvd_subtitle', 'dvb_subtitle'
+)
+TEXT_SUBTITLE_CODECS = ('mov_text', 'text')
+
+
+def parse_bitrate(value):
+    """'192k' -> 192000 bits per second"""
+    value = str(value).strip().lower()
+    multiplier = {'k': 1000, 'm': 1000 ** 2}.get(value[-1:], 1)
+    if multiplier > 1:
+        value = value[:-1]
+    try:
+        return float(value) * multiplier
+    except ValueError:
+        return 0.0
+
+
+def _compact_stream(stream):
+    tags = stream.get('tags', {})
+    try:
+        bit_rate = int(stream.get('bit_rate') or tags.get('BPS') or 0)
+    except ValueError:
+        bit_rate = 0
+
+    return {
+        'index': stream.get('index'),
+        'type': stream.get('codec_type', ''),
+        'codec': stream.get('codec_name', ''),
+        'channels': int(stream.get('channels', 0) or 0),
+        'bit_rate': bit_rate,
+        'language': tags.get('language', ''),
+        'title': tags.get('title', ''),
+        'attached_pic': bool(stream.get('disposition', {}).get('attached_pic'))
+    }
+
+
+def probe_metadata(filepath):
+    """
+    Validator._extract_metadata plus the stream list and chapter count
+    اطلاعات Validator به همراه فهرست جریان‌ها و تعداد فصل‌ها
+    """
+    cmd = [
+        FFPROBE_BINARY,
+        '-v', 'quiet',
+        '-print_format', 'json',
+        '-show_format',
+        '-show_streams',
+        '-show_chapters',
+        filepath
+    ]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=30)
+        data = json.loads(result.stdout)
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"FFprobe error: {e.stderr}")
+    except json.JSONDecodeError:
+        raise Exception("Failed to parse ffprobe output")
+
+    streams = data.get('streams', [])
+    video_stream = next(
+        (s for s in streams
+         if s.get('codec_type') == 'video' and not s.get('disposition', {}).get('attached_pic')),
+        None
+    )
+    audio_streams = [s for s in streams if s.get('codec_type') == 'audio']
+
+    if not video_stream:
+        return {'has_video': False}
+
+    width = int(video_stream.get('width', 0))
+    height = int(video_stream.get('height', 0))
+    fmt = data.get('format', {})
+    best_audio = max(audio_streams, key=lambda x: int(x.get('channels', 0))) if audio_streams else None
+
+    return {
+        'has_video': True,
+        'has_audio': len(audio_streams) > 0,
+        'width': width,
+        'height': height,
+        'codec_name': video_stream.get('codec_name', ''),
+        'quality': parse_resolution(width, height),
+        'duration': float(fmt.get('duration', 0)),
+        'bit_rate': int(fmt.get('bit_rate', 0)),
+        'audio_streams': len(audio_streams),
+        'best_audio_index': best_audio.get('index') if best_audio else None,
+        'filepath': filepath,
+        'streams': [_compact_stream(s) for s in streams],
+        'chapters': len(data.get('chapters', []))
+    }
+
+
+def install_stream_probe():
+    """Make Validator keep the stream list (and chapters) in its metadata"""
+    Validator._extract_metadata = staticmethod(probe_metadata)
+
+
+class StreamPlanner:
+    """
+    Decide what happens to every input stream
+    تعیین سرنوشت هر جریان ورودی
+    """
+
+    @staticmethod
+    def plan(metadata):
+        """
+        Returns:
+            list of {'index', 'type', 'codec', 'action', 'reason', ...}
+            decisions, or None when metadata has no stream list
+        """
+        streams = metadata.get('streams')
+        if not streams:
+            return None
+
+        target = parse_bitrate(AUDIO_BITRATE)
+        plan = []
+        have_video = False
+
+        for stream in streams:
+            kind, codec = stream['type'], stream['codec']
+
+            if kind == 'video':
+                if stream['attached_pic']:
+                    action, reason = 'drop', 'cover art'
+                elif have_video:
+                    action, reason = 'drop', 'extra video stream'
+                else:
+                    action, reason = 'transcode', 'x265'
+                    have_video = True
+
+            elif kind == 'audio':
+                rate = stream['bit_rate']
+                if codec in AUDIO_COPY_CODECS and rate and rate <= target * AUDIO_COPY_MAX_RATIO:
+                    action, reason = 'copy', f"{rate // 1000}k"
+                elif codec in EFFICIENT_AUDIO_CODECS and not rate:
+                    action, reason = 'copy', 'efficient codec'
+                else:
+                    action, reason = 'transcode', f"{AUDIO_CODEC} {AUDIO_BITRATE}"
+
+            elif kind == 'subtitle':
+                if codec in MKV_SUBTITLE_CODECS:
+                    action, reason = 'copy', codec
+                elif codec in TEXT_SUBTITLE_CODECS:
+                    action, reason = 'transcode', 'srt'
+                else:
+                    action, reason = 'drop', f"{codec} not supported in MKV"
+
+            elif kind == 'attachment':
+                action, reason = 'copy', 'attachment'
+
+            else:
+                action, reason = 'drop', kind or 'unknown'
+
+            decision = dict(stream)
+            decision.update({'action': action, 'reason': reason})
+            plan.append(decision)
+
+        return plan
+
+    @staticmethod
+    def build_args(plan, chapters=0, source=0, video_map=None):
+        """
+        FFmpeg -map and per-stream codec options for plan
+        گزینه‌های -map و کدک هر جریان برای FFmpeg
+
+        Args:
+            source: input index the planned streams come from
+            video_map: map for the video stream when it comes from
+                       another input (the concatenated segments)
+        """
+        video = next((d for d in plan if d['type'] == 'video' and d['action'] == 'transcode'), None)
+        if video_map is None:
+            video_map = f"{source}:{video['index']}" if video else f"{source}:v:0"
+        args = ['-map', video_map]
+
+        audio_out = 0
+        subtitle_out = 0
+        attachments = False
+
+        for decision in plan:
+            if decision['action'] == 'drop' or decision['type'] == 'video':
+                continue
+
+            args.extend(['-map', f"{source}:{decision['index']}"])
+
+            if decision['type'] == 'audio':
+                if decision['action'] == 'copy':
+                    args.extend([f'-c:a:{audio_out}', 'copy'])
+                else:
+                    args.extend([f'-c:a:{audio_out}', AUDIO_CODEC, f'-b:a:{audio_out}', AUDIO_BITRATE])
+                audio_out += 1
+
+            elif decision['type'] == 'subtitle':
+                codec = 'copy' if decision['action'] == 'copy' else 'srt'
+                args.extend([f'-c:s:{subtitle_out}', codec])
+                subtitle_out += 1
+
+            elif decision['type'] == 'attachment':
+                attachments = True
+
+        if attachments:
+            args.extend(['-c:t', 'copy'])
+
+        args.extend(['-map_metadata', str(source)])
+        if chapters:
+            args.extend(['-map_chapters', str(source)])
+
+        return args
+
+    @staticmethod
+    def replace_mapping(cmd, args):
+        """
+        Swap Converter's stream mapping and audio options for args
+        جایگزینی نگاشت جریان‌های Converter با گزینه‌های برنامه
+        """
+        replaced = []
+        i = 0
+        while i < len(cmd):
+            if cmd[i] in ('-map', '-c:a', '-b:a') and i + 1 < len(cmd):
+                i += 2
+                continue
+            replaced.append(cmd[i])
+            i += 1
+
+        position = replaced.index('-threads') if '-threads' in replaced else len(replaced) - 1
+        return replaced[:position] + args + replaced[position:]
+
+    @staticmethod
+    def log_plan(plan, chapters=0):
+        logger.info("🎚️  برنامه جریان‌ها:")
+        for d in plan:
+            details = ' '.join(filter(None, [d['codec'], d['language'], d['title']]))
+            logger.info(f"   #{d['index']} {d['type']:<10} {details:<30} → {d['action']} ({d['reason']})")
+        if chapters:
+            logger.info(f"   {chapters} فصل (chapter) منتقل می‌شود")
+
+    @staticmethod
+    def audio_bytes_per_second(metadata):
+        """Audio output rate the plan implies, for SizePredictor"""
+        plan = StreamPlanner.plan(metadata)
+        target = parse_bitrate(AUDIO_BITRATE)
+        if not plan:
+            return metadata.get('audio_streams', 0) * target / 8
+
+        rate = 0.0
+        for d in plan:
+            if d['type'] == 'audio' and d['action'] != 'drop':
+                copied = d['action'] == 'copy' and d['bit_rate']
+                rate += (d['bit_rate'] if copied else target) / 8
+        return rate
@@ -0,0 +1,276 @@
+"""
+Adaptive throttling of running encodes
+محدودسازی تطبیقی تبدیل‌های در حال اجرا
+
+ResourceManager only decides before a job starts. This controller keeps
+watching while FFmpeg runs and, when other programs on the host are
+starved, backs off one step at a time:
+
+    1. renice the encoders (and put their I/O in the idle class)
+    2. lower the number of concurrent jobs, one job per step, down to 1
+    3. pause running encoders with SIGSTOP, newest first; CPU pressure
+       only, since a stopped encoder keeps all of its memory
+
+Steps are undone in reverse order once the pressure is gone. Load caused
+only by our own encoders is not pressure: the goal is full throughput
+whenever nobody else needs the machine.
+"""
+import os
+import time
+import signal
+import threading
+import psutil
+from config import (
+    MAX_CPU_PERCENT, MIN_AVAILABLE_MEMORY_GB, THROTTLE_INTERVAL, THROTTLE_ESCALATE_SECONDS,
+    THROTTLE_RELAX_SECONDS, THROTTLE_FOREIGN_CPU_PERCENT, THROTTLE_CPU_HYSTERESIS,
+    THROTTLE_MEMORY_HYSTERESIS_GB, THROTTLE_NICE
+)
+from modules.logger import logger
+from modules.log_backend import log_debug
+from modules.resource_manager import ResourceManager
+
+
+class ThrottleController:
+    """
+    Watch system pressure and throttle registered converters
+    نظارت بر فشار سیستم و محدودسازی تبدیل‌کننده‌های ثبت شده
+    """
+
+    def __init__(self, jobs=1, interval=THROTTLE_INTERVAL):
+        self.jobs = max(1, jobs)
+        self.interval = interval
+        self.step = 0
+        # nice, then lower the limit to 1, then pause every job
+        self.max_step = 1 + (self.jobs - 1) + self.jobs
+        self.limit = self.jobs
+        self.running = 0
+        self.cancelled = False
+        self.condition = threading.Condition()
+
+        self.converters = []
+        self.procs = {}
+        self.original_priority = {}
+        self.paused = set()
+        self.pressure_since = None
+        self.clear_since = None
+        self.cpu_count = psutil.cpu_count(logical=True) or 1
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Job admission (used by JobPool) ---
+
+    def acquire(self):
+        """
+        Wait until another job may start; False once cancelled
+        انتظار تا مجاز شدن شروع کار جدید
+        """
+        with self.condition:
+            while self.running >= self.limit and not self.cancelled:
+                self.condition.wait()
+            if self.cancelled:
+                return False
+            self.running += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.running = max(0, self.running - 1)
+            self.condition.notify_all()
+
+    def cancel(self):
+        """Lift every limit and resume paused encoders (on interrupt)"""
+        with self.condition:
+            self.cancelled = True
+            self.step = 0
+            self.limit = self.jobs
+            for pid in list(self.paused):
+                self._signal(pid, signal.SIGCONT)
+            self.paused.clear()
+            self.condition.notify_all()
+
+    # --- Converter registration ---
+
+    def register(self, converter):
+        """
+        Put a converter under control; starts the controller thread
+        قرار دادن تبدیل‌کننده تحت کنترل
+        """
+        with self.condition:
+            self.converters.append(converter)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='ThrottleController', daemon=True
+                )
+                self._thread.start()
+
+    def unregister(self, converter):
+        with self.condition:
+            if converter in self.converters:
+                self.converters.remove(converter)
+            for pid in converter.running_pids():
+                if pid in self.paused:
+                    self._signal(pid, signal.SIGCONT)
+                    self.paused.discard(pid)
+
+    def stop(self):
+        self._stop.set()
+        self.cancel()
+
+    # --- Control loop ---
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._tick()
+            except Exception as e:
+                log_debug("Throttle check failed: %s", e)
+
+    def _tick(self):
+        cpu = ResourceManager.get_cpu_usage()
+        memory = ResourceManager.get_available_memory_gb()
+
+        with self.condition:
+            groups = [(c, c.running_pids()) for c in self.converters]
+            live = {pid for _, pids in groups for pid in pids}
+            own = self._own_cpu(live)
+            foreign = max(0.0, cpu - own)
+
+            cpu_pressure = cpu > MAX_CPU_PERCENT and foreign >= THROTTLE_FOREIGN_CPU_PERCENT
+            memory_pressure = memory < MIN_AVAILABLE_MEMORY_GB
+            relaxed = (
+                (foreign < THROTTLE_FOREIGN_CPU_PERCENT or cpu < MAX_CPU_PERCENT - THROTTLE_CPU_HYSTERESIS)
+                and memory >= MIN_AVAILABLE_MEMORY_GB + THROTTLE_MEMORY_HYSTERESIS_GB
+            )
+            reason = (
+                f"CPU={cpu:.0f}% (سایر برنامه‌ها {foreign:.0f}%)، "
+                f"حافظه موجود={memory:.1f}GB"
+            )
+
+            now = time.time()
+            if cpu_pressure or memory_pressure:
+                self.clear_since = None
+                if self.pressure_since is None:
+                    self.pressure_since = now
+                # Pausing frees no memory; memory pressure stops at one job
+                ceiling = self.max_step if cpu_pressure else self.jobs
+                if now - self.pressure_since >= THROTTLE_ESCALATE_SECONDS and self.step < ceiling:
+                    self._set_step(self.step + 1, reason)
+                    self.pressure_since = now
+            elif relaxed:
+                self.pressure_since = None
+                if self.clear_since is None:
+                    self.clear_since = now
+                if now - self.clear_since >= THROTTLE_RELAX_SECONDS and self.step > 0:
+                    self._set_step(self.step - 1, reason)
+                    self.clear_since = now
+            else:
+                self.pressure_since = None
+                self.clear_since = None
+
+            self._apply(groups, live)
+
+    def _own_cpu(self, live):
+        """CPU used by our encoders, as a percentage of the whole machine"""
+        for pid in list(self.procs):
+            if pid not in live:
+                del self.procs[pid]
+
+        total = 0.0
+        for pid in live:
+            proc = self.procs.get(pid)
+            try:
+                if proc is None:
+                    # The first reading only primes the counter
+                    self.procs[pid] = psutil.Process(pid)
+                    self.procs[pid].cpu_percent(interval=None)
+                else:
+                    total += proc.cpu_percent(interval=None)
+            except psutil.Error:
+                self.procs.pop(pid, None)
+
+        return total / self.cpu_count
+
+    def _set_step(self, step, reason):
+        tightening = step > self.step
+        self.step = step
+        self.limit = max(1, self.jobs - max(0, step - 1))
+        self.condition.notify_all()
+
+        if tightening:
+            logger.warning(f"🐢 محدودسازی تبدیل‌ها ({reason}): {self._describe()}")
+        else:
+            logger.info(f"🐇 کاهش محدودیت ({reason}): {self._describe()}")
+
+    def _describe(self):
+        if self.step == 0:
+            return "بدون محدودیت"
+
+        parts = [f"اولویت پایین (nice {THROTTLE_NICE})"]
+        if self.limit < self.jobs:
+            parts.append(f"حداکثر {self.limit} کار هم‌زمان")
+        pause_count = self._pause_count()
+        if pause_count:
+            parts.append(f"{pause_count} کار متوقف")
+        return "، ".join(parts)
+
+    def _pause_count(self):
+        return max(0, self.step - self.jobs)
+
+    def _apply(self, groups, live):
+        """Bring priorities and paused processes in line with self.step"""
+        self.paused &= live
+        for pid in list(self.original_priority):
+            if pid not in live:
+                del self.original_priority[pid]
+
+        for pid in live:
+            if self.step >= 1 and pid not in self.original_priority:
+                self._lower_priority(pid)
+            elif self.step == 0 and pid in self.original_priority:
+                self._restore_priority(pid)
+
+        # Pause the newest jobs; a stopped (interrupted) job must keep running to exit
+        to_pause = set()
+        candidates = [pids for c, pids in groups if not getattr(c, 'interrupted', False)]
+        for pids in candidates[::-1][:self._pause_count()]:
+            to_pause.update(pids)
+
+        for pid in to_pause - self.paused:
+            if self._signal(pid, signal.SIGSTOP):
+                self.paused.add(pid)
+        for pid in self.paused - to_pause:
+            self._signal(pid, signal.SIGCONT)
+            self.paused.discard(pid)
+
+    def _lower_priority(self, pid):
+        try:
+            proc = psutil.Process(pid)
+            ionice = proc.ionice() if hasattr(proc, 'ionice') else None
+            self.original_priority[pid] = (proc.nice(), ionice)
+            proc.nice(max(THROTTLE_NICE, proc.nice()))
+            if ionice is not None:
+                proc.ionice(psutil.IOPRIO_CLASS_IDLE)
+        except psutil.Error as e:
+            log_debug("renice %d failed: %s", pid, e)
+
+    def _restore_priority(self, pid):
+        nice, ionice = self.original_priority.pop(pid)
+        try:
+            proc = psutil.Process(pid)
+            if ionice is not None:
+                proc.ionice(ionice.ioclass, ionice.value)
+            proc.nice(nice)
+        except psutil.AccessDenied:
+            # Raising priority again needs CAP_SYS_NICE; the job stays niced
+            log_debug("Priority of %d could not be restored", pid)
+        except psutil.Error as e:
+            log_debug("Restore priority of %d failed: %s", pid, e)
+
+    @staticmethod
+    def _signal(pid, sig):
+        try:
+            os.kill(pid, sig)
+            return True
+        except (ProcessLookupError, PermissionError):
+            return False
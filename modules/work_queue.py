@@ -0,0 +1,488 @@
+"""
+Lease-based work queue for several encode machines
+صف کار مبتنی بر اجاره برای چند دستگاه تبدیل
+
+A coordinator (video_converter.py --queue, or auto_watch.py --queue) adds
+probed inputs to a shared queue; workers on any number of machines
+(video_converter.py --queue ... --worker) claim one job at a time, run the
+usual Validator -> Converter -> Verifier pipeline and report the result.
+
+A claimed job is leased to its worker for QUEUE_LEASE_SECONDS and the
+worker renews the lease while it encodes. When a worker dies its lease
+expires and the job is queued again, up to QUEUE_MAX_ATTEMPTS leases.
+
+Backends:
+    PATH                  SQLite file on storage every worker can reach
+    tcp://HOST:PORT       QueueServer in front of a SQLite file (one host
+                          owns the database; handy for testing and for
+                          network filesystems with unreliable locking)
+
+Input and output paths must be the same on every machine.
+"""
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+import socketserver
+from contextlib import contextmanager
+from config import (
+    QUEUE_LEASE_SECONDS, QUEUE_POLL_SECONDS, QUEUE_MAX_ATTEMPTS, QUEUE_SERVER_HOST, MESSAGES
+)
+from modules.logger import logger
+from modules.scheduler import JobScheduler
+from modules.utils import format_time
+
+# Job states
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+class LeaseQueue:
+    """
+    SQLite-backed job queue with leases
+    صف کار مبتنی بر SQLite با اجاره‌های زمان‌دار
+    """
+
+    def __init__(self, db_path, lease_seconds=QUEUE_LEASE_SECONDS, max_attempts=QUEUE_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        # Autocommit; claims and reports use explicit BEGIN IMMEDIATE so two
+        # workers can never lease the same row
+        self.conn = sqlite3.connect(
+            db_path, timeout=60, check_same_thread=False, isolation_level=None
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS queue ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER, mtime_ns INTEGER,"
+            " state TEXT, priority REAL, metadata TEXT,"
+            " worker TEXT, lease_expires REAL,"
+            " attempts INTEGER DEFAULT 0,"
+            " output_file TEXT, error TEXT,"
+            " enqueued REAL, updated REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS queue_state ON queue (state, priority)")
+
+    @contextmanager
+    def _transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, entries):
+        """
+        Add entries ({'file', 'size', 'mtime_ns', 'priority', 'metadata'})
+        افزودن کارها به صف
+
+        A path already queued, leased or finished with the same size and
+        mtime is left alone; a file that changed on disk is queued again.
+
+        Returns:
+            number of entries added
+        """
+        now = time.time()
+        added = 0
+
+        with self._transaction():
+            for entry in entries:
+                row = self.conn.execute(
+                    "SELECT size, mtime_ns FROM queue WHERE path = ?", (entry['file'],)
+                ).fetchone()
+                if row and tuple(row) == (entry['size'], entry['mtime_ns']):
+                    continue
+
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO queue "
+                    "(path, size, mtime_ns, state, priority, metadata, attempts, enqueued, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                    (entry['file'], entry['size'], entry['mtime_ns'], QUEUED,
+                     entry.get('priority', now), json.dumps(entry.get('metadata') or {}), now, now)
+                )
+                added += 1
+
+        return added
+
+    def claim(self, worker):
+        """
+        Lease the highest-priority queued job to worker
+        اجاره کار با بیشترین اولویت به یک کارگر
+
+        Returns:
+            {'file', 'metadata', 'attempts', 'lease_seconds'} or None
+        """
+        now = time.time()
+
+        with self._transaction():
+            self._expire(now)
+
+            row = self.conn.execute(
+                "SELECT path, metadata, attempts FROM queue WHERE state = ? "
+                "ORDER BY priority, enqueued LIMIT 1",
+                (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self.conn.execute(
+                "UPDATE queue SET state = ?, worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE path = ?",
+                (LEASED, worker, now + self.lease_seconds, now, row[0])
+            )
+
+        return {
+            'file': row[0],
+            'metadata': json.loads(row[1] or '{}'),
+            'attempts': row[2] + 1,
+            'lease_seconds': self.lease_seconds
+        }
+
+    def _expire(self, now):
+        """Put jobs whose lease ran out back in the queue (caller holds the transaction)"""
+        rows = self.conn.execute(
+            "SELECT path, worker, attempts FROM queue WHERE state = ? AND lease_expires < ?",
+            (LEASED, now)
+        ).fetchall()
+
+        for path, worker, attempts in rows:
+            if attempts >= self.max_attempts:
+                state, error = FAILED, f"lease of {worker} expired"
+                logger.error(f"❌ اجاره {os.path.basename(path)} از {worker} منقضی شد؛ کار ناموفق ثبت شد")
+            else:
+                state, error = QUEUED, None
+                logger.warning(f"🔁 اجاره {os.path.basename(path)} از {worker} منقضی شد؛ بازگشت به صف")
+
+            self.conn.execute(
+                "UPDATE queue SET state = ?, worker = NULL, lease_expires = NULL, "
+                "error = ?, updated = ? WHERE path = ?",
+                (state, error, now, path)
+            )
+
+    def renew(self, path, worker):
+        """
+        Extend worker's lease on path
+        تمدید اجاره کار
+
+        Returns:
+            False when the lease was lost (expired and taken by another worker)
+        """
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE queue SET lease_expires = ?, updated = ? "
+                "WHERE path = ? AND worker = ? AND state = ?",
+                (now + self.lease_seconds, now, path, worker, LEASED)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, path, worker, status, output_file=None, error=None):
+        """
+        Report the result of a leased job
+        ثبت نتیجه کار اجاره شده
+
+        status is the job status from VideoConverter ('completed',
+        'skipped' or 'failed'). Failed jobs are queued again until they
+        have used QUEUE_MAX_ATTEMPTS leases.
+
+        Returns:
+            False when worker no longer held the lease
+        """
+        now = time.time()
+
+        with self._transaction():
+            row = self.conn.execute(
+                "SELECT attempts FROM queue WHERE path = ? AND worker = ? AND state = ?",
+                (path, worker, LEASED)
+            ).fetchone()
+            if row is None:
+                return False
+
+            if status == 'completed':
+                state = DONE
+            elif status == 'skipped':
+                state = SKIPPED
+            else:
+                state = QUEUED if row[0] < self.max_attempts else FAILED
+
+            self.conn.execute(
+                "UPDATE queue SET state = ?, worker = NULL, lease_expires = NULL, "
+                "output_file = ?, error = ?, updated = ? WHERE path = ?",
+                (state, output_file, error, now, path)
+            )
+
+        return True
+
+    def counts(self):
+        """Number of jobs per state"""
+        with self.lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM queue GROUP BY state").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class QueueClient:
+    """
+    LeaseQueue methods over TCP (tcp://HOST:PORT)
+    دسترسی به صف از طریق TCP
+    """
+
+    def __init__(self, host, port, timeout=60):
+        self.address = (host, port)
+        self.timeout = timeout
+
+    def _call(self, op, **args):
+        with socket.create_connection(self.address, timeout=self.timeout) as sock:
+            sock.sendall(json.dumps({'op': op, 'args': args}).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as stream:
+                line = stream.readline()
+
+        if not line:
+            raise ConnectionError(f"queue server {self.address[0]}:{self.address[1]} closed the connection")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise RuntimeError(response.get('error', 'queue server error'))
+        return response.get('result')
+
+    def enqueue(self, entries):
+        return self._call('enqueue', entries=entries)
+
+    def claim(self, worker):
+        return self._call('claim', worker=worker)
+
+    def renew(self, path, worker):
+        return self._call('renew', path=path, worker=worker)
+
+    def complete(self, path, worker, status, output_file=None, error=None):
+        return self._call(
+            'complete', path=path, worker=worker, status=status,
+            output_file=output_file, error=error
+        )
+
+    def counts(self):
+        return self._call('counts')
+
+    def close(self):
+        pass
+
+
+class _QueueRequestHandler(socketserver.StreamRequestHandler):
+    OPERATIONS = ('enqueue', 'claim', 'renew', 'complete', 'counts')
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        try:
+            request = json.loads(line)
+            if request.get('op') not in self.OPERATIONS:
+                raise ValueError(f"unknown operation: {request.get('op')}")
+            method = getattr(self.server.queue, request['op'])
+            response = {'ok': True, 'result': method(**request.get('args', {}))}
+        except Exception as e:
+            response = {'ok': False, 'error': str(e)}
+
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class QueueServer(socketserver.ThreadingTCPServer):
+    """
+    Serve a LeaseQueue to workers over TCP
+    ارائه صف به کارگرها از طریق TCP
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, queue, host=QUEUE_SERVER_HOST, port=0):
+        self.queue = queue
+        super().__init__((host, port), _QueueRequestHandler)
+
+    def serve(self):
+        host, port = self.server_address
+        logger.info(f"🛰️  سرور صف در tcp://{host}:{port} (Ctrl+C برای توقف)")
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+
+
+def open_queue(spec):
+    """
+    LeaseQueue for a path, QueueClient for tcp://HOST:PORT
+    باز کردن صف از روی مسیر یا آدرس TCP
+    """
+    if spec.startswith('tcp://'):
+        host, _, port = spec[len('tcp://'):].rpartition(':')
+        return QueueClient(host or QUEUE_SERVER_HOST, int(port))
+    return LeaseQueue(spec)
+
+
+def parse_listen_address(value):
+    """'PORT' or 'HOST:PORT' -> (host, port)"""
+    host, _, port = str(value).rpartition(':')
+    return host or QUEUE_SERVER_HOST, int(port)
+
+
+def enqueue_files(queue, entries, policy):
+    """
+    Add PreScanner entries to queue, ordered by the scheduling policy
+    افزودن فایل‌ها به صف مشترک با اولویت سیاست زمان‌بندی
+
+    Returns:
+        number of entries added
+    """
+    scheduler = JobScheduler(policy)
+    jobs = []
+    for entry in entries:
+        try:
+            st = os.stat(entry['file'])
+        except OSError:
+            continue
+        jobs.append({
+            'file': entry['file'],
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'priority': scheduler.priority(entry),
+            'metadata': entry.get('metadata') or {}
+        })
+
+    added = queue.enqueue(jobs) if jobs else 0
+    logger.info(f"📥 {added} کار به صف مشترک اضافه شد ({len(jobs) - added} تکراری)")
+    return added
+
+
+class LeaseWorker:
+    """
+    Claim jobs from a queue and convert them until stopped
+    دریافت کار از صف و تبدیل آن‌ها تا زمان توقف
+    """
+
+    def __init__(self, queue, video_converter, worker_id=None, drain=False):
+        """
+        Args:
+            drain: exit once nothing is queued or leased instead of
+                   waiting for new jobs
+        """
+        self.queue = queue
+        self.video_converter = video_converter
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.drain = drain
+        self.stats = {'completed': 0, 'skipped': 0, 'failed': 0}
+
+    def run(self):
+        logger.info(f"👷 کارگر {self.worker_id} آماده دریافت کار است")
+        start_time = time.time()
+
+        try:
+            while True:
+                try:
+                    entry = self.queue.claim(self.worker_id)
+                except (OSError, RuntimeError, sqlite3.Error) as e:
+                    logger.warning(f"خطا در دریافت کار از صف: {str(e)}")
+                    entry = None
+
+                if entry:
+                    self._process(entry)
+                    continue
+
+                if self.drain and self._drained():
+                    break
+                time.sleep(QUEUE_POLL_SECONDS)
+        finally:
+            logger.info(
+                f"👷 کارگر {self.worker_id}: {self.stats['completed']} موفق، "
+                f"{self.stats['skipped']} رد شده، {self.stats['failed']} ناموفق "
+                f"در {format_time(time.time() - start_time)}"
+            )
+
+        return self.stats
+
+    def _drained(self):
+        try:
+            counts = self.queue.counts()
+        except (OSError, RuntimeError, sqlite3.Error):
+            return False
+        return not counts.get(QUEUED) and not counts.get(LEASED)
+
+    def _process(self, entry):
+        input_file = entry['file']
+        logger.info(
+            f"📦 کار دریافت شد: {os.path.basename(input_file)} "
+            f"(تلاش {entry['attempts']})"
+        )
+
+        lost = threading.Event()
+        finished = threading.Event()
+        # VideoConverter checks 'abort' before it starts the encode
+        job = {'abort': lost}
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(input_file, entry['lease_seconds'], job, lost, finished),
+            daemon=True
+        )
+        heartbeat.start()
+
+        try:
+            self.video_converter.convert_single_file(
+                input_file, job=job, metadata=entry.get('metadata') or None
+            )
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            logger.error(f"خطا در پردازش {os.path.basename(input_file)}: {str(e)}")
+        finally:
+            finished.set()
+            heartbeat.join()
+
+        if lost.is_set():
+            # Another worker owns the job now; its result is the one that counts
+            self.stats['failed'] += 1
+            return
+
+        status = job.get('status', 'failed')
+        self.stats[status] = self.stats.get(status, 0) + 1
+        try:
+            self.queue.complete(
+                input_file, self.worker_id, status,
+                output_file=job.get('output_file'), error=job.get('error')
+            )
+        except (OSError, RuntimeError, sqlite3.Error) as e:
+            # The lease will expire and the job will be retried
+            logger.error(f"خطا در ثبت نتیجه در صف: {str(e)}")
+
+    def _heartbeat(self, path, lease_seconds, job, lost, finished):
+        """Renew the lease until the job finishes; stop the encode if it is lost"""
+        while not finished.wait(lease_seconds / 3):
+            try:
+                if self.queue.renew(path, self.worker_id):
+                    continue
+            except (OSError, RuntimeError, sqlite3.Error) as e:
+                # Keep encoding; the next renewal may get through in time
+                logger.warning(f"خطا در تمدید اجاره: {str(e)}")
+                continue
+
+            logger.error(f"✗ اجاره {os.path.basename(path)} از دست رفت؛ تبدیل متوقف می‌شود")
+            lost.set()
+            job['error'] = MESSAGES['interrupted']
+            converter = job.get('converter')
+            if converter:
+                converter.stop()
+            return
@@ -0,0 +1,78 @@
+"""
+Tests for DiskGuard admission (modules/disk_space.py)
+"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from modules.disk_space import DiskGuard, NO_SPACE_MARKER, disk_full
+
+MB = 1024 ** 2
+
+
+class DiskGuardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.free = 1000 * MB
+        patcher = mock.patch.object(DiskGuard, '_free', staticmethod(lambda path: self.free))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        # floor: 100 MB
+        self.guard = DiskGuard(min_free_gb=100 / 1024, interval=0.05)
+
+    def output(self, name, size):
+        return size, [os.path.join(self.dir, name)]
+
+    def test_admits_job_that_fits_above_floor(self):
+        reservation = self.guard.admit([self.output('a.mkv', 900 * MB)], 'a')
+        self.assertIsNotNone(reservation)
+        self.assertEqual(len(self.guard.reservations), 1)
+
+    def test_fails_at_once_when_own_estimate_does_not_fit(self):
+        self.assertIsNone(self.guard.admit([self.output('a.mkv', 901 * MB)], 'a'))
+        self.assertEqual(self.guard.reservations, [])
+
+    def test_waits_for_other_reservation_then_admits(self):
+        first = self.guard.admit([self.output('a.mkv', 600 * MB)], 'a')
+        result = {}
+        waiter = threading.Thread(
+            target=lambda: result.update(second=self.guard.admit([self.output('b.mkv', 600 * MB)], 'b'))
+        )
+        waiter.start()
+        waiter.join(0.3)
+        self.assertTrue(waiter.is_alive())
+
+        self.guard.release(first)
+        waiter.join(2)
+        self.assertFalse(waiter.is_alive())
+        self.assertIsNotNone(result['second'])
+
+    def test_written_bytes_no_longer_count_as_outstanding(self):
+        path = os.path.join(self.dir, 'a.mkv')
+        self.guard.admit([(600 * MB, [path])], 'a')
+        with open(path, 'wb') as f:
+            f.truncate(600 * MB)
+        # The 600 MB already written left the free space reported above
+        self.assertIsNotNone(self.guard.admit([self.output('b.mkv', 600 * MB)], 'b'))
+
+    def test_same_filesystem_counted_once_per_output(self):
+        paths = [os.path.join(self.dir, 'work.mkv'), os.path.join(self.dir, 'final.mkv')]
+        reservation = self.guard.admit([(900 * MB, paths)], 'a')
+        self.assertIsNotNone(reservation)
+        self.assertEqual(len(reservation['targets']), 1)
+
+    def test_disk_full_from_reservation_or_ffmpeg_log(self):
+        class Converter:
+            log_tail = ['frame=1', f"av_interleaved_write_frame(): {NO_SPACE_MARKER}"]
+
+        self.assertTrue(disk_full(None, Converter()))
+        self.assertTrue(disk_full({'disk_full': True}, object()))
+        self.assertFalse(disk_full({'disk_full': False}, object()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Tests for the watch-mode job journal (modules/job_store.py)
+"""
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from config import JOB_RETRY_BASE_SECONDS, JOB_RETRY_MAX_SECONDS
+from modules.job_store import JobStore
+
+
+class JobStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.store = JobStore(os.path.join(self.dir, 'jobs.sqlite'), max_attempts=3)
+        self.addCleanup(self.store.close)
+        self.video = self.make_file('video.mkv')
+
+    def make_file(self, name, data=b'x' * 64):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def next_attempt(self, path):
+        return self.store._get(os.path.abspath(path))[5]
+
+    def fail(self, path):
+        self.store.mark_processing(path)
+        now = time.time()
+        self.store.mark_failed(path, 'boom')
+        return self.next_attempt(path) - now
+
+    def test_new_file_is_processed(self):
+        self.assertTrue(self.store.should_process(self.video))
+        self.assertFalse(self.store.should_process(os.path.join(self.dir, 'missing.mkv')))
+
+    def test_done_and_rejected_files_are_skipped(self):
+        other = self.make_file('other.mkv')
+        self.store.mark_done(self.video, '/out/video.mkv')
+        self.store.mark_rejected(other, 'corrupt')
+        self.assertFalse(self.store.should_process(self.video))
+        self.assertFalse(self.store.should_process(other))
+
+    def test_replaced_file_is_processed_again(self):
+        self.store.mark_done(self.video, '/out/video.mkv')
+        self.make_file('video.mkv', b'y' * 128)
+        self.assertTrue(self.store.should_process(self.video))
+
+    def test_backoff_doubles_per_attempt(self):
+        first = self.fail(self.video)
+        second = self.fail(self.video)
+        self.assertAlmostEqual(first, JOB_RETRY_BASE_SECONDS, delta=1)
+        self.assertAlmostEqual(second, 2 * JOB_RETRY_BASE_SECONDS, delta=1)
+
+    def test_backoff_is_capped(self):
+        self.store.max_attempts = 100
+        for _ in range(20):
+            delay = self.fail(self.video)
+        self.assertAlmostEqual(delay, JOB_RETRY_MAX_SECONDS, delta=1)
+
+    def test_failed_file_waits_for_its_backoff(self):
+        self.fail(self.video)
+        self.assertFalse(self.store.should_process(self.video))
+        self.assertEqual(self.store.due_retries(), [])
+
+        later = time.time() + JOB_RETRY_BASE_SECONDS + 1
+        with mock.patch('modules.job_store.time.time', return_value=later):
+            self.assertTrue(self.store.should_process(self.video))
+            self.assertEqual(self.store.due_retries(), [os.path.abspath(self.video)])
+
+    def test_gives_up_after_max_attempts(self):
+        for _ in range(3):
+            self.fail(self.video)
+        later = time.time() + JOB_RETRY_MAX_SECONDS + 1
+        with mock.patch('modules.job_store.time.time', return_value=later):
+            self.assertFalse(self.store.should_process(self.video))
+            self.assertEqual(self.store.due_retries(), [])
+
+        self.assertEqual(self.store.reset_failed(), 1)
+        self.assertTrue(self.store.should_process(self.video))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests for the -progress block pipeline (modules/progress_stream.py)
+"""
+import io
+import json
+import unittest
+from contextlib import redirect_stdout
+from modules.progress_stream import ProgressBlockParser, JsonProgressTracker, block_out_time, to_float
+
+PROGRESS_OUTPUT = """frame=120
+fps=59.94
+bitrate=1200.5kbits/s
+out_time_us=5000000
+out_time_ms=5000000
+out_time=00:00:05.000000
+speed=2.5x
+progress=continue
+frame=240
+fps=60.00
+out_time_us=10000000
+speed=2.49x
+progress=end
+"""
+
+
+class ProgressBlockParserTest(unittest.TestCase):
+
+    def parse(self, text):
+        parser = ProgressBlockParser()
+        return [block for block in map(parser.feed, text.splitlines(True)) if block]
+
+    def test_blocks_end_at_progress_key(self):
+        blocks = self.parse(PROGRESS_OUTPUT)
+        self.assertEqual(len(blocks), 2)
+        self.assertEqual(blocks[0]['frame'], '120')
+        self.assertEqual(blocks[0]['progress'], 'continue')
+        self.assertEqual(blocks[1], {
+            'frame': '240', 'fps': '60.00', 'out_time_us': '10000000',
+            'speed': '2.49x', 'progress': 'end'
+        })
+
+    def test_unfinished_block_is_held_back(self):
+        parser = ProgressBlockParser()
+        self.assertIsNone(parser.feed('frame=1\n'))
+        self.assertIsNone(parser.feed('not a key value line\n'))
+        self.assertIsNone(parser.feed('\n'))
+        self.assertEqual(parser.feed('progress=continue\n'), {'frame': '1', 'progress': 'continue'})
+
+    def test_out_time(self):
+        self.assertEqual(block_out_time({'out_time_us': '2500000'}), 2.5)
+        self.assertEqual(block_out_time({'out_time_ms': '2500000'}), 2.5)
+        # Negative before the first frame is written
+        self.assertEqual(block_out_time({'out_time_us': '-9223372036854775807'}), 0.0)
+        self.assertEqual(block_out_time({}), 0.0)
+
+    def test_to_float(self):
+        self.assertEqual(to_float('2.5x'), 2.5)
+        self.assertEqual(to_float('N/A', 1.0), 1.0)
+        self.assertEqual(to_float(None), 0.0)
+
+
+class JsonProgressTrackerTest(unittest.TestCase):
+
+    def test_events(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            tracker = JsonProgressTracker(duration=10.0, filename='a.mkv', quality='CRF 28')
+            parser = ProgressBlockParser()
+            for line in PROGRESS_OUTPUT.splitlines():
+                block = parser.feed(line)
+                if block:
+                    tracker.update_block(block)
+            tracker.close()
+
+        events = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([event['event'] for event in events][0], 'start')
+        self.assertEqual(events[-1]['event'], 'end')
+
+        progress = [event for event in events if event['event'] == 'progress']
+        self.assertEqual(progress[-1]['percent'], 100)
+        self.assertEqual(progress[-1]['frame'], 240)
+        self.assertEqual(progress[-1]['speed'], 2.49)
+        self.assertEqual(progress[-1]['eta'], 0)
+        self.assertEqual(events[-1]['out_time'], 10.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
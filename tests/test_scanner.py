@@ -0,0 +1,76 @@
+"""
+Tests for the streaming scanner and its directory index (modules/scanner.py)
+"""
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from modules.scanner import DirectoryIndex, scan_video_files
+
+OLD = time.time() - 3600
+
+
+class ScannerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.root = os.path.join(self.dir, 'videos')
+        self.index = DirectoryIndex(os.path.join(self.dir, 'index.sqlite'))
+        self.addCleanup(self.index.close)
+
+        for name in ('b.mkv', 'a.mp4', 'notes.txt', 'show/e01.mkv', '_incomplete/x.mkv', 'output/y.mkv'):
+            self.touch(name)
+        self.age('show')
+        self.age('')
+
+    def touch(self, name):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'wb').close()
+        return path
+
+    def age(self, name, when=OLD):
+        """Set a directory's mtime, as if it was last changed at when"""
+        path = os.path.join(self.root, name)
+        os.utime(path, (when, when))
+
+    def scan(self, index=None):
+        return [os.path.relpath(path, self.root) for path in scan_video_files([self.root], index)]
+
+    def test_scan_without_index(self):
+        self.assertEqual(self.scan(), ['a.mp4', 'b.mkv', os.path.join('show', 'e01.mkv')])
+
+    def test_unchanged_directory_is_not_listed_again(self):
+        expected = self.scan(self.index)
+        self.assertEqual(self.index.misses, 2)
+
+        # A file appears but the mtime is unchanged: the stored listing is used
+        self.touch('show/e02.mkv')
+        self.age('show')
+        self.assertEqual(self.scan(self.index), expected)
+        self.assertEqual(self.index.hits, 2)
+
+        # A changed mtime lists the directory again
+        self.age('show', OLD + 60)
+        self.assertIn(os.path.join('show', 'e02.mkv'), self.scan(self.index))
+
+    def test_recently_changed_directory_is_not_stored(self):
+        self.age('show', time.time())
+        self.scan(self.index)
+        root = os.stat(self.root).st_mtime_ns
+        show = os.stat(os.path.join(self.root, 'show')).st_mtime_ns
+        self.assertIsNotNone(self.index.get(self.root, root))
+        self.assertIsNone(self.index.get(os.path.join(self.root, 'show'), show))
+
+    def test_files_patterns_and_duplicates(self):
+        video = os.path.join(self.root, 'a.mp4')
+        found = list(scan_video_files([video, os.path.join(self.root, '*.mkv'), self.root]))
+        self.assertEqual(found, [
+            video, os.path.join(self.root, 'b.mkv'), os.path.join(self.root, 'show', 'e01.mkv')
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
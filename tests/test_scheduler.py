@@ -0,0 +1,132 @@
+"""
+Tests for cost-aware job scheduling (modules/scheduler.py)
+"""
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from config import SCHEDULER_AGING_RATE, SCHEDULER_DECODE_WEIGHT
+from modules.scheduler import JobScheduler, estimate_cost
+
+
+def entry(path, duration, width=1920, height=1080, queued_at=None):
+    job = {'file': path, 'metadata': {'duration': duration, 'width': width, 'height': height}}
+    if queued_at is not None:
+        job['queued_at'] = queued_at
+    return job
+
+
+def drain(scheduler):
+    order = []
+    while True:
+        job = scheduler.pop()
+        if job is None:
+            return order
+        order.append(os.path.basename(job['file']))
+
+
+class EstimateCostTest(unittest.TestCase):
+
+    def test_1080p(self):
+        self.assertAlmostEqual(
+            estimate_cost({'duration': 100, 'width': 1920, 'height': 1080}),
+            100 * (1 + SCHEDULER_DECODE_WEIGHT)
+        )
+
+    def test_4k_is_encoded_at_1080p(self):
+        self.assertAlmostEqual(
+            estimate_cost({'duration': 100, 'width': 3840, 'height': 2160}),
+            100 * (1 + 4 * SCHEDULER_DECODE_WEIGHT)
+        )
+
+    def test_missing_duration(self):
+        self.assertEqual(estimate_cost({}), 0.0)
+
+
+class JobSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = time.time()
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            JobScheduler('random')
+
+    def test_fifo(self):
+        scheduler = JobScheduler('fifo')
+        scheduler.extend([
+            entry('/a.mkv', 7200, queued_at=self.now),
+            entry('/b.mkv', 60, queued_at=self.now + 1),
+        ])
+        self.assertEqual(drain(scheduler), ['a.mkv', 'b.mkv'])
+
+    def test_sjf(self):
+        scheduler = JobScheduler('sjf')
+        scheduler.extend([
+            entry('/movie.mkv', 7200, queued_at=self.now),
+            entry('/4k.mkv', 1200, 3840, 2160, queued_at=self.now),
+            entry('/episode.mkv', 1200, queued_at=self.now),
+        ])
+        self.assertIn('/movie.mkv', scheduler)
+        self.assertEqual(len(scheduler), 3)
+        self.assertEqual(drain(scheduler), ['episode.mkv', '4k.mkv', 'movie.mkv'])
+        self.assertNotIn('/movie.mkv', scheduler)
+
+    def test_oldest(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+        paths = []
+        for name, mtime in (('new.mkv', self.now), ('old.mkv', self.now - 3600)):
+            path = os.path.join(folder, name)
+            open(path, 'wb').close()
+            os.utime(path, (mtime, mtime))
+            paths.append(path)
+
+        scheduler = JobScheduler('oldest')
+        scheduler.extend([entry(path, 60, queued_at=self.now) for path in paths])
+        self.assertEqual(drain(scheduler), ['old.mkv', 'new.mkv'])
+
+    def test_category(self):
+        scheduler = JobScheduler('category')
+        scheduler.extend([
+            entry('/Some.Movie.2020.mkv', 60, queued_at=self.now),
+            entry('/Some.Show.S01E02.mkv', 3000, queued_at=self.now),
+        ])
+        self.assertEqual(drain(scheduler), ['Some.Show.S01E02.mkv', 'Some.Movie.2020.mkv'])
+
+    def test_aging_lets_a_long_wait_win(self):
+        long_cost = estimate_cost(entry('/big.mkv', 7200)['metadata'])
+        waited = 2 * long_cost / SCHEDULER_AGING_RATE
+
+        scheduler = JobScheduler('sjf')
+        scheduler.extend([
+            entry('/small.mkv', 60, queued_at=self.now),
+            entry('/big.mkv', 7200, queued_at=self.now - waited),
+        ])
+        self.assertEqual(drain(scheduler), ['big.mkv', 'small.mkv'])
+
+    def test_priority_and_reprioritize(self):
+        scheduler = JobScheduler('sjf')
+        urgent = entry('/urgent.mkv', 7200, queued_at=self.now)
+        urgent['priority'] = 1
+        scheduler.extend([
+            entry('/short.mkv', 60, queued_at=self.now),
+            urgent,
+            entry('/later.mkv', 3600, queued_at=self.now),
+        ])
+        self.assertTrue(scheduler.reprioritize('/later.mkv', 2))
+        self.assertFalse(scheduler.reprioritize('/missing.mkv', 2))
+        self.assertEqual(
+            [os.path.basename(job['file']) for job in scheduler.entries()],
+            ['later.mkv', 'urgent.mkv', 'short.mkv']
+        )
+        self.assertEqual(scheduler.remove('/urgent.mkv'), urgent)
+        self.assertEqual(drain(scheduler), ['later.mkv', 'short.mkv'])
+
+    def test_pop_on_empty_queue(self):
+        self.assertIsNone(JobScheduler().pop())
+
+
+if __name__ == '__main__':
+    unittest.main()
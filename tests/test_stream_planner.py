@@ -0,0 +1,84 @@
+"""
+Tests for per-stream planning (modules/stream_planner.py)
+"""
+import unittest
+from config import AUDIO_CODEC, AUDIO_BITRATE
+from modules.stream_planner import StreamPlanner, parse_bitrate
+
+
+def stream(index, kind, codec, bit_rate=0, attached_pic=False, channels=0):
+    return {
+        'index': index, 'type': kind, 'codec': codec, 'channels': channels,
+        'bit_rate': bit_rate, 'language': '', 'title': '', 'attached_pic': attached_pic
+    }
+
+
+STREAMS = [
+    stream(0, 'video', 'h264'),
+    stream(1, 'audio', 'aac', bit_rate=128000, channels=2),
+    stream(2, 'audio', 'dts', bit_rate=1500000, channels=6),
+    stream(3, 'audio', 'opus'),
+    stream(4, 'subtitle', 'subrip'),
+    stream(5, 'subtitle', 'mov_text'),
+    stream(6, 'subtitle', 'eia_608'),
+    stream(7, 'attachment', 'ttf'),
+    stream(8, 'video', 'mjpeg', attached_pic=True),
+    stream(9, 'data', 'bin_data'),
+]
+
+
+class StreamPlannerTest(unittest.TestCase):
+
+    def actions(self, streams):
+        return [(d['index'], d['action']) for d in StreamPlanner.plan({'streams': streams})]
+
+    def test_plan(self):
+        self.assertEqual(self.actions(STREAMS), [
+            (0, 'transcode'), (1, 'copy'), (2, 'transcode'), (3, 'copy'),
+            (4, 'copy'), (5, 'transcode'), (6, 'drop'), (7, 'copy'),
+            (8, 'drop'), (9, 'drop'),
+        ])
+
+    def test_only_first_video_stream_is_encoded(self):
+        streams = [stream(0, 'video', 'mjpeg', attached_pic=True), stream(1, 'video', 'h264'),
+                   stream(2, 'video', 'h264')]
+        self.assertEqual(self.actions(streams), [(0, 'drop'), (1, 'transcode'), (2, 'drop')])
+
+    def test_audio_over_copy_ratio_is_transcoded(self):
+        high = int(parse_bitrate(AUDIO_BITRATE) * 2)
+        self.assertEqual(self.actions([stream(0, 'audio', 'ac3', bit_rate=high)]), [(0, 'transcode')])
+
+    def test_no_stream_list(self):
+        self.assertIsNone(StreamPlanner.plan({'has_video': True}))
+
+    def test_build_args(self):
+        plan = StreamPlanner.plan({'streams': STREAMS})
+        self.assertEqual(StreamPlanner.build_args(plan, chapters=3), [
+            '-map', '0:0',
+            '-map', '0:1', '-c:a:0', 'copy',
+            '-map', '0:2', '-c:a:1', AUDIO_CODEC, '-b:a:1', AUDIO_BITRATE,
+            '-map', '0:3', '-c:a:2', 'copy',
+            '-map', '0:4', '-c:s:0', 'copy',
+            '-map', '0:5', '-c:s:1', 'srt',
+            '-map', '0:7',
+            '-c:t', 'copy',
+            '-map_metadata', '0',
+            '-map_chapters', '0',
+        ])
+
+    def test_build_args_with_video_from_another_input(self):
+        plan = StreamPlanner.plan({'streams': STREAMS[:2]})
+        self.assertEqual(StreamPlanner.build_args(plan, source=1, video_map='0:v:0'), [
+            '-map', '0:v:0',
+            '-map', '1:1', '-c:a:0', 'copy',
+            '-map_metadata', '1',
+        ])
+
+    def test_parse_bitrate(self):
+        self.assertEqual(parse_bitrate('192k'), 192000)
+        self.assertEqual(parse_bitrate('1.5M'), 1500000)
+        self.assertEqual(parse_bitrate('bad'), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Tests for the lease-based work queue (modules/work_queue.py)
+"""
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from modules.work_queue import LeaseQueue, LeaseWorker, QUEUED, LEASED, DONE, SKIPPED, FAILED
+
+
+def entry(path, priority=0, size=100, mtime_ns=1):
+    return {'file': path, 'size': size, 'mtime_ns': mtime_ns, 'priority': priority, 'metadata': {}}
+
+
+class LeaseQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.queue = self.open_queue()
+
+    def open_queue(self, lease_seconds=60, max_attempts=2):
+        queue = LeaseQueue(
+            os.path.join(self.dir, 'queue.sqlite'), lease_seconds=lease_seconds,
+            max_attempts=max_attempts
+        )
+        self.addCleanup(queue.close)
+        return queue
+
+    def state(self, path):
+        return self.queue.conn.execute("SELECT state FROM queue WHERE path = ?", (path,)).fetchone()[0]
+
+    def test_enqueue_skips_unchanged_and_requeues_changed_files(self):
+        self.assertEqual(self.queue.enqueue([entry('/a'), entry('/b')]), 2)
+        self.assertEqual(self.queue.enqueue([entry('/a')]), 0)
+        self.assertEqual(self.queue.enqueue([entry('/a', mtime_ns=2)]), 1)
+        self.assertEqual(self.queue.counts(), {QUEUED: 2})
+
+    def test_claim_takes_lowest_priority_value_once(self):
+        self.queue.enqueue([entry('/late', priority=2), entry('/first', priority=1)])
+        job = self.queue.claim('w1')
+        self.assertEqual(job['file'], '/first')
+        self.assertEqual(job['attempts'], 1)
+        self.assertEqual(self.queue.claim('w2')['file'], '/late')
+        self.assertIsNone(self.queue.claim('w3'))
+        self.assertEqual(self.queue.counts(), {LEASED: 2})
+
+    def test_renew_only_by_lease_holder(self):
+        self.queue.enqueue([entry('/a')])
+        self.queue.claim('w1')
+        self.assertTrue(self.queue.renew('/a', 'w1'))
+        self.assertFalse(self.queue.renew('/a', 'w2'))
+
+    def test_expired_lease_is_claimed_again(self):
+        self.queue = self.open_queue(lease_seconds=0.05)
+        self.queue.enqueue([entry('/a')])
+        self.queue.claim('w1')
+        time.sleep(0.1)
+
+        job = self.queue.claim('w2')
+        self.assertEqual(job['file'], '/a')
+        self.assertEqual(job['attempts'], 2)
+        # The first worker lost the job
+        self.assertFalse(self.queue.renew('/a', 'w1'))
+        self.assertFalse(self.queue.complete('/a', 'w1', 'completed'))
+
+    def test_expired_lease_fails_after_max_attempts(self):
+        self.queue = self.open_queue(lease_seconds=0.05, max_attempts=1)
+        self.queue.enqueue([entry('/a')])
+        self.queue.claim('w1')
+        time.sleep(0.1)
+        self.assertIsNone(self.queue.claim('w2'))
+        self.assertEqual(self.state('/a'), FAILED)
+
+    def test_complete_records_status(self):
+        self.queue.enqueue([entry('/a', priority=1), entry('/b', priority=2)])
+        self.queue.claim('w1')
+        self.queue.claim('w1')
+        self.assertTrue(self.queue.complete('/a', 'w1', 'completed', output_file='/out/a.mkv'))
+        self.assertTrue(self.queue.complete('/b', 'w1', 'skipped', error='not worth it'))
+        self.assertEqual(self.state('/a'), DONE)
+        self.assertEqual(self.state('/b'), SKIPPED)
+
+    def test_failed_job_is_retried_until_max_attempts(self):
+        self.queue.enqueue([entry('/a')])
+        self.queue.claim('w1')
+        self.queue.complete('/a', 'w1', 'failed', error='boom')
+        self.assertEqual(self.state('/a'), QUEUED)
+
+        self.queue.claim('w1')
+        self.queue.complete('/a', 'w1', 'failed', error='boom')
+        self.assertEqual(self.state('/a'), FAILED)
+
+
+class _LosingQueue:
+    """Queue whose lease renewals always fail"""
+
+    def __init__(self):
+        self.completed = []
+
+    def renew(self, path, worker):
+        return False
+
+    def complete(self, *args, **kwargs):
+        self.completed.append(args)
+        return True
+
+
+class _WaitingConverter:
+    """Stands in for VideoConverter: waits for the abort event like it does"""
+
+    def convert_single_file(self, input_file, job=None, metadata=None):
+        aborted = job['abort'].wait(5)
+        job['status'] = 'failed'
+        job['encoded'] = not aborted
+        self.job = job
+        return False
+
+
+class LeaseWorkerTest(unittest.TestCase):
+
+    def test_lost_lease_aborts_job_and_reports_nothing(self):
+        queue = _LosingQueue()
+        converter = _WaitingConverter()
+        worker = LeaseWorker(queue, converter, worker_id='w1')
+        worker._process({'file': '/a.mkv', 'attempts': 1, 'lease_seconds': 0.06, 'metadata': {}})
+
+        self.assertFalse(converter.job['encoded'])
+        self.assertEqual(queue.completed, [])
+        self.assertEqual(worker.stats['failed'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,15 +11,54 @@ with intelligent quality detection, batch processing, and progress tracking.
 """
 import os
 import sys
+import time
 import argparse
-import glob
+import itertools
+import threading
+from config import (
+    MESSAGES, VERIFY_MODE, PREDICT_MIN_SAVING_PERCENT, SCHEDULER_POLICY, STAGING_BUDGET_GB,
+    DUPLICATE_ACTION, DAEMON_POLL_SECONDS, DISK_MIN_FREE_GB, PROBE_CACHE_FILE, SCAN_INDEX_FILE, FINGERPRINT_FILE,
+    ENCODE_HISTORY_FILE
+)
 from modules.validator import Validator
-from modules.converter import Converter
 from modules.categorizer import Categorizer
-from modules.verifier import Verifier
+from modules.decode_verifier import DecodeVerifier, VERIFY_MODES
 from modules.logger import logger
-from modules.progress import BatchProgressTracker
+from modules.log_backend import LOG_FORMATS, configure_logging, log_job
 from modules.resource_manager import ResourceManager
+from modules.resource_sampler import start_resource_sampler
+from modules.throttle import ThrottleController
+from modules.job_pool import JobPool, JobConverter, resolve_jobs
+from modules.stream_planner import install_stream_probe
+from modules.probe_cache import enable_probe_cache, log_probe_cache_stats
+from modules.prescan import PreScanner, StreamingBatchProgress
+from modules.scanner import (
+    scan_video_files, enable_scan_index, get_scan_index, log_scan_index_stats
+)
+from modules.scheduler import JobScheduler, SCHEDULER_POLICIES
+from modules.work_queue import (
+    LeaseWorker, QueueServer, open_queue, enqueue_files, parse_listen_address
+)
+from modules.daemon import ConverterDaemon, connect_daemon, default_address, serve_daemon
+from modules.progress_stream import emit_event
+from modules.size_predictor import SizePredictor
+from modules.metrics import (
+    FileMetrics, enable_metrics, record_file_metrics, start_profile, stop_profile
+)
+from modules.segments import SegmentedConverter, resolve_segments, checkpoint_count
+from modules.staging import ScratchStager
+from modules.fingerprint import (
+    DUPLICATE_ACTIONS, content_fingerprint, enable_fingerprint_index, get_fingerprint_index,
+    link_outputs
+)
+from modules.renditions import (
+    RenditionConverter, parse_renditions, select_renditions, rendition_path
+)
+from modules.encode_history import enable_encode_history, get_encode_history, output_profile
+from modules.planner import BatchPlanner, PLAN_FORMATS, install_lazy_output_dirs
+from modules.disk_space import (
+    enable_disk_guard, get_disk_guard, estimate_output_sizes, disk_full
+)
 from modules.utils import format_size, format_time
 
 
@@ -29,37 +68,149 @@ class VideoConverter:
     برنامه اصلی تبدیل ویدیو
     """
     
-    def __init__(self, output_dir='output', verify=True):
+    def __init__(self, output_dir='output', verify=True, jobs=1, segments=1, resumable=False,
+                 progress_format='bar', throttle=True, verify_mode=VERIFY_MODE,
+                 min_saving=PREDICT_MIN_SAVING_PERCENT, schedule=SCHEDULER_POLICY,
+                 scratch=None, scratch_budget=STAGING_BUDGET_GB, renditions=None,
+                 duplicates=DUPLICATE_ACTION):
         """
         Initialize video converter
         راه‌اندازی تبدیل‌کننده ویدیو
+        
+        Args:
+            jobs: number of files converted concurrently
+            segments: split each long file into this many pieces ('auto' allowed)
+            resumable: encode in committed checkpoint pieces that survive failures
+            progress_format: 'bar' for the terminal, 'jsonl' for JSON events on stdout
+            throttle: back off running encodes when other programs need the machine
+            verify_mode: 'basic', 'sampled' or 'full' decode verification
+            min_saving: skip files predicted to shrink by less than this
+                        percentage (None disables the prediction)
+            schedule: order of queued files ('fifo', 'sjf', 'oldest', 'category')
+            scratch: local directory to prefetch inputs and encode into;
+                     outputs are published to output_dir once verified
+            scratch_budget: GB of scratch space staged files may use
+            renditions: QUALITY_PRESETS labels encoded from one decode,
+                        tallest first (None: one output per file)
+            duplicates: what to do with a file whose content was converted
+                        before: 'skip', 'link' (hard-link the earlier
+                        output) or 'off'
         """
         self.output_dir = output_dir
         self.verify = verify
+        self.verify_mode = verify_mode
+        self.verify_times = []
+        self.min_saving = min_saving
+        self.prediction_errors = []
+        self.jobs = jobs
+        self.segments = segments
+        self.resumable = resumable
+        self.progress_format = progress_format
+        self.throttle = ThrottleController(jobs) if throttle else None
+        self.schedule = schedule
+        self.renditions = renditions
+        self.duplicate_action = duplicates
+        self.duplicates = []
+        # Resumable checkpoints are tied to the input file, so inputs are
+        # read in place; outputs are still staged
+        self.stager = ScratchStager(
+            scratch, scratch_budget, stage_inputs=not resumable
+        ) if scratch else None
     
-    def convert_single_file(self, input_file):
+    def prefetch_next(self, scheduler):
+        """
+        Start copying the next queued input to scratch
+        شروع پیش‌خوانی فایل بعدی صف
+        """
+        if self.stager:
+            entry = scheduler.peek()
+            if entry is not None:
+                self.stager.prefetch(entry['file'])
+    
+    def settings(self):
+        """
+        Conversion options of this converter, for comparing a daemon's
+        settings with a client's command line
+        """
+        return {
+            'verify': self.verify,
+            'verify_mode': self.verify_mode,
+            'min_saving': self.min_saving,
+            'segments': str(self.segments),
+            'resumable': self.resumable,
+            'renditions': self.renditions,
+            'scratch': self.stager.root if self.stager else None,
+            'duplicates': self.duplicate_action,
+            'jobs': self.jobs,
+            'schedule': self.schedule
+        }
+    
+    def convert_single_file(self, input_file, job=None, metadata=None):
         """
         Convert a single video file
         تبدیل یک فایل ویدیو
         
+        Args:
+            job: optional job dict from JobPool ('threads', 'display', 'slot',
+                 'queue_wait', 'resource_wait', 'probe_seconds', 'abort'
+                 event that cancels the job before its encode starts);
+                 status, sizes and timing are written back into it
+            metadata: metadata from a pre-scan; skips validating again
+        
         Returns:
             True if successful, False otherwise
         """
+        job = job if job is not None else {}
+        job['status'] = 'failed'
+        metrics = FileMetrics(input_file)
+        
+        try:
+            # Everything logged for this file carries its job ID
+            with log_job(input_file) as job_id:
+                job['job_id'] = job_id
+                metrics.set(job=job_id)
+                return self._convert_file(input_file, job, metadata, metrics)
+        finally:
+            guard = get_disk_guard()
+            if guard is not None:
+                guard.release(job.pop('reservation', None))
+            if self.stager:
+                # A prefetched input is dropped even when the job ended
+                # before its outputs were known
+                self.stager.release_input(input_file)
+                outputs = job.get('outputs') or ([
+                    {'output_file': job['output_file'], 'work_output': job['output_file']}
+                ] if job.get('output_file') else [])
+                for output in outputs:
+                    self.stager.release(input_file, output['work_output'], output['output_file'])
+            metrics.finish(job)
+            job['stages'] = metrics.stages
+            record_file_metrics(metrics)
+    
+    def _convert_file(self, input_file, job, metadata, metrics):
+        """Body of convert_single_file, timing each stage into metrics"""
         logger.info(f"\n{'='*60}")
         logger.info(f"پردازش: {os.path.basename(input_file)}")
         logger.info(f"{'='*60}")
         
         # Validate file
-        validation = Validator.validate_file(input_file)
-        if not validation:
-            logger.error(f"✗ خطا: {validation.error_message}")
-            return False
-        
-        metadata = validation.metadata
+        if not metadata:
+            with metrics.stage('probe'):
+                validation = Validator.validate_file(input_file)
+            if not validation:
+                logger.error(f"✗ خطا: {validation.error_message}")
+                job['error'] = validation.error_message
+                return False
+            
+            metadata = validation.metadata
+        else:
+            metrics.add_stage('probe', job.get('probe_seconds'))
         
         # Categorize and determine output path
-        categorization = Categorizer.categorize_file(input_file, self.output_dir)
+        with metrics.stage('categorize'):
+            categorization = Categorizer.categorize_file(input_file, self.output_dir)
         output_file = categorization['output_file']
+        job['output_file'] = output_file
         
         logger.info(f"نوع: {categorization['type']}")
         logger.info(f"کیفیت: {metadata['quality']}")
@@ -69,23 +220,181 @@ class VideoConverter:
         if os.path.exists(output_file):
             logger.warning(f"فایل خروجی از قبل موجود است، رونویسی می‌شود")
         
+        # Same content converted before under another name or folder
+        fingerprint = None
+        index = get_fingerprint_index()
+        if index is not None and self.duplicate_action != 'off':
+            fingerprint = job.get('fingerprint') or content_fingerprint(input_file, metadata)
+            earlier = index.lookup(fingerprint) if fingerprint else None
+            if earlier and earlier[0] != input_file:
+                return self._handle_duplicate(input_file, output_file, earlier, job)
+        
+        # Read a prefetched local copy when there is one
+        source_file = input_file
+        if self.stager:
+            with metrics.stage('stage'):
+                source_file = self.stager.input_for(input_file)
+        
+        # Predict the output size; skip files that would barely shrink
+        prediction = None
+        if self.min_saving is not None:
+            with metrics.stage('predict'):
+                prediction = SizePredictor.predict(
+                    source_file, metadata, threads=job.get('threads'), throttle=self.throttle
+                )
+            if prediction:
+                SizePredictor.log_prediction(os.path.basename(input_file), prediction)
+                job['predicted_size'] = prediction['predicted_size']
+                if prediction['saving_percent'] < self.min_saving:
+                    logger.warning(
+                        f"⏭️  {MESSAGES['not_worth_it']} "
+                        f"(کاهش پیش‌بینی شده {prediction['saving_percent']:.1f}% < {self.min_saving:g}%)"
+                    )
+                    job['status'] = 'skipped'
+                    job['error'] = MESSAGES['not_worth_it']
+                    return False
+        
         # Convert
-        converter = Converter(input_file, output_file, metadata)
-        success = converter.convert()
+        duration = metadata.get('duration', 0)
+        segments = resolve_segments(self.segments, duration)
+        pieces = max(segments, checkpoint_count(duration)) if self.resumable else segments
+        
+        # Several renditions share one decode in a single FFmpeg run
+        renditions = select_renditions(self.renditions, metadata) if self.renditions else []
+        if len(renditions) > 1 and pieces > 1:
+            logger.warning("تبدیل چند کیفیتی با --segments یا --resumable ممکن نیست؛ فقط یک کیفیت ساخته می‌شود")
+            renditions = []
+        if len(renditions) < 2:
+            renditions = [None]
+        
+        # Encode into scratch; segment pieces need about the same space again
+        estimated_size = job.get('predicted_size') or os.path.getsize(input_file)
+        if pieces > 1:
+            estimated_size *= 2
+        outputs = []
+        for i, label in enumerate(renditions):
+            final_output = rendition_path(output_file, label, primary=(i == 0))
+            outputs.append({
+                'label': label,
+                'output_file': final_output,
+                'work_output': self.stager.output_for(final_output, estimated_size)
+                               if self.stager else final_output
+            })
+        job['outputs'] = outputs
+        
+        # Reserve the estimated output size on each filesystem written to;
+        # wait for running jobs, or fail now rather than at the end
+        guard = get_disk_guard()
+        if guard is not None:
+            sizes = estimate_output_sizes(
+                input_file, metadata, renditions, job.get('predicted_size')
+            )
+            if pieces > 1:
+                sizes = [size * 2 for size in sizes]
+            job['reservation'] = guard.admit(
+                [(size, {o['work_output'], o['output_file']}) for size, o in zip(sizes, outputs)],
+                os.path.basename(input_file)
+            )
+            if job['reservation'] is None:
+                job['error'] = MESSAGES['disk_full']
+                return False
+        
+        # Output folders are created only now that something is written
+        for output in outputs:
+            os.makedirs(os.path.dirname(os.path.abspath(output['work_output'])), exist_ok=True)
+        
+        if len(outputs) > 1:
+            logger.info(f"🎞️  {len(outputs)} کیفیت با یک بار رمزگشایی: {', '.join(renditions)}")
+            converter = RenditionConverter(
+                source_file, [(o['label'], o['work_output']) for o in outputs], metadata,
+                threads=job.get('threads'),
+                display=job.get('display'),
+                slot=job.get('slot', 0),
+                progress_format=self.progress_format
+            )
+        elif pieces > 1:
+            converter = SegmentedConverter(
+                source_file, outputs[0]['work_output'], metadata,
+                segments=pieces,
+                workers=segments,
+                resumable=self.resumable,
+                threads=job.get('threads'),
+                display=job.get('display'),
+                slot=job.get('slot', 0),
+                progress_format=self.progress_format
+            )
+        else:
+            converter = JobConverter(
+                source_file, outputs[0]['work_output'], metadata,
+                threads=job.get('threads'),
+                display=job.get('display'),
+                slot=job.get('slot', 0),
+                progress_format=self.progress_format
+            )
+        job['converter'] = converter
+        # A job given up meanwhile (a lost queue lease) is not encoded; set
+        # after job['converter'], so a later abort stops the converter instead
+        if job.get('abort') is not None and job['abort'].is_set():
+            logger.warning(f"⛔ {MESSAGES['interrupted']}")
+            job['error'] = MESSAGES['interrupted']
+            return False
+        if job.get('reservation'):
+            guard.watch(job['reservation'], converter)
+        if self.throttle:
+            self.throttle.register(converter)
+        try:
+            with metrics.stage('encode'):
+                success = converter.convert()
+        finally:
+            if self.throttle:
+                self.throttle.unregister(converter)
+        job['elapsed'] = converter.elapsed
+        
+        encode_seconds = metrics.stages.get('encode', 0.0)
+        metrics.set(
+            duration=duration,
+            fps=round(converter.frames / encode_seconds if converter.frames else converter.fps, 2),
+            speed=round(duration / encode_seconds, 3) if encode_seconds else 0.0
+        )
         
         if not success:
             logger.error(f"✗ تبدیل ناموفق بود")
+            job['error'] = MESSAGES['conversion_failed']
+            if disk_full(job.get('reservation'), converter):
+                job['error'] = MESSAGES['disk_full']
             return False
         
-        # Verify output
+        # Verify every output
         if self.verify:
             logger.info("بررسی فایل خروجی...")
             expected_duration = metadata.get('duration')
             input_size = os.path.getsize(input_file)
-            verified = Verifier.verify_output(output_file, expected_duration, input_size)
+            verify_time = 0.0
+            for output in outputs:
+                verified, seconds = DecodeVerifier.verify_output(
+                    output['work_output'], expected_duration, input_size, mode=self.verify_mode
+                )
+                verify_time += seconds
+                if not verified:
+                    break
+            job['verify_time'] = verify_time
+            metrics.add_stage('verify', verify_time)
+            self.verify_times.append(verify_time)
             
             if not verified:
                 logger.error(f"✗ فایل خروجی معتبر نیست")
+                job['error'] = MESSAGES['verification_failed']
+                return False
+        
+        # Move the verified outputs from scratch into the library
+        if self.stager:
+            try:
+                with metrics.stage('publish'):
+                    for output in outputs:
+                        self.stager.publish(output['work_output'], output['output_file'])
+            except OSError as e:
+                logger.error(f"✗ انتقال خروجی به مقصد ناموفق بود: {str(e)}")
+                job['error'] = MESSAGES['conversion_failed']
                 return False
         
         # Display file sizes
@@ -98,58 +407,268 @@ class VideoConverter:
         logger.info(f"حجم ورودی: {format_size(input_size)}")
         logger.info(f"حجم خروجی: {format_size(output_size)}")
         logger.info(f"فشرده‌سازی: {compression_ratio:.1f}%")
+        for output in outputs[1:]:
+            logger.info(f"حجم خروجی {output['label']}: {format_size(os.path.getsize(output['output_file']))}")
+        if prediction:
+            self.prediction_errors.append(SizePredictor.log_accuracy(prediction, output_size))
         logger.info(f"{'='*60}\n")
         
+        if fingerprint:
+            index.record(
+                fingerprint, input_file, [(o['label'], o['output_file']) for o in outputs]
+            )
+        
+        # Speed and bitrate feed --plan estimates; only a single whole-file
+        # encode times one output
+        history = get_encode_history()
+        if history is not None:
+            timed = len(outputs) == 1 and pieces == 1
+            for output in outputs:
+                label, preset = output_profile(metadata, output['label'])
+                history.record(
+                    metadata.get('quality'), label, preset, duration,
+                    output_bytes=os.path.getsize(output['output_file']),
+                    encode_seconds=encode_seconds if timed else None,
+                    frames=converter.frames
+                )
+        
+        job.update({
+            'status': 'completed',
+            'input_size': input_size,
+            'output_size': output_size
+        })
         return True
     
-    def convert_batch(self, input_files, check_resources=True):
+    def _handle_duplicate(self, input_file, output_file, earlier, job):
         """
-        Convert multiple video files
-        تبدیل چندین فایل ویدیو
+        Skip a duplicate, or hard-link the outputs of its earlier copy
+        رد فایل تکراری یا لینک سخت به خروجی‌های نسخه قبلی
+        """
+        original, outputs = earlier
+        logger.info(f"♊ {MESSAGES['duplicate']} ({original})")
+        duplicate = {'file': input_file, 'original': original, 'action': 'skip'}
+        self.duplicates.append(duplicate)
+        
+        if self.duplicate_action == 'link':
+            targets = [
+                rendition_path(output_file, label, primary=(i == 0))
+                for i, (label, _) in enumerate(outputs)
+            ]
+            if link_outputs(outputs, targets):
+                logger.info(f"🔗 لینک سخت به خروجی قبلی: {output_file}")
+                duplicate['action'] = 'link'
+                job.update({'status': 'completed', 'duplicate_of': original})
+                return True
+        
+        job.update({
+            'status': 'skipped',
+            'error': MESSAGES['duplicate'],
+            'duplicate_of': original
+        })
+        return False
+    
+    def _resolve_batch_duplicates(self):
+        """
+        Handle copies held back because the same content was queued
+        earlier in the batch, now that the first copy has finished
+        رسیدگی به فایل‌های تکراری همین دسته پس از پایان تبدیل نسخه اول
         
         Returns:
-            dict with statistics
+            scheduler entries to convert because their first copy failed;
+            one per content, the other copies wait for it in turn
         """
-        total_files = len(input_files)
-        logger.info(f"\n{'='*60}")
-        logger.info(f"پردازش دسته‌ای: {total_files} فایل")
-        logger.info(f"{'='*60}\n")
+        index = get_fingerprint_index()
+        retry = {}
+        for duplicate in self.duplicates:
+            if duplicate['action'] != 'batch':
+                continue
+            
+            earlier = index.lookup(duplicate['fingerprint']) if index else None
+            if earlier is None:
+                first = retry.get(duplicate['fingerprint'])
+                if first is None:
+                    logger.warning(
+                        f"⚠️  {os.path.basename(duplicate['file'])}: نسخه اول "
+                        f"({os.path.basename(duplicate['original'])}) تبدیل نشد؛ این نسخه تبدیل می‌شود"
+                    )
+                    retry[duplicate['fingerprint']] = duplicate
+                else:
+                    duplicate['original'] = first['file']
+                continue
+            
+            duplicate.pop('entry', None)
+            duplicate['action'] = 'skip'
+            if self.duplicate_action == 'link':
+                output_file = Categorizer.categorize_file(duplicate['file'], self.output_dir)['output_file']
+                targets = [
+                    rendition_path(output_file, label, primary=(i == 0))
+                    for i, (label, _) in enumerate(earlier[1])
+                ]
+                if link_outputs(earlier[1], targets):
+                    duplicate['action'] = 'link'
         
-        # Log system stats
-        if check_resources:
-            ResourceManager.log_system_stats()
+        for duplicate in retry.values():
+            self.duplicates.remove(duplicate)
+        return [duplicate['entry'] for duplicate in retry.values()]
+    
+    def _convert_queue(self, scheduler, batch_progress, check_resources):
+        """
+        Convert the files of scheduler until it is empty
         
-        # Initialize batch progress tracker
-        batch_progress = BatchProgressTracker(total_files)
+        Returns:
+            per-job results of the job pool, or None when converting one
+            file at a time
+        """
+        if self.jobs > 1:
+            # Run several converters at once, each with a share of the threads
+            pool = JobPool(self, self.jobs, check_resources=check_resources)
+            return pool.run(scheduler, batch_progress)
         
         # Convert each file
-        for input_file in input_files:
+        while True:
+            entry = scheduler.pop()
+            if entry is None:
+                break
+            self.prefetch_next(scheduler)
+            job = {
+                'queue_wait': time.time() - entry['queued_at'],
+                'probe_seconds': entry.get('probe_seconds'),
+                'fingerprint': entry.get('fingerprint')
+            }
+            
             # Check system resources before each conversion
+            wait_start = time.time()
             if check_resources and ResourceManager.is_system_overloaded():
                 logger.warning("سیستم تحت فشار است. منتظر می‌مانیم...")
                 ResourceManager.wait_for_resources()
+            job['resource_wait'] = time.time() - wait_start
             
             # Convert file
-            success = self.convert_single_file(input_file)
+            success = self.convert_single_file(entry['file'], job=job, metadata=entry['metadata'])
             
             # Update batch progress
             if success:
                 batch_progress.update('completed')
+            elif job['status'] == 'skipped':
+                batch_progress.update('skipped')
             else:
                 batch_progress.update('failed')
+        return None
+    
+    def convert_batch(self, input_files, check_resources=True):
+        """
+        Convert multiple video files
+        تبدیل چندین فایل ویدیو
+        
+        Args:
+            input_files: list or generator of paths; a generator that is
+                         still scanning the library is consumed in the
+                         background while the first files convert
+        
+        Returns:
+            dict with statistics
+        """
+        self.verify_times = []
+        self.prediction_errors = []
+        logger.info(f"\n{'='*60}")
+        logger.info(f"پردازش دسته‌ای")
+        logger.info(f"{'='*60}\n")
+        
+        # Log system stats
+        if check_resources:
+            ResourceManager.log_system_stats()
+        
+        # Probe files as they are found and queue convertible ones in the
+        # order the scheduling policy picks; encoding starts with the first
+        batch_progress = StreamingBatchProgress()
+        scheduler = JobScheduler(self.schedule)
+        scheduler.start_feed()
+        
+        self.duplicates = []
+        track_duplicates = get_fingerprint_index() is not None and self.duplicate_action != 'off'
+        
+        def feed():
+            PreScanner().feed(
+                input_files, scheduler, batch_progress,
+                duplicates=self.duplicates if track_duplicates else None
+            )
+            log_scan_index_stats()
+            if len(scheduler):
+                scheduler.log_queue()
+        
+        threading.Thread(target=feed, name='prescan', daemon=True).start()
+        
+        results = self._convert_queue(scheduler, batch_progress, check_resources)
+        
+        # Copies held back for a first copy that failed are converted
+        # themselves, in another round
+        retry = self._resolve_batch_duplicates()
+        while retry:
+            scheduler = JobScheduler(self.schedule)
+            scheduler.start_feed()
+            for entry in retry:
+                batch_progress.reopen()
+                scheduler.push(entry)
+            scheduler.end_feed()
+            more = self._convert_queue(scheduler, batch_progress, check_resources)
+            if results is not None:
+                results.extend(more)
+            retry = self._resolve_batch_duplicates()
         
         # Close batch progress
         batch_progress.close()
         
         # Display summary
         summary = batch_progress.get_summary()
+        if results is not None:
+            summary['jobs'] = results
+            for result in results:
+                status = {'completed': '✓', 'skipped': '⏭️'}.get(result['status'], '✗')
+                elapsed = format_time(result.get('elapsed'))
+                logger.info(
+                    f"  {status} {os.path.basename(result['file'])} "
+                    f"({result.get('threads', '?')} threads, {elapsed})"
+                )
         logger.info(f"\n{'='*60}")
         logger.info(f"خلاصه پردازش دسته‌ای:")
         logger.info(f"  مجموع: {summary['total']}")
         logger.info(f"  موفق: {summary['completed']}")
         logger.info(f"  ناموفق: {summary['failed']}")
         logger.info(f"  رد شده: {summary['skipped']}")
+        summary['duplicates'] = self.duplicates
+        if self.duplicates:
+            labels = {'skip': 'رد شد', 'link': 'لینک سخت'}
+            logger.info(f"  تکراری: {len(self.duplicates)}")
+            for duplicate in self.duplicates:
+                logger.info(
+                    f"    ♊ {os.path.basename(duplicate['file'])} = "
+                    f"{os.path.basename(duplicate['original'])} ({labels[duplicate['action']]})"
+                )
+        if self.prediction_errors:
+            mean_error = sum(abs(e) for e in self.prediction_errors) / len(self.prediction_errors)
+            logger.info(
+                f"  دقت پیش‌بینی حجم: میانگین خطا {mean_error:.1f}% "
+                f"({len(self.prediction_errors)} فایل)"
+            )
+        if self.verify_times:
+            total_verify = sum(self.verify_times)
+            logger.info(
+                f"  بررسی خروجی ({self.verify_mode}): {len(self.verify_times)} فایل، "
+                f"{format_time(total_verify)} "
+                f"(میانگین {format_time(total_verify / len(self.verify_times))})"
+            )
         logger.info(f"{'='*60}\n")
+        log_probe_cache_stats()
+        
+        if self.progress_format == 'jsonl':
+            emit_event({
+                'event': 'batch',
+                'total': summary['total'],
+                'completed': summary['completed'],
+                'failed': summary['failed'],
+                'skipped': summary['skipped'],
+                'duplicates': len(self.duplicates)
+            })
         
         return summary
 
@@ -158,39 +677,224 @@ def collect_video_files(paths):
     """
     Collect all video files from given paths
     جمع‌آوری تمام فایل‌های ویدیویی از مسیرهای داده شده
+    
+    Unchanged directories are not listed again when the scan index is
+    enabled. Use scan_video_files to process files while scanning.
+    """
+    return list(scan_video_files(paths, get_scan_index()))
+
+
+def run_coordinator(args, video_files):
+    """
+    Add inputs to the shared queue and optionally serve it over TCP
+    افزودن ورودی‌ها به صف مشترک و در صورت نیاز ارائه آن از طریق TCP
+    """
+    queue = open_queue(args.queue)
+    try:
+        if video_files:
+            plan = PreScanner().scan(video_files)
+            PreScanner.log_plan(plan)
+            enqueue_files(queue, [e for e in plan if e['action'] == 'convert'], args.schedule)
+        
+        counts = queue.counts()
+        logger.info(
+            "📋 وضعیت صف: " + "، ".join(f"{state}: {count}" for state, count in sorted(counts.items()))
+        )
+        
+        if args.serve_queue:
+            host, port = parse_listen_address(args.serve_queue)
+            QueueServer(queue, host, port).serve()
+    finally:
+        queue.close()
+    return 0
+
+
+def run_plan(args, jobs, renditions):
+    """
+    Report what a run would do, without creating folders or encoding
+    نمایش برنامه تبدیل بدون ایجاد پوشه یا اجرای تبدیل
+    """
+    # stdout carries only the JSON document
+    if args.plan_format == 'json':
+        logger.disable_console()
+    
+    # Caches and history of earlier runs are read, never created or changed
+    def existing(name):
+        return os.path.exists(os.path.join(args.output, name))
+    
+    if not args.no_probe_cache and existing(PROBE_CACHE_FILE):
+        enable_probe_cache(args.output, read_only=True)
+    if not args.no_scan_index and existing(SCAN_INDEX_FILE):
+        enable_scan_index(args.output, read_only=True)
+    if args.duplicates != 'off' and existing(FINGERPRINT_FILE):
+        enable_fingerprint_index(args.output, read_only=True)
+    if existing(ENCODE_HISTORY_FILE):
+        enable_encode_history(args.output, read_only=True)
+    
+    logger.info("جستجوی فایل‌های ویدیویی...")
+    planner = BatchPlanner(
+        args.output, jobs=jobs, renditions=renditions, duplicates=args.duplicates
+    )
+    plan = planner.plan(scan_video_files(args.input, get_scan_index()))
+    if not plan:
+        logger.error("هیچ فایل ویدیویی یافت نشد!")
+        return 1
+    
+    planner.report(plan, args.plan_format)
+    return 0
+
+
+def requested_settings(args, parser, jobs, renditions):
+    """
+    Conversion options given on the command line, keyed like
+    VideoConverter.settings(); options left at their defaults are omitted
+    """
+    options = [
+        (('no_verify',), 'verify', not args.no_verify),
+        (('verify',), 'verify_mode', args.verify),
+        (('min_saving',), 'min_saving', args.min_saving),
+        (('segments',), 'segments', str(args.segments)),
+        (('resumable',), 'resumable', args.resumable),
+        (('renditions',), 'renditions', renditions),
+        (('scratch',), 'scratch', os.path.abspath(args.scratch) if args.scratch else None),
+        (('duplicates',), 'duplicates', args.duplicates),
+        (('jobs',), 'jobs', jobs),
+        (('schedule',), 'schedule', args.schedule)
+    ]
+    return {
+        key: value for dests, key, value in options
+        if any(getattr(args, dest) != parser.get_default(dest) for dest in dests)
+    }
+
+
+def daemon_conflicts(client, requested):
+    """Requested options the daemon would not apply ({option: (requested, daemon's)})"""
+    settings = client.settings()
+    return {
+        key: (value, settings.get(key)) for key, value in requested.items()
+        if settings.get(key) != value
+    }
+
+
+def run_daemon_client(client, args):
+    """
+    Submit the inputs to a running daemon and follow them until done
+    ارسال ورودی‌ها به سرویس در حال اجرا و پیگیری آن‌ها تا پایان
+    
+    With --progress-format jsonl the same start, progress, end and batch
+    events as a local run are written to stdout.
+    """
+    events = args.progress_format == 'jsonl'
+    batch_id = client.submit(args.input, priority=args.priority)['batch']
+    logger.info(f"🛰️  ورودی‌ها به سرویس تبدیل ارسال شد ({client.address})، دسته {batch_id}")
+
+    started = set()
+    reported = set()
+    counts = {'completed': 0, 'skipped': 0, 'failed': 0, 'cancelled': 0}
+    try:
+        while True:
+            batch = client.batch(batch_id)
+            live = {}
+            if events and any(r['state'] == 'running' for r in batch['jobs']):
+                live = {r.get('id'): r for r in client.list()['running']}
+            
+            for record in batch['jobs']:
+                name = os.path.basename(record['file'])
+                if events and record['state'] != 'queued' and record['id'] not in started:
+                    started.add(record['id'])
+                    emit_event({'event': 'start', 'file': name, 'job': record['id']})
+                if events and record['id'] in live:
+                    running = live[record['id']]
+                    emit_event({
+                        'event': 'progress',
+                        'file': name,
+                        'fps': running.get('fps', 0.0),
+                        'percent': running.get('percent', 0.0),
+                        'eta': running.get('eta', 0)
+                    })
+                
+                if record['id'] in reported or record['state'] not in counts:
+                    continue
+                reported.add(record['id'])
+                counts[record['state']] += 1
+                result = record.get('result') or {}
+                error = result.get('error')
+                if events:
+                    emit_event({
+                        'event': 'end',
+                        'file': name,
+                        'status': record['state'],
+                        'error': error,
+                        'elapsed': result.get('elapsed')
+                    })
+                status = {'completed': '✓', 'skipped': '⏭️'}.get(record['state'], '✗')
+                logger.info(f"  {status} {name}" + (f" - {error}" if error else ""))
+            if not batch['scanning'] and len(reported) == len(batch['jobs']):
+                break
+            time.sleep(DAEMON_POLL_SECONDS)
+    except KeyboardInterrupt:
+        logger.warning("پیگیری متوقف شد؛ کارها در سرویس ادامه دارند (--status، --cancel)")
+        return 130
+
+    if not reported:
+        logger.error("هیچ فایل ویدیویی یافت نشد!")
+        return 1
+    logger.info(
+        f"📊 موفق: {counts['completed']}، رد شده: {counts['skipped']}، "
+        f"ناموفق: {counts['failed']}، لغو شده: {counts['cancelled']}"
+    )
+    if events:
+        emit_event({
+            'event': 'batch',
+            'total': len(reported),
+            'completed': counts['completed'],
+            'failed': counts['failed'] + counts['cancelled'],
+            'skipped': counts['skipped']
+        })
+    return 0 if counts['failed'] == 0 and counts['cancelled'] == 0 else 1
+
+
+def run_daemon_control(client, args):
+    """
+    Run --status, --cancel, --set-priority or --shutdown-daemon
+    اجرای دستورهای کنترل سرویس تبدیل
     """
-    from config import SUPPORTED_FORMATS
-    
-    video_files = []
-    
-    for path in paths:
-        # Expand wildcards
-        expanded_paths = glob.glob(path)
-        
-        for expanded_path in expanded_paths:
-            if os.path.isfile(expanded_path):
-                # Check if it's a video file
-                _, ext = os.path.splitext(expanded_path)
-                if ext.lower() in SUPPORTED_FORMATS:
-                    video_files.append(os.path.abspath(expanded_path))
-                    
-            elif os.path.isdir(expanded_path):
-                # Recursively find video files in directory
-                for root, dirs, files in os.walk(expanded_path):
-                    # Exclude directories starting with _ (like _processed, _failed)
-                    # and output directory
-                    dirs[:] = [d for d in dirs if not d.startswith('_') and d != 'output']
-                    
-                    for file in files:
-                        _, ext = os.path.splitext(file)
-                        if ext.lower() in SUPPORTED_FORMATS:
-                            full_path = os.path.join(root, file)
-                            video_files.append(os.path.abspath(full_path))
-    
-    # Remove duplicates
-    video_files = list(set(video_files))
-    
-    return video_files
+    if args.cancel:
+        if not client.cancel(args.cancel):
+            logger.error(f"کار {args.cancel} در صف یا در حال اجرا نیست")
+            return 1
+        logger.info(f"⛔ کار {args.cancel} لغو شد")
+    elif args.set_priority:
+        job, priority = args.set_priority
+        if not client.reprioritize(job, int(priority)):
+            logger.error(f"کار {job} در صف نیست")
+            return 1
+        logger.info(f"اولویت کار {job} به {priority} تغییر کرد")
+    elif args.shutdown_daemon:
+        client.shutdown()
+        logger.info("🛑 سرویس تبدیل پس از پایان کارهای در حال اجرا متوقف می‌شود")
+    else:
+        status = client.list()
+        logger.info(
+            f"🛰️  سرویس تبدیل ({client.address})، فعال از {format_time(status['uptime'])}: "
+            f"{len(status['running'])} در حال اجرا، {len(status['queued'])} در صف، "
+            f"{status['finished']} پایان یافته"
+        )
+        for record in status['running']:
+            logger.info(
+                f"  ▶ {record.get('id', '-')} {os.path.basename(record['file'])} "
+                f"{record.get('percent', 0):.1f}% ⚡ {record.get('fps', 0):.1f}fps "
+                f"⏳ {format_time(record.get('eta', 0))}"
+            )
+        for record in status['queued']:
+            logger.info(
+                f"  ⏸ {record.get('id', '-')} {os.path.basename(record['file'])} "
+                f"(اولویت {record.get('priority', 0)}، هزینه {format_time(record['cost'])})"
+            )
+        for record in client.results(limit=10):
+            mark = {'completed': '✓', 'skipped': '⏭️'}.get(record['state'], '✗')
+            logger.info(f"  {mark} {record['id']} {os.path.basename(record['file'])}")
+    return 0
 
 
 def main():
@@ -209,12 +913,23 @@ def main():
   %(prog)s /path/to/videos/                  # تبدیل تمام فایل‌های یک پوشه
   %(prog)s *.mp4 --output custom_output      # تبدیل با پوشه خروجی سفارشی
   %(prog)s video.mp4 --no-verify             # تبدیل بدون بررسی خروجی
+  %(prog)s video.mp4 --verify sampled        # بررسی خروجی با رمزگشایی نمونه‌ای
+  %(prog)s /path/to/videos/ --jobs auto      # تبدیل هم‌زمان چند فایل
+  %(prog)s movie.mkv --segments auto         # تبدیل موازی یک فایل طولانی
+  %(prog)s movie.mkv --renditions 1080p,720p # دو کیفیت با یک بار رمزگشایی
+  %(prog)s /nas/videos/ --scratch /mnt/ssd   # تبدیل روی دیسک محلی و انتقال خروجی
+  %(prog)s /library/ --plan --jobs 4         # برنامه و زمان تخمینی بدون تبدیل
+  %(prog)s /library/ --queue /nas/queue.sqlite   # افزودن فایل‌ها به صف مشترک
+  %(prog)s --queue /nas/queue.sqlite --worker    # دریافت و تبدیل کار از صف
+  %(prog)s --daemon --jobs auto              # اجرای سرویس تبدیل ماندگار
+  %(prog)s /new/videos/ --priority 2         # ارسال به سرویس با اولویت بالاتر
+  %(prog)s --status                          # وضعیت صف سرویس
         """
     )
     
     parser.add_argument(
         'input',
-        nargs='+',
+        nargs='*',
         help='فایل(‌ها) یا پوشه(‌ها) ورودی'
     )
     
@@ -230,12 +945,219 @@ def main():
         help='بدون بررسی فایل‌های خروجی'
     )
     
+    parser.add_argument(
+        '--verify',
+        choices=VERIFY_MODES,
+        default=VERIFY_MODE,
+        help='نوع بررسی خروجی: basic (اطلاعات فایل)، sampled (رمزگشایی نمونه‌ای)، full (رمزگشایی کامل)'
+    )
+    
+    parser.add_argument(
+        '--min-saving',
+        type=float,
+        default=PREDICT_MIN_SAVING_PERCENT,
+        metavar='PERCENT',
+        help='پیش‌بینی حجم با تبدیل نمونه‌ها و رد فایل‌هایی که کمتر از این درصد کوچک می‌شوند (پیش‌فرض: خاموش)'
+    )
+    
     parser.add_argument(
         '--no-resource-check',
         action='store_true',
         help='بدون بررسی منابع سیستم'
     )
     
+    parser.add_argument(
+        '--no-probe-cache',
+        action='store_true',
+        help='بدون کش اطلاعات ffprobe'
+    )
+    
+    parser.add_argument(
+        '--no-scan-index',
+        action='store_true',
+        help='خواندن دوباره همه پوشه‌ها بدون استفاده از فهرست پوشه‌های بدون تغییر'
+    )
+    
+    parser.add_argument(
+        '-j', '--jobs',
+        default='1',
+        help='تعداد تبدیل هم‌زمان، عدد یا auto (پیش‌فرض: 1)'
+    )
+    
+    parser.add_argument(
+        '--segments',
+        default='1',
+        help='تقسیم هر فایل طولانی به چند قطعه برای تبدیل موازی، عدد یا auto (پیش‌فرض: 1)'
+    )
+    
+    parser.add_argument(
+        '--resumable',
+        action='store_true',
+        help='تبدیل در قطعه‌های نقطه بازیابی تا پس از خطا یا توقف از همان‌جا ادامه یابد'
+    )
+    
+    parser.add_argument(
+        '--no-throttle',
+        action='store_true',
+        help='عدم کاهش سرعت تبدیل‌ها هنگام نیاز سایر برنامه‌ها به منابع'
+    )
+    
+    parser.add_argument(
+        '--schedule',
+        choices=SCHEDULER_POLICIES,
+        default=SCHEDULER_POLICY,
+        help=f'ترتیب تبدیل فایل‌ها: fifo، sjf (کوتاه‌ترین اول)، oldest (قدیمی‌ترین اول)، category (بر اساس نوع) (پیش‌فرض: {SCHEDULER_POLICY})'
+    )
+    
+    parser.add_argument(
+        '--queue',
+        metavar='PATH|tcp://HOST:PORT',
+        help='صف کار مشترک بین چند دستگاه؛ بدون --worker ورودی‌ها به صف اضافه می‌شوند'
+    )
+    
+    parser.add_argument(
+        '--worker',
+        action='store_true',
+        help='دریافت کار از --queue و تبدیل آن‌ها'
+    )
+    
+    parser.add_argument(
+        '--drain',
+        action='store_true',
+        help='پایان کار کارگر وقتی صف خالی شد (به جای انتظار برای کار جدید)'
+    )
+    
+    parser.add_argument(
+        '--serve-queue',
+        metavar='[HOST:]PORT',
+        help='ارائه صف --queue (فایل SQLite) به کارگرها از طریق TCP'
+    )
+    
+    parser.add_argument(
+        '--plan',
+        action='store_true',
+        help='فقط نمایش تصمیم، مسیر خروجی، زمان و حجم تخمینی هر فایل بدون تبدیل یا ایجاد پوشه'
+    )
+    
+    parser.add_argument(
+        '--plan-format',
+        choices=PLAN_FORMATS,
+        default='text',
+        help='قالب خروجی --plan: text یا json (یک سند JSON در stdout)'
+    )
+    
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='اجرای سرویس ماندگار تبدیل؛ اجراهای بعدی برنامه فایل‌ها را به آن ارسال می‌کنند'
+    )
+    
+    parser.add_argument(
+        '--daemon-address',
+        metavar='SOCKET|tcp://HOST:PORT',
+        help='نشانی رابط کنترل سرویس (پیش‌فرض: .daemon.sock در پوشه خروجی)'
+    )
+    
+    parser.add_argument(
+        '--no-daemon',
+        action='store_true',
+        help='تبدیل در همین برنامه حتی اگر سرویس تبدیل در حال اجرا باشد'
+    )
+    
+    parser.add_argument(
+        '--priority',
+        type=int,
+        default=0,
+        metavar='N',
+        help='اولویت فایل‌های ارسالی به سرویس؛ عدد بزرگ‌تر زودتر تبدیل می‌شود (پیش‌فرض: 0)'
+    )
+    
+    parser.add_argument(
+        '--status',
+        action='store_true',
+        help='نمایش کارهای در صف و در حال اجرای سرویس'
+    )
+    
+    parser.add_argument(
+        '--cancel',
+        metavar='JOB',
+        help='لغو یک کار سرویس (شناسه کار یا مسیر فایل)'
+    )
+    
+    parser.add_argument(
+        '--set-priority',
+        nargs=2,
+        metavar=('JOB', 'N'),
+        help='تغییر اولویت یک کار در صف سرویس'
+    )
+    
+    parser.add_argument(
+        '--shutdown-daemon',
+        action='store_true',
+        help='توقف سرویس پس از پایان کارهای در حال اجرا'
+    )
+    
+    parser.add_argument(
+        '--duplicates',
+        choices=DUPLICATE_ACTIONS,
+        default=DUPLICATE_ACTION,
+        help=f'فایل‌هایی که محتوای آن‌ها قبلاً تبدیل شده: skip (رد)، link (لینک سخت به خروجی قبلی)، off (تبدیل دوباره) (پیش‌فرض: {DUPLICATE_ACTION})'
+    )
+    
+    parser.add_argument(
+        '--renditions',
+        metavar='LIST',
+        help='ساخت چند کیفیت از یک بار رمزگشایی، مثلاً 1080p,720p (کیفیت‌های بزرگ‌تر از ورودی ساخته نمی‌شوند)'
+    )
+    
+    parser.add_argument(
+        '--scratch',
+        metavar='DIR',
+        help='پوشه موقت روی دیسک محلی سریع برای پیش‌خوانی ورودی‌ها و نوشتن خروجی پیش از انتقال به مقصد'
+    )
+    
+    parser.add_argument(
+        '--scratch-budget',
+        type=float,
+        default=STAGING_BUDGET_GB,
+        metavar='GB',
+        help=f'حداکثر فضای قابل استفاده در پوشه موقت (پیش‌فرض: {STAGING_BUDGET_GB} GB)'
+    )
+    
+    parser.add_argument(
+        '--min-free-disk',
+        type=float,
+        default=DISK_MIN_FREE_GB,
+        metavar='GB',
+        help=f'فضای آزادی که هر تبدیل جدید باید روی دیسک خروجی و پوشه موقت باقی بگذارد (پیش‌فرض: {DISK_MIN_FREE_GB} GB)'
+    )
+    
+    parser.add_argument(
+        '--progress-format',
+        choices=['bar', 'jsonl'],
+        default='bar',
+        help='نمایش پیشرفت: bar (نوار در ترمینال) یا jsonl (رویدادهای JSON در stdout)'
+    )
+    
+    parser.add_argument(
+        '--metrics',
+        metavar='PATH',
+        help='ثبت زمان مراحل و معیارهای هر فایل (JSONL، یا متن Prometheus اگر با .prom تمام شود)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        metavar='PATH',
+        help='اجرای برنامه زیر cProfile و ذخیره نتایج (فقط رشته اصلی؛ برای دید کامل با -j 1)'
+    )
+    
+    parser.add_argument(
+        '--log-format',
+        choices=LOG_FORMATS,
+        default='text',
+        help='قالب لاگ اصلی: text (logs/conversion.log) یا jsonl با شناسه هر کار (logs/conversion.jsonl)'
+    )
+    
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
@@ -244,19 +1166,71 @@ def main():
     
     args = parser.parse_args()
     
-    # Set logger level
-    if args.verbose:
-        logger.logger.setLevel(logger.logger.DEBUG)
+    if (args.worker or args.drain or args.serve_queue) and not args.queue:
+        parser.error("--worker، --drain و --serve-queue نیاز به --queue دارند")
+    if args.serve_queue and (args.worker or args.queue.startswith('tcp://')):
+        parser.error("--serve-queue فقط با یک فایل صف و بدون --worker کار می‌کند")
+    control = args.status or args.cancel or args.set_priority or args.shutdown_daemon
+    if args.plan and (args.daemon or args.queue or args.worker or control):
+        parser.error("--plan با --daemon، --queue، --worker و دستورهای کنترل سرویس سازگار نیست")
+    if args.daemon and (args.queue or args.no_daemon or control):
+        parser.error("--daemon با --queue، --no-daemon و دستورهای کنترل سرویس سازگار نیست")
+    if args.set_priority and not args.set_priority[1].lstrip('-').isdigit():
+        parser.error(f"مقدار نامعتبر برای --set-priority: {args.set_priority[1]}")
+    if not args.input and not (args.worker or args.serve_queue or args.daemon or control):
+        parser.error("هیچ فایل یا پوشه ورودی مشخص نشده است")
     
-    # Collect video files
-    logger.info("جمع‌آوری فایل‌های ویدیویی...")
-    video_files = collect_video_files(args.input)
+    try:
+        jobs = resolve_jobs(args.jobs)
+    except ValueError:
+        parser.error(f"مقدار نامعتبر برای --jobs: {args.jobs}")
     
-    if not video_files:
-        logger.error("هیچ فایل ویدیویی یافت نشد!")
-        return 1
+    try:
+        resolve_segments(args.segments, 0)
+    except ValueError:
+        parser.error(f"مقدار نامعتبر برای --segments: {args.segments}")
     
-    logger.info(f"{len(video_files)} فایل ویدیویی یافت شد")
+    try:
+        renditions = parse_renditions(args.renditions) if args.renditions else None
+    except ValueError:
+        parser.error(f"مقدار نامعتبر برای --renditions: {args.renditions}")
+    
+    # Log files are written by a background thread and rotated
+    configure_logging(log_format=args.log_format, verbose=args.verbose)
+    
+    # stdout carries only JSON events; logs still go to logs/
+    if args.progress_format == 'jsonl':
+        logger.disable_console()
+    
+    # A running daemon converts with its warm caches and its own settings;
+    # this process only submits and reports
+    daemon_address = args.daemon_address or default_address(args.output)
+    if control or not (args.daemon or args.no_daemon or args.queue or args.worker or args.plan):
+        client = connect_daemon(daemon_address)
+        if control:
+            if client is None:
+                logger.error(f"سرویس تبدیل روی {daemon_address} در حال اجرا نیست")
+                return 1
+            return run_daemon_control(client, args)
+        if client is not None:
+            # The daemon converts with its own settings; options it would
+            # not honour mean this run converts locally
+            conflicts = daemon_conflicts(client, requested_settings(args, parser, jobs, renditions))
+            if not conflicts:
+                return run_daemon_client(client, args)
+            logger.warning(
+                "⚠️  تنظیمات سرویس تبدیل با گزینه‌های این اجرا فرق دارد؛ تبدیل در همین برنامه: "
+                + "، ".join(f"{key}={mine} (سرویس: {theirs})" for key, (mine, theirs) in conflicts.items())
+            )
+    
+    # Categorizer only computes paths; folders appear when outputs are written
+    install_lazy_output_dirs()
+    
+    # Keep the full stream list so each stream can be copied, converted or dropped
+    install_stream_probe()
+    
+    if args.plan:
+        return run_plan(args, jobs, renditions)
     
     # Check output directory
     if not os.path.exists(args.output):
@@ -266,27 +1240,103 @@ def main():
         except OSError as e:
             logger.error(f"خطا در ایجاد پوشه خروجی: {str(e)}")
             return 1
+    
+    # Remember directory listings so repeat scans skip unchanged folders
+    if not args.no_scan_index:
+        enable_scan_index(args.output)
+    
+    # Find video files lazily; a batch starts converting while the scan
+    # goes on (workers get their files from the queue)
+    video_files = iter(())
+    first_files = []
+    if args.input and not args.daemon:
+        logger.info("جستجوی فایل‌های ویدیویی...")
+        video_files = scan_video_files(args.input, get_scan_index())
+        first_files = list(itertools.islice(video_files, 2))
+        
+        if not first_files:
+            logger.error("هیچ فایل ویدیویی یافت نشد!")
+            return 1
+        
+        video_files = itertools.chain(first_files, video_files)
+    
+    # Reuse ffprobe results from earlier runs
+    if not args.no_probe_cache:
+        enable_probe_cache(args.output)
+    
+    # Recognize the same content under another name or folder
+    if args.duplicates != 'off':
+        enable_fingerprint_index(args.output)
+    
+    # Remember encode speed and output bitrate for --plan
+    enable_encode_history(args.output)
+    
+    # Coordinator: queue the inputs for workers instead of converting them
+    if args.queue and not args.worker:
+        return run_coordinator(args, list(video_files))
+    
+    # Sample CPU/memory/disk in the background so resource checks never block
+    start_resource_sampler(args.output)
+    
+    # Reserve output space per filesystem before each encode starts
+    enable_disk_guard(args.min_free_disk)
+    
+    if args.metrics:
+        enable_metrics(args.metrics)
             
     # Create converter
     converter = VideoConverter(
         output_dir=args.output,
-        verify=not args.no_verify
+        verify=not args.no_verify,
+        verify_mode=args.verify,
+        min_saving=args.min_saving,
+        jobs=jobs,
+        segments=args.segments,
+        resumable=args.resumable,
+        progress_format=args.progress_format,
+        schedule=args.schedule,
+        scratch=args.scratch,
+        scratch_budget=args.scratch_budget,
+        renditions=renditions,
+        duplicates=args.duplicates,
+        throttle=not (args.no_throttle or args.no_resource_check)
     )
     
     # Convert files
-    if len(video_files) == 1:
-        # Single file
-        success = converter.convert_single_file(video_files[0])
-        return 0 if success else 1
-    else:
-        # Batch processing
-        summary = converter.convert_batch(
-            video_files,
-            check_resources=not args.no_resource_check
-        )
-        
-        # Return 0 if all succeeded, 1 otherwise
-        return 0 if summary['failed'] == 0 else 1
+    profiler = start_profile() if args.profile else None
+    try:
+        if args.daemon:
+            daemon = ConverterDaemon(converter, check_resources=not args.no_resource_check)
+            if args.input:
+                daemon.submit(args.input, priority=args.priority)
+            serve_daemon(daemon, daemon_address)
+            return 0
+        elif args.worker:
+            queue = open_queue(args.queue)
+            try:
+                stats = LeaseWorker(queue, converter, drain=args.drain).run()
+            finally:
+                queue.close()
+            return 0 if stats['failed'] == 0 else 1
+        elif len(first_files) == 1:
+            # Single file
+            success = converter.convert_single_file(first_files[0])
+            log_probe_cache_stats()
+            return 0 if success else 1
+        else:
+            # Batch processing
+            summary = converter.convert_batch(
+                video_files,
+                check_resources=not args.no_resource_check
+            )
+            
+            # Return 0 if all succeeded, 1 otherwise
+            return 0 if summary['failed'] == 0 else 1
+    finally:
+        if profiler:
+            stop_profile(profiler, args.profile)
+        if converter.stager:
+            converter.stager.close()
 
 
 if __name__ == '__main__':